@@ -12,6 +12,7 @@ import json
 from pathlib import Path
 import struct
 import collections
+import collections.abc
 import shutil
 
 CameraModel = collections.namedtuple(
@@ -60,69 +61,202 @@ def read_cameras_binary(path_to_model_file):
             }
     return cameras
 
+# Fixed-size parts of COLMAP binary records (packed, little-endian)
+IMAGE_HEADER_DTYPE = np.dtype([
+    ("image_id", "<i4"), ("qvec", "<f8", 4), ("tvec", "<f8", 3), ("camera_id", "<i4")
+])
+POINT2D_DTYPE = np.dtype([("xy", "<f8", 2), ("point3D_id", "<i8")])
+POINT3D_DTYPE = np.dtype([
+    ("point3D_id", "<u8"), ("xyz", "<f8", 3), ("rgb", "u1", 3), ("error", "<f8"), ("track_length", "<u8")
+])
+TRACK_DTYPE = np.dtype([("image_id", "<i4"), ("point2D_idx", "<i4")])
+
+
+def _id_lookup(ids, order, key):
+    """Index of `key` in the (unsorted) id array, given its argsort `order`."""
+    pos = np.searchsorted(ids, key, sorter=order)
+    if pos >= len(ids) or ids[order[pos]] != key:
+        raise KeyError(key)
+    return int(order[pos])
+
+
+class ColmapImages(collections.abc.Mapping):
+    """
+    COLMAP images as flat arrays, with 2D observations stored in CSR form.
+    
+    Image i owns observations offsets[i]:offsets[i + 1] of `xys` and
+    `point3D_ids`. Indexing by image id (images[image_id]) returns the
+    legacy dict built by read_images_binary, created on access.
+    """
+    def __init__(self, headers, names, offsets, observations):
+        self.image_ids = headers["image_id"]
+        self.qvecs = headers["qvec"]
+        self.tvecs = headers["tvec"]
+        self.camera_ids = headers["camera_id"]
+        self.names = names
+        self.offsets = offsets
+        self.xys = observations["xy"]
+        self.point3D_ids = observations["point3D_id"]
+        self._order = np.argsort(self.image_ids, kind="stable")
+    
+    def points2D(self, image_id):
+        """Return (xys, point3D_ids) views for one image."""
+        i = _id_lookup(self.image_ids, self._order, image_id)
+        start, end = self.offsets[i], self.offsets[i + 1]
+        return self.xys[start:end], self.point3D_ids[start:end]
+    
+    def __getitem__(self, image_id):
+        i = _id_lookup(self.image_ids, self._order, image_id)
+        start, end = self.offsets[i], self.offsets[i + 1]
+        return {
+            "id": int(self.image_ids[i]),
+            "qvec": tuple(self.qvecs[i].tolist()),
+            "tvec": tuple(self.tvecs[i].tolist()),
+            "camera_id": int(self.camera_ids[i]),
+            "name": self.names[i],
+            "points2D": [(x, y, pid) for (x, y), pid in
+                         zip(self.xys[start:end].tolist(), self.point3D_ids[start:end].tolist())],
+        }
+    
+    def __iter__(self):
+        return iter(self.image_ids.tolist())
+    
+    def __len__(self):
+        return len(self.image_ids)
+
+
+class ColmapPoints3D(collections.abc.Mapping):
+    """
+    COLMAP 3D points as flat arrays, with tracks stored in CSR form.
+    
+    Point i owns track elements track_offsets[i]:track_offsets[i + 1] of
+    `track_image_ids` and `track_point2D_idxs`. Indexing by point id
+    (points3D[point_id]) returns the legacy dict built by read_points3D_binary,
+    created on access.
+    """
+    def __init__(self, records, track_offsets, tracks):
+        self.point3D_ids = records["point3D_id"]
+        self.xyz = records["xyz"]
+        self.rgb = records["rgb"]
+        self.errors = records["error"]
+        self.track_lengths = records["track_length"]
+        self.track_offsets = track_offsets
+        self.track_image_ids = tracks["image_id"]
+        self.track_point2D_idxs = tracks["point2D_idx"]
+        self._order = np.argsort(self.point3D_ids, kind="stable")
+    
+    def track(self, point_id):
+        """Return (image_ids, point2D_idxs) views for one point."""
+        i = _id_lookup(self.point3D_ids, self._order, point_id)
+        start, end = self.track_offsets[i], self.track_offsets[i + 1]
+        return self.track_image_ids[start:end], self.track_point2D_idxs[start:end]
+    
+    def __getitem__(self, point_id):
+        i = _id_lookup(self.point3D_ids, self._order, point_id)
+        start, end = self.track_offsets[i], self.track_offsets[i + 1]
+        return {
+            "id": int(self.point3D_ids[i]),
+            "xyz": tuple(self.xyz[i].tolist()),
+            "rgb": tuple(self.rgb[i].tolist()),
+            "error": float(self.errors[i]),
+            "track": list(zip(self.track_image_ids[start:end].tolist(),
+                              self.track_point2D_idxs[start:end].tolist())),
+        }
+    
+    def __iter__(self):
+        return iter(self.point3D_ids.tolist())
+    
+    def __len__(self):
+        return len(self.point3D_ids)
+
+
+def read_images_binary_csr(path_to_model_file):
+    """
+    Read images.bin into a ColmapImages.
+    
+    Only the per-image headers are walked in Python; each image's observations
+    are read in bulk with np.frombuffer and concatenated once.
+    """
+    with open(path_to_model_file, "rb") as fid:
+        buf = fid.read()
+    num_images = struct.unpack_from("<Q", buf, 0)[0]
+    
+    headers, names, counts, blocks = [], [], [], []
+    pos = 8
+    for _ in range(num_images):
+        headers.append(np.frombuffer(buf, dtype=IMAGE_HEADER_DTYPE, count=1, offset=pos))
+        pos += IMAGE_HEADER_DTYPE.itemsize
+        end = buf.index(b"\x00", pos)
+        names.append(buf[pos:end].decode("utf-8"))
+        num_points2D = struct.unpack_from("<Q", buf, end + 1)[0]
+        pos = end + 9
+        blocks.append(np.frombuffer(buf, dtype=POINT2D_DTYPE, count=num_points2D, offset=pos))
+        counts.append(num_points2D)
+        pos += POINT2D_DTYPE.itemsize * num_points2D
+    
+    offsets = np.zeros(num_images + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    headers = np.concatenate(headers) if headers else np.empty(0, dtype=IMAGE_HEADER_DTYPE)
+    observations = np.concatenate(blocks) if blocks else np.empty(0, dtype=POINT2D_DTYPE)
+    return ColmapImages(headers, names, offsets, observations)
+
+
+def read_points3D_binary_csr(path_to_model_file):
+    """
+    Read points3D.bin into a ColmapPoints3D.
+    
+    A single scan finds where each record starts; the fixed-size record parts and
+    the track elements are then separated with one byte mask and reinterpreted
+    with np.frombuffer-style views, without building per-element Python objects.
+    """
+    data = np.fromfile(path_to_model_file, dtype=np.uint8)
+    buf = memoryview(data)
+    num_points = struct.unpack_from("<Q", buf, 0)[0]
+    record_size = POINT3D_DTYPE.itemsize
+    
+    # Record layout is sequential: each start depends on the previous track length
+    unpack_length = struct.Struct("<Q").unpack_from
+    track_starts = []
+    track_lengths = []
+    pos = 8
+    for _ in range(num_points):
+        length = unpack_length(buf, pos + record_size - 8)[0]
+        track_starts.append(pos + record_size)
+        track_lengths.append(length)
+        pos += record_size + 8 * length
+    track_starts = np.asarray(track_starts, dtype=np.int64)
+    track_lengths = np.asarray(track_lengths, dtype=np.int64)
+    
+    # Mark the bytes belonging to tracks: +1 at each track start, -1 at each end
+    marks = np.zeros(len(data) + 1, dtype=np.int8)
+    np.add.at(marks, track_starts, 1)
+    np.add.at(marks, track_starts + TRACK_DTYPE.itemsize * track_lengths, -1)
+    is_track = np.cumsum(marks[:-1], dtype=np.int8).astype(bool)
+    
+    records = data[~is_track][8:].view(POINT3D_DTYPE)
+    tracks = data[is_track].view(TRACK_DTYPE)
+    track_offsets = np.zeros(num_points + 1, dtype=np.int64)
+    np.cumsum(track_lengths, out=track_offsets[1:])
+    return ColmapPoints3D(records, track_offsets, tracks)
+
+
 def read_images_binary(path_to_model_file):
     """
     Read image parameters from colmap binary file.
+    
+    Compatibility view over read_images_binary_csr: behaves like the former
+    {image_id: dict} result, building each image's dict when it is accessed.
     """
-    images = {}
-    with open(path_to_model_file, "rb") as fid:
-        num_images = struct.unpack("<Q", fid.read(8))[0]
-        for _ in range(num_images):
-            image_id = struct.unpack("<i", fid.read(4))[0]
-            qvec = struct.unpack("<4d", fid.read(32))
-            tvec = struct.unpack("<3d", fid.read(24))
-            camera_id = struct.unpack("<i", fid.read(4))[0]
-            
-            image_name = ""
-            char = struct.unpack("<c", fid.read(1))[0]
-            while char != b"\x00":
-                image_name += char.decode("utf-8")
-                char = struct.unpack("<c", fid.read(1))[0]
-            
-            num_points2D = struct.unpack("<Q", fid.read(8))[0]
-            
-            points2D = []
-            for __ in range(num_points2D):
-                x, y, point3D_id = struct.unpack("<ddi", fid.read(20))
-                points2D.append((x, y, point3D_id))
-                
-            images[image_id] = {
-                "id": image_id,
-                "qvec": qvec,
-                "tvec": tvec,
-                "camera_id": camera_id,
-                "name": image_name,
-                "points2D": points2D,
-            }
-    return images
+    return read_images_binary_csr(path_to_model_file)
 
 def read_points3D_binary(path_to_model_file):
     """
     Read 3D points from colmap binary file.
+    
+    Compatibility view over read_points3D_binary_csr: behaves like the former
+    {point_id: dict} result, building each point's dict when it is accessed.
     """
-    points3D = {}
-    with open(path_to_model_file, "rb") as fid:
-        num_points = struct.unpack("<Q", fid.read(8))[0]
-        for _ in range(num_points):
-            point_id = struct.unpack("<Q", fid.read(8))[0]
-            xyz = struct.unpack("<3d", fid.read(24))
-            rgb = struct.unpack("<3B", fid.read(3))
-            error = struct.unpack("<d", fid.read(8))[0]
-            
-            track_length = struct.unpack("<Q", fid.read(8))[0]
-            track = []
-            for __ in range(track_length):
-                image_id, point2D_idx = struct.unpack("<ii", fid.read(8))
-                track.append((image_id, point2D_idx))
-                
-            points3D[point_id] = {
-                "id": point_id,
-                "xyz": xyz,
-                "rgb": rgb,
-                "error": error,
-                "track": track,
-            }
-    return points3D
+    return read_points3D_binary_csr(path_to_model_file)
 
 def qvec_to_rotmat(qvec):
     """Convert quaternion to rotation matrix."""
@@ -139,12 +273,12 @@ def create_3dgs_transforms_json(colmap_path, output_path, images_dir):
     Generate a transforms.json file from COLMAP outputs compatible with 3DGS training.
     """
     cameras = read_cameras_binary(os.path.join(colmap_path, "cameras.bin"))
-    images = read_images_binary(os.path.join(colmap_path, "images.bin"))
+    images = read_images_binary_csr(os.path.join(colmap_path, "images.bin"))
     
     frames = []
-    for img_id, img in images.items():
+    for i, img_id in enumerate(images.image_ids.tolist()):
         # Get camera info
-        camera = cameras[img['camera_id']]
+        camera = cameras[int(images.camera_ids[i])]
         
         # Extract intrinsics based on camera model
         if camera['model'] == 'PINHOLE':
@@ -164,8 +298,8 @@ def create_3dgs_transforms_json(colmap_path, output_path, images_dir):
             cy = camera['height'] / 2
         
         # Convert quaternion to rotation matrix
-        R = qvec_to_rotmat(img['qvec'])
-        t = np.array(img['tvec'])
+        R = qvec_to_rotmat(images.qvecs[i])
+        t = np.array(images.tvecs[i])
         
         # Convert COLMAP's camera coordinate system to 3DGS's expected format
         # COLMAP: +z forward, +y down, +x right
@@ -179,7 +313,7 @@ def create_3dgs_transforms_json(colmap_path, output_path, images_dir):
         R = R @ R_adjust
         
         # Get image path
-        img_name = img['name']
+        img_name = images.names[i]
         img_path = os.path.join(images_dir, img_name)
         
         # Create frame entry
@@ -217,8 +351,59 @@ def create_3dgs_transforms_json(colmap_path, output_path, images_dir):
     
     return True
 
-def convert_colmap_to_3dgs(config):
-    """Convert COLMAP output to 3DGS format."""
+def write_points_ply(path, xyz, rgb, error=None, track_length=None, ascii=False):
+    """
+    Write a colored point cloud as PLY.
+    
+    Binary little-endian output is built as one NumPy structured array and written
+    with a single tofile call; ASCII output is kept for debugging and old viewers.
+    
+    Args:
+        path: Output PLY path
+        xyz: Nx3 positions
+        rgb: Nx3 uint8 colors
+        error: Optional N reprojection errors, written as property 'error'
+        track_length: Optional N track lengths, written as property 'track_length'
+        ascii: Write ASCII instead of binary
+    """
+    fields = [('x', '<f4'), ('y', '<f4'), ('z', '<f4'),
+              ('red', 'u1'), ('green', 'u1'), ('blue', 'u1')]
+    if error is not None:
+        fields.append(('error', '<f4'))
+    if track_length is not None:
+        fields.append(('track_length', '<u4'))
+    
+    vertices = np.empty(len(xyz), dtype=fields)
+    vertices['x'], vertices['y'], vertices['z'] = xyz[:, 0], xyz[:, 1], xyz[:, 2]
+    vertices['red'], vertices['green'], vertices['blue'] = rgb[:, 0], rgb[:, 1], rgb[:, 2]
+    if error is not None:
+        vertices['error'] = error
+    if track_length is not None:
+        vertices['track_length'] = track_length
+    
+    ply_types = {'<f4': 'float', 'u1': 'uchar', '<u4': 'uint'}
+    header = ["ply", f"format {'ascii' if ascii else 'binary_little_endian'} 1.0",
+              f"element vertex {len(vertices)}"]
+    header += [f"property {ply_types[dtype]} {name}" for name, dtype in fields]
+    header.append("end_header")
+    
+    with open(path, 'wb') as f:
+        f.write(("\n".join(header) + "\n").encode('ascii'))
+        if ascii:
+            fmt = ['%d' if dtype in ('u1', '<u4') else '%.9g' for _, dtype in fields]
+            np.savetxt(f, vertices, fmt=fmt)
+        else:
+            vertices.tofile(f)
+
+def convert_colmap_to_3dgs(config, ascii_ply=False, extra_properties=False):
+    """
+    Convert COLMAP output to 3DGS format.
+    
+    Args:
+        config: Pipeline configuration
+        ascii_ply: Write colmap_points.ply as ASCII instead of binary
+        extra_properties: Add per-point reprojection error and track length to the PLY
+    """
     # Extract configuration
     paths = config['paths']
     
@@ -242,27 +427,15 @@ def convert_colmap_to_3dgs(config):
     
     # Copy point cloud for visualization (optional)
     try:
-        points3D = read_points3D_binary(os.path.join(colmap_model_path, "points3D.bin"))
+        points3D = read_points3D_binary_csr(os.path.join(colmap_model_path, "points3D.bin"))
         
-        # Create a simple PLY file with points for visualization
-        with open(os.path.join(paths['gaussian_dir'], 'colmap_points.ply'), 'w') as f:
-            # Write PLY header
-            f.write("ply\n")
-            f.write("format ascii 1.0\n")
-            f.write(f"element vertex {len(points3D)}\n")
-            f.write("property float x\n")
-            f.write("property float y\n")
-            f.write("property float z\n")
-            f.write("property uchar red\n")
-            f.write("property uchar green\n")
-            f.write("property uchar blue\n")
-            f.write("end_header\n")
-            
-            # Write vertices
-            for point_id, point in points3D.items():
-                x, y, z = point['xyz']
-                r, g, b = point['rgb']
-                f.write(f"{x} {y} {z} {r} {g} {b}\n")
+        error = track_length = None
+        if extra_properties:
+            error = points3D.errors
+            track_length = points3D.track_lengths
+        
+        write_points_ply(os.path.join(paths['gaussian_dir'], 'colmap_points.ply'),
+                         points3D.xyz, points3D.rgb, error=error, track_length=track_length, ascii=ascii_ply)
     except Exception as e:
         print(f"Warning: Failed to create visualization point cloud: {e}")
     
@@ -273,6 +446,10 @@ def main():
     parser = argparse.ArgumentParser(description='Convert COLMAP output to 3DGS format')
     parser.add_argument('-c', '--config', type=str, default='config/pipeline_config.yaml',
                         help='Path to configuration YAML file')
+    parser.add_argument('--ascii-ply', action='store_true',
+                        help='Write colmap_points.ply as ASCII instead of binary')
+    parser.add_argument('--extra-properties', action='store_true',
+                        help='Add reprojection error and track length to colmap_points.ply')
     args = parser.parse_args()
     
     # Load configuration
@@ -280,7 +457,8 @@ def main():
         config = yaml.safe_load(f)
     
     # Run conversion
-    success = convert_colmap_to_3dgs(config)
+    success = convert_colmap_to_3dgs(config, ascii_ply=args.ascii_ply,
+                                     extra_properties=args.extra_properties)
     
     if success:
         print("Conversion completed successfully")
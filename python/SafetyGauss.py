@@ -27,9 +27,15 @@ from datetime import datetime
 import open3d as o3d
 import matplotlib.pyplot as plt
 import matplotlib.colors as colors
-from scipy.spatial import KDTree
+from matplotlib.path import Path as MplPath
 from mpl_toolkits.mplot3d import Axes3D
 
+from ply_io import add_splat_arguments, splat_options
+from point_cache import load_points_cached
+from spatial_index import load_or_build_kdtree
+from denoise import outlier_mask, add_denoise_arguments, denoise_options, MASK_FILENAME
+from scene_profile import get_scene_profile, floor_height_at
+
 
 class SafetyAnalyzer:
     def __init__(self, 
@@ -84,6 +90,7 @@ class SafetyAnalyzer:
         self.point_cloud = None
         self.camera_positions = None
         self.kdtree = None
+        self.scene_profile = None
         
         # Create output directory
         self.output_dir.mkdir(parents=True, exist_ok=True)
@@ -109,13 +116,15 @@ class SafetyAnalyzer:
         self.logger.info(f"Loaded scene data for {scene_data['name']}")
         return scene_data
     
-    def load_point_cloud(self, ply_path=None):
+    def load_point_cloud(self, ply_path=None, denoise=None, splat=None):
         """
         Load point cloud data from a PLY file.
         If ply_path is not provided, try to get it from the scene data.
         
         Args:
             ply_path (str, optional): Path to the PLY file
+            denoise (dict, optional): Outlier removal options for denoise.outlier_mask
+            splat (dict, optional): Gaussian splat pruning options for load_points_cached
             
         Returns:
             bool: True if successful, False otherwise
@@ -129,20 +138,34 @@ class SafetyAnalyzer:
             return False
             
         try:
-            # Load the point cloud using Open3D
+            # Load points and colors through the decoded point cache
             self.logger.info(f"Loading point cloud from {ply_path}")
-            self.point_cloud = o3d.io.read_point_cloud(ply_path)
+            self.points, self.colors = load_points_cached(ply_path, **(splat or {}))
             
-            if not self.point_cloud or len(self.point_cloud.points) == 0:
+            if len(self.points) == 0:
                 self.logger.error(f"Failed to load point cloud or point cloud is empty: {ply_path}")
                 return False
+            
+            # Drop stray points that would act as fake occluders
+            if denoise:
+                keep = outlier_mask(self.points, ply_path=ply_path,
+                                    mask_path=self.output_dir / MASK_FILENAME, **denoise)
+                self.points = self.points[keep]
+                if self.colors is not None:
+                    self.colors = self.colors[keep]
+                self.logger.info(f"Outlier removal kept {keep.sum()} of {len(keep)} points")
                 
-            # Extract points and colors as numpy arrays
-            self.points = np.asarray(self.point_cloud.points)
-            self.colors = np.asarray(self.point_cloud.colors) if self.point_cloud.has_colors() else None
+            # Open3D cloud for visualization
+            self.point_cloud = o3d.geometry.PointCloud()
+            self.point_cloud.points = o3d.utility.Vector3dVector(np.asarray(self.points, dtype=np.float64))
+            if self.colors is not None:
+                self.point_cloud.colors = o3d.utility.Vector3dVector(np.asarray(self.colors, dtype=np.float64))
+            
+            # Shared scene profile (floor, ceiling, bounds), cached next to the PLY
+            self.scene_profile = get_scene_profile(ply_path)
             
-            # Create KD-tree for nearest neighbor queries
-            self.kdtree = KDTree(self.points)
+            # KD-tree for nearest neighbor queries, restored from its sidecar when unchanged
+            self.kdtree = load_or_build_kdtree(self.points, ply_path)
             
             self.logger.info(f"Loaded point cloud with {len(self.point_cloud.points)} points")
             return True
@@ -179,6 +202,103 @@ class SafetyAnalyzer:
             self.logger.error(f"Exception during camera position extraction: {e}")
             return False
                 
+    def _spherical_ray_directions(self, resolution):
+        """
+        Create a spherical grid of unit ray directions.
+        
+        Args:
+            resolution (int): Number of samples in each spherical angle
+            
+        Returns:
+            ndarray: (resolution * resolution, 3) array of unit vectors
+        """
+        theta = np.linspace(0, np.pi, resolution)
+        phi = np.linspace(0, 2*np.pi, resolution)
+        
+        # Create meshgrid for all combinations
+        theta_grid, phi_grid = np.meshgrid(theta, phi)
+        
+        # Convert to Cartesian coordinates (unit vectors)
+        x = np.sin(theta_grid) * np.cos(phi_grid)
+        y = np.sin(theta_grid) * np.sin(phi_grid)
+        z = np.cos(theta_grid)
+        
+        return np.stack([x.flatten(), y.flatten(), z.flatten()], axis=1)
+    
+    def _ray_sample_distances(self, max_distance, num_samples=50):
+        """
+        Distances along a ray at which the KD-tree is probed.
+        
+        Args:
+            max_distance (float, optional): Maximum distance to consider
+            num_samples (int): Number of samples along the ray
+            
+        Returns:
+            ndarray: Sample distances from the ray origin
+        """
+        if max_distance:
+            return np.linspace(0, max_distance, num_samples)
+        # Use a heuristic based on the point cloud size
+        point_cloud_extent = np.max(self.points, axis=0) - np.min(self.points, axis=0)
+        point_cloud_diameter = np.linalg.norm(point_cloud_extent)
+        return np.linspace(0, point_cloud_diameter, num_samples)
+    
+    def _cast_rays(self, origins, directions, sample_distances, hit_threshold=0.1, chunk_size=262144,
+                   ray_lengths=None):
+        """
+        March a batch of rays through the KD-tree and find the first hit of each.
+        
+        All rays in a chunk advance one sample step at a time and each step is a
+        single batched KD-tree query over the rays that have not hit anything yet,
+        so rays stop being traced as soon as they hit geometry.
+        
+        Args:
+            origins (ndarray): (N, 3) ray origins
+            directions (ndarray): (N, 3) unit ray directions
+            sample_distances (ndarray): Distances along each ray to probe
+            hit_threshold (float): A sample closer than this to a point is a hit (meters)
+            chunk_size (int): Number of rays traced together
+            ray_lengths (ndarray, optional): (N,) per-ray length; samples beyond it are skipped
+            
+        Returns:
+            tuple: (hit_index, hit_distance) where hit_index is the index of the hit
+                   point in self.points (-1 if none) and hit_distance is its distance
+                   from the ray origin (inf if none)
+        """
+        num_rays = len(origins)
+        hit_index = np.full(num_rays, -1, dtype=np.int64)
+        hit_distance = np.full(num_rays, np.inf)
+        
+        for start in range(0, num_rays, chunk_size):
+            chunk_origins = origins[start:start + chunk_size]
+            chunk_directions = directions[start:start + chunk_size]
+            active = np.arange(len(chunk_origins))
+            
+            for dist in sample_distances:
+                if ray_lengths is not None:
+                    # Retire rays that reached their end without a hit
+                    active = active[ray_lengths[start + active] >= dist]
+                    if len(active) == 0:
+                        break
+                # Sample points along all still-active rays
+                sample_points = chunk_origins[active] + chunk_directions[active] * dist
+                # Only hits matter, so bound the search radius by the hit threshold
+                distances, indices = self.kdtree.query(sample_points, k=1, workers=-1,
+                                                       distance_upper_bound=hit_threshold)
+                
+                hits = distances < hit_threshold
+                if np.any(hits):
+                    hit_rays = active[hits]
+                    hit_index[start + hit_rays] = indices[hits]
+                    hit_distance[start + hit_rays] = np.linalg.norm(
+                        self.points[indices[hits]] - chunk_origins[hit_rays], axis=1)
+                    # No need to check further along these rays
+                    active = active[~hits]
+                if len(active) == 0:
+                    break
+        
+        return hit_index, hit_distance
+    
     def calculate_visibility_from_point(self, viewpoint, max_distance=None, resolution=100):
         """
         Calculate visibility from a specific viewpoint using ray casting.
@@ -198,19 +318,7 @@ class SafetyAnalyzer:
             return None
             
         # Create a spherical grid of rays
-        theta = np.linspace(0, np.pi, resolution)
-        phi = np.linspace(0, 2*np.pi, resolution)
-        
-        # Create meshgrid for all combinations
-        theta_grid, phi_grid = np.meshgrid(theta, phi)
-        
-        # Convert to Cartesian coordinates (unit vectors)
-        x = np.sin(theta_grid) * np.cos(phi_grid)
-        y = np.sin(theta_grid) * np.sin(phi_grid)
-        z = np.cos(theta_grid)
-        
-        # Stack into ray directions
-        ray_directions = np.stack([x.flatten(), y.flatten(), z.flatten()], axis=1)
+        ray_directions = self._spherical_ray_directions(resolution)
         
         # Set up results
         visibility_results = {
@@ -221,53 +329,16 @@ class SafetyAnalyzer:
             "max_distance": max_distance
         }
         
-        # Convert point cloud to trimesh for ray casting
         # Since Open3D doesn't have built-in ray casting for point clouds,
-        # we'll use nearest-neighbor search with the KD-tree
+        # we march all rays together using nearest-neighbor search with the KD-tree
+        origins = np.broadcast_to(np.asarray(viewpoint, dtype=float), ray_directions.shape)
+        hit_index, hit_distance = self._cast_rays(
+            origins, ray_directions, self._ray_sample_distances(max_distance))
         
-        visible_points = []
-        hit_points = []
-        
-        for i, direction in enumerate(ray_directions):
-            # Normalize direction
-            direction = direction / np.linalg.norm(direction)
-            
-            # Define a set of points along the ray for sampling
-            num_samples = 50  # Number of samples along the ray
-            if max_distance:
-                sample_distances = np.linspace(0, max_distance, num_samples)
-            else:
-                # Use a heuristic based on the point cloud size
-                point_cloud_extent = np.max(self.points, axis=0) - np.min(self.points, axis=0)
-                point_cloud_diameter = np.linalg.norm(point_cloud_extent)
-                sample_distances = np.linspace(0, point_cloud_diameter, num_samples)
-                
-            closest_hit = None
-            closest_distance = float('inf')
-            
-            for dist in sample_distances:
-                # Point along the ray
-                sample_point = viewpoint + direction * dist
-                
-                # Find nearest neighbor in the point cloud
-                distances, indices = self.kdtree.query(sample_point, k=1)
-                
-                # If the nearest point is close enough, consider it a hit
-                if distances < 0.1:  # 10cm threshold - adjust as needed
-                    closest_point = self.points[indices]
-                    dist_to_viewpoint = np.linalg.norm(closest_point - viewpoint)
-                    
-                    if dist_to_viewpoint < closest_distance:
-                        closest_distance = dist_to_viewpoint
-                        closest_hit = closest_point
-                        
-                    # No need to check further along this ray
-                    break
-            
-            if closest_hit is not None:
-                hit_points.append(closest_hit)
-                if max_distance is None or closest_distance <= max_distance:
-                    visible_points.append(closest_hit)
+        visible = hit_index >= 0
+        if max_distance is not None:
+            visible &= hit_distance <= max_distance
+        visible_points = list(self.points[hit_index[visible]])
         
         visibility_results["visible_points"] = visible_points
         visibility_results["visible_count"] = len(visible_points)
@@ -275,17 +346,206 @@ class SafetyAnalyzer:
         self.logger.info(f"Visibility analysis complete: {len(visible_points)}/{len(ray_directions)} points visible")
         return visibility_results
     
-    def identify_blind_spots(self, observer_height=1.7, grid_resolution=1.0, max_distance=10.0):
+    def line_of_sight(self, sources, targets, all_pairs=False, hit_threshold=0.1,
+                      step=None, endpoint_clearance=0.2, chunk_size=262144):
+        """
+        Batched point-to-point line-of-sight queries.
+        
+        Answers questions like "can camera 3 see dock door 7?" or "which of these
+        aisle points are visible from this mirror?" without a full spherical
+        visibility analysis. Each segment is marched in steps of `step` and every
+        step is one batched KD-tree query over all pairs still unobstructed.
+        
+        Args:
+            sources (ndarray): (N, 3) source points, or (S, 3) with all_pairs
+            targets (ndarray): (N, 3) target points, or (T, 3) with all_pairs
+            all_pairs (bool): Test every source against every target
+            hit_threshold (float): A sample closer than this to a point is occluded (meters)
+            step (float, optional): Sampling step along segments (defaults to hit_threshold)
+            endpoint_clearance (float): Ignore geometry this close to either endpoint, so
+                sources and targets may sit on surfaces (meters)
+            chunk_size (int): Number of pairs traced together
+            
+        Returns:
+            dict: "visible" boolean array and "occluder_distance" (distance from the
+                  source to the first occluding point, inf if visible), both of shape
+                  (N,) or (S, T) with all_pairs
+        """
+        if self.point_cloud is None:
+            self.logger.error("Point cloud not loaded")
+            return None
+            
+        sources = np.atleast_2d(np.asarray(sources, dtype=float))
+        targets = np.atleast_2d(np.asarray(targets, dtype=float))
+        if all_pairs:
+            shape = (len(sources), len(targets))
+            sources = np.repeat(sources, len(targets), axis=0)
+            targets = np.tile(targets, (shape[0], 1))
+        else:
+            if len(sources) != len(targets):
+                self.logger.error(f"Got {len(sources)} sources but {len(targets)} targets")
+                return None
+            shape = (len(sources),)
+            
+        self.logger.info(f"Testing line of sight for {len(sources)} point pairs")
+        
+        offsets = targets - sources
+        lengths = np.linalg.norm(offsets, axis=1)
+        directions = np.zeros_like(offsets)
+        nonzero = lengths > 0
+        directions[nonzero] = offsets[nonzero] / lengths[nonzero, None]
+        
+        # Sample each segment between the clearances at both ends
+        step = step or hit_threshold
+        max_length = lengths.max() if len(lengths) else 0.0
+        sample_distances = np.arange(endpoint_clearance, max_length - endpoint_clearance + step / 2, step)
+        hit_index, hit_distance = self._cast_rays(
+            sources, directions, sample_distances, hit_threshold=hit_threshold,
+            chunk_size=chunk_size, ray_lengths=lengths - endpoint_clearance)
+        
+        visible = hit_index < 0
+        self.logger.info(f"Line of sight complete: {np.sum(visible)}/{len(visible)} pairs visible")
+        return {
+            "visible": visible.reshape(shape),
+            "occluder_distance": hit_distance.reshape(shape)
+        }
+    
+    def _visibility_scores(self, viewpoints, ray_directions, max_distance, chunk_size=512):
+        """
+        Fraction of rays from each viewpoint that hit geometry within max_distance.
+        
+        Rays from many viewpoints are traced together in one batched traversal.
+        
+        Args:
+            viewpoints (ndarray): (N, 3) viewpoints
+            ray_directions (ndarray): (R, 3) unit ray directions shared by all viewpoints
+            max_distance (float, optional): Maximum visibility distance
+            chunk_size (int): Number of viewpoints whose rays are traced together
+            
+        Returns:
+            ndarray: (N,) visibility scores in [0, 1]
+        """
+        sample_distances = self._ray_sample_distances(max_distance)
+        num_rays = len(ray_directions)
+        scores = np.zeros(len(viewpoints))
+        
+        for start in range(0, len(viewpoints), chunk_size):
+            chunk = viewpoints[start:start + chunk_size]
+            origins = np.repeat(chunk, num_rays, axis=0)
+            directions = np.tile(ray_directions, (len(chunk), 1))
+            hit_index, hit_distance = self._cast_rays(origins, directions, sample_distances)
+            
+            visible = hit_index >= 0
+            if max_distance is not None:
+                visible &= hit_distance <= max_distance
+            scores[start:start + len(chunk)] = visible.reshape(len(chunk), num_rays).mean(axis=1)
+        
+        return scores
+    
+    def load_interior_polygon(self, polygon_path):
+        """
+        Load an interior floor polygon in world XY coordinates.
+        
+        Supports the JSON written by extract_wallplan.extract_concave_boundary
+        ({"boundary": [[x, y], ...]}, also accepting "polygon" or "points" keys)
+        and DXF files, from which the first closed polyline is used.
+        
+        Args:
+            polygon_path (str): Path to a .json or .dxf file
+            
+        Returns:
+            ndarray: (N, 2) polygon vertices, or None on failure
+        """
+        polygon_path = Path(polygon_path)
+        try:
+            if polygon_path.suffix.lower() == ".dxf":
+                import ezdxf
+                doc = ezdxf.readfile(str(polygon_path))
+                for polyline in doc.modelspace().query("LWPOLYLINE"):
+                    if polyline.closed:
+                        return np.array([p[:2] for p in polyline.get_points()], dtype=float)
+                self.logger.error(f"No closed polyline found in {polygon_path}")
+                return None
+            
+            with open(polygon_path, 'r') as f:
+                data = json.load(f)
+            for key in ("boundary", "polygon", "points"):
+                if key in data:
+                    return np.asarray(data[key], dtype=float)[:, :2]
+            self.logger.error(f"No boundary polygon found in {polygon_path}")
+            return None
+        except Exception as e:
+            self.logger.error(f"Failed to load interior polygon {polygon_path}: {e}")
+            return None
+    
+    def _walkable_viewpoints(self, grid_xy, observer_heights, cell_size=0.25, floor_tolerance=0.1):
+        """
+        Look up which viewpoints stand on walkable floor.
+        
+        A raster cell is walkable for an observer height if it contains floor points
+        and no point lies between the floor and that height. The raster is built with
+        one vectorized pass over the point cloud.
+        
+        Args:
+            grid_xy (ndarray): (G, 2) viewpoint XY positions
+            observer_heights (ndarray): (H,) observer heights above the floor
+            cell_size (float): Raster cell size (in meters)
+            floor_tolerance (float): Points within this distance of the floor count as floor
+            
+        Returns:
+            ndarray: (H * G,) boolean mask in the same order as the stacked viewpoints
+        """
+        origin = self.points[:, :2].min(axis=0)
+        cells = np.floor((self.points[:, :2] - origin) / cell_size).astype(np.int64)
+        shape = cells.max(axis=0) + 1
+        flat = cells[:, 0] * shape[1] + cells[:, 1]
+        
+        # Height of every point above the (possibly tilted) floor plane
+        relative_z = self.points[:, 2] - floor_height_at(self.scene_profile, self.points[:, :2])
+        on_floor = np.abs(relative_z) <= floor_tolerance
+        floor_count = np.bincount(flat[on_floor], minlength=shape[0] * shape[1])
+        
+        # Lowest obstacle above the floor in each cell
+        above = relative_z > floor_tolerance
+        lowest_obstacle = np.full(shape[0] * shape[1], np.inf)
+        np.minimum.at(lowest_obstacle, flat[above], relative_z[above])
+        
+        view_cells = np.floor((grid_xy - origin) / cell_size).astype(np.int64)
+        in_raster = np.all((view_cells >= 0) & (view_cells < shape), axis=1)
+        view_flat = np.where(in_raster, view_cells[:, 0] * shape[1] + view_cells[:, 1], 0)
+        has_floor = in_raster & (floor_count[view_flat] > 0)
+        
+        return np.concatenate([
+            has_floor & (lowest_obstacle[view_flat] >= height) for height in observer_heights
+        ])
+    
+    def identify_blind_spots(self, observer_height=1.7, grid_resolution=1.0, max_distance=10.0,
+                             interior_polygon=None, walkable_only=False, walkable_cell_size=0.25):
         """
         Identify blind spots in the scene by analyzing visibility from a grid of viewpoints.
         
+        Several observer heights (e.g. pedestrians, forklift drivers, AGV sensors) can
+        be analyzed at once: they share the viewpoint grid, the ray directions and the
+        KD-tree, and all of their rays are traced in the same batched traversal.
+        
+        Viewpoints outside the interior polygon, or (with walkable_only) not standing
+        on walkable floor, are marked invalid before any rays are cast.
+        
         Args:
-            observer_height (float): Height of the observer (in meters)
+            observer_height (float or list): Height(s) of the observer (in meters)
             grid_resolution (float): Resolution of the grid (in meters)
             max_distance (float): Maximum visibility distance (in meters)
+            interior_polygon (ndarray or str, optional): (N, 2) interior floor polygon,
+                or a path to a JSON/DXF boundary (see load_interior_polygon)
+            walkable_only (bool): Only keep viewpoints on floor with no obstacle below
+                the observer's head
+            walkable_cell_size (float): Cell size of the walkable-floor raster (in meters)
             
         Returns:
-            dict: Blind spot analysis results
+            dict: Blind spot analysis results. For a list of heights, "visibility_grid"
+                  has shape (heights, nx, ny), "blind_spots" and "hazardous_areas" are
+                  per-height lists, and "per_height" holds one single-height result
+                  per observer height.
         """
         self.logger.info(f"Identifying blind spots with grid resolution {grid_resolution}m")
         
@@ -293,6 +553,9 @@ class SafetyAnalyzer:
             self.logger.error("Point cloud not loaded")
             return None
             
+        multi_height = np.ndim(observer_height) > 0
+        observer_heights = np.atleast_1d(np.asarray(observer_height, dtype=float))
+            
         # Calculate the bounds of the scene
         min_bound = np.min(self.points, axis=0)
         max_bound = np.max(self.points, axis=0)
@@ -302,70 +565,86 @@ class SafetyAnalyzer:
         y_range = np.arange(min_bound[1], max_bound[1], grid_resolution)
         
         # Set Z to a fixed height (observer's eye level)
-        # Find ground level (approximate as minimum Z)
-        ground_level = min_bound[2]
-        observer_z = ground_level + observer_height
-        
-        # Initialize visibility grid
-        visibility_grid = np.zeros((len(x_range), len(y_range)))
+        # Ground level from the shared scene profile's floor estimate
+        ground_level = self.scene_profile["floor_height"]
+        
+        # Viewpoints for every (height, x, y) in row-major order
+        grid_x, grid_y = np.meshgrid(x_range, y_range, indexing='ij')
+        grid_xy = np.column_stack((grid_x.ravel(), grid_y.ravel()))
+        viewpoints = np.vstack([
+            np.column_stack((grid_xy, np.full(len(grid_xy), ground_level + height)))
+            for height in observer_heights
+        ])
+        
+        # Restrict viewpoints to the interior polygon and walkable floor
+        in_scope = np.ones(len(viewpoints), dtype=bool)
+        if interior_polygon is not None:
+            if isinstance(interior_polygon, (str, Path)):
+                interior_polygon = self.load_interior_polygon(interior_polygon)
+                if interior_polygon is None:
+                    return None
+            inside = MplPath(np.asarray(interior_polygon, dtype=float)[:, :2]).contains_points(grid_xy)
+            in_scope &= np.tile(inside, len(observer_heights))
+        if walkable_only:
+            in_scope &= self._walkable_viewpoints(grid_xy, observer_heights, cell_size=walkable_cell_size)
+        self.logger.info(f"{np.sum(in_scope)}/{len(viewpoints)} viewpoints inside the analysis area")
+        
+        # Check if the viewpoints are inside or very close to geometry
+        # by finding the nearest point in the point cloud
+        distances, _ = self.kdtree.query(viewpoints[in_scope], k=1, workers=-1, distance_upper_bound=0.2)
+        valid = in_scope.copy()
+        valid[in_scope] = distances >= 0.2  # 20cm threshold
+        
+        # Invalid viewpoints are marked NaN; the rest are raycast in one batch
+        scores = np.full(len(viewpoints), np.nan)
+        ray_directions = self._spherical_ray_directions(20)  # Lower resolution for grid analysis
+        scores[valid] = self._visibility_scores(viewpoints[valid], ray_directions, max_distance)
+        visibility_grids = scores.reshape(len(observer_heights), len(x_range), len(y_range))
+        
+        per_height = []
+        for k, height in enumerate(observer_heights):
+            height_scores = scores[k * len(grid_xy):(k + 1) * len(grid_xy)]
+            height_viewpoints = viewpoints[k * len(grid_xy):(k + 1) * len(grid_xy)]
+            
+            # Identify blind spots (areas with low visibility)
+            blind_mask = height_scores < 0.3  # 30% threshold for blind spots
+            blind_spots = [
+                {"position": position.tolist(), "visibility_score": float(score)}
+                for position, score in zip(height_viewpoints[blind_mask], height_scores[blind_mask])
+            ]
+            
+            # Analyze clusters of blind spots to identify hazardous areas
+            hazardous_areas = self.cluster_blind_spots(blind_spots, min_cluster_size=3, max_cluster_distance=2.0)
+            
+            per_height.append({
+                "grid_resolution": grid_resolution,
+                "observer_height": float(height),
+                "max_distance": max_distance,
+                "grid_dimensions": [len(x_range), len(y_range)],
+                "x_range": x_range.tolist(),
+                "y_range": y_range.tolist(),
+                "visibility_grid": visibility_grids[k].tolist(),
+                "blind_spots": blind_spots,
+                "hazardous_areas": hazardous_areas
+            })
+            self.logger.info(f"Blind spot analysis complete at {height}m: {len(blind_spots)} blind spots, {len(hazardous_areas)} hazardous areas")
         
-        # Keep track of blind spots
-        blind_spots = []
+        if not multi_height:
+            return per_height[0]
         
-        # Analyze visibility from each grid point
-        for i, x in enumerate(x_range):
-            for j, y in enumerate(y_range):
-                viewpoint = np.array([x, y, observer_z])
-                
-                # Check if the viewpoint is inside or very close to geometry
-                # by finding the nearest point in the point cloud
-                distances, _ = self.kdtree.query(viewpoint, k=1)
-                
-                # If the viewpoint is too close to geometry, skip it
-                if distances < 0.2:  # 20cm threshold
-                    visibility_grid[i, j] = np.nan  # Mark as invalid viewpoint
-                    continue
-                    
-                # Calculate visibility from this viewpoint
-                visibility = self.calculate_visibility_from_point(
-                    viewpoint, 
-                    max_distance=max_distance,
-                    resolution=20  # Lower resolution for grid analysis
-                )
-                
-                if visibility is None:
-                    self.logger.warning(f"Failed to calculate visibility from viewpoint {viewpoint}")
-                    continue
-                    
-                # Calculate visibility score as the percentage of visible rays
-                visibility_score = visibility["visible_count"] / visibility["total_rays"]
-                visibility_grid[i, j] = visibility_score
-                
-                # Identify blind spots (areas with low visibility)
-                if visibility_score < 0.3:  # 30% threshold for blind spots
-                    blind_spots.append({
-                        "position": viewpoint.tolist(),
-                        "visibility_score": visibility_score
-                    })
-        
-        # Analyze clusters of blind spots to identify hazardous areas
-        hazardous_areas = self.cluster_blind_spots(blind_spots, min_cluster_size=3, max_cluster_distance=2.0)
-        
-        # Generate result
-        blind_spot_analysis = {
+        # Generate stacked result
+        return {
             "grid_resolution": grid_resolution,
-            "observer_height": observer_height,
+            "observer_heights": observer_heights.tolist(),
             "max_distance": max_distance,
-            "grid_dimensions": [len(x_range), len(y_range)],
+            "grid_dimensions": [len(observer_heights), len(x_range), len(y_range)],
             "x_range": x_range.tolist(),
             "y_range": y_range.tolist(),
-            "visibility_grid": visibility_grid.tolist(),
-            "blind_spots": blind_spots,
-            "hazardous_areas": hazardous_areas
+            "visibility_grid": visibility_grids.tolist(),
+            "blind_spots": [analysis["blind_spots"] for analysis in per_height],
+            "hazardous_areas": [analysis["hazardous_areas"] for analysis in per_height],
+            "per_height": per_height
         }
-        
-        self.logger.info(f"Blind spot analysis complete: {len(blind_spots)} blind spots, {len(hazardous_areas)} hazardous areas")
-        return blind_spot_analysis
     
     def cluster_blind_spots(self, blind_spots, min_cluster_size=3, max_cluster_distance=2.0):
         """
@@ -471,7 +750,9 @@ class SafetyAnalyzer:
         else:
             cluster_size_factor = 0
             
-        blind_spot_percentage = len(blind_spot_analysis["blind_spots"]) / (blind_spot_analysis["grid_dimensions"][0] * blind_spot_analysis["grid_dimensions"][1])
+        # Only viewpoints that were actually analyzed (inside the area, not in geometry) count
+        valid_count = np.sum(valid_cells)
+        blind_spot_percentage = len(blind_spot_analysis["blind_spots"]) / valid_count if valid_count > 0 else 0
         blind_spot_factor = min(blind_spot_percentage * 5, 1.0)  # Normalized to [0,1]
         
         visibility_factor = 1.0 - overall_visibility  # Low visibility = higher risk
@@ -538,12 +819,13 @@ class SafetyAnalyzer:
                 
         return recommendations
     
-    def visualize_blind_spots(self, blind_spot_analysis):
+    def visualize_blind_spots(self, blind_spot_analysis, suffix=""):
         """
         Generate a visualization of blind spots.
         
         Args:
-            blind_spot_analysis (dict): Blind spot analysis results
+            blind_spot_analysis (dict): Single-height blind spot analysis results
+            suffix (str): Appended to the file name (e.g. the observer height)
             
         Returns:
             str: Path to the saved visualization
@@ -591,26 +873,27 @@ class SafetyAnalyzer:
         # Add labels and title
         ax.set_xlabel('X (meters)')
         ax.set_ylabel('Y (meters)')
-        ax.set_title('Visibility Analysis and Blind Spots')
+        ax.set_title(f"Visibility Analysis and Blind Spots (observer at {blind_spot_analysis['observer_height']:g}m)")
         
         # Add grid
         ax.grid(True, linestyle='--', alpha=0.6)
         
         # Save figure
         timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-        output_path = self.output_dir / f"blind_spot_analysis_{timestamp}.png"
+        output_path = self.output_dir / f"blind_spot_analysis_{timestamp}{suffix}.png"
         plt.savefig(output_path, dpi=300, bbox_inches='tight')
         plt.close(fig)
         
         self.logger.info(f"Saved blind spot visualization to {output_path}")
         return str(output_path)
     
-    def visualize_3d_safety_analysis(self, safety_analysis):
+    def visualize_3d_safety_analysis(self, safety_analysis, suffix=""):
         """
         Generate a 3D visualization of the safety analysis.
         
         Args:
             safety_analysis (dict): Safety analysis results
+            suffix (str): Appended to the file names (e.g. the observer height)
             
         Returns:
             str: Path to the saved visualization
@@ -705,7 +988,7 @@ class SafetyAnalyzer:
         view_control.set_front([0, 0, -1])
         view_control.set_up([0, 1, 0])
         
-        output_path_1 = self.output_dir / f"3d_safety_analysis_top_{timestamp}.png"
+        output_path_1 = self.output_dir / f"3d_safety_analysis_top_{timestamp}{suffix}.png"
         vis.capture_screen_image(str(output_path_1), do_render=True)
         output_paths.append(str(output_path_1))
         
@@ -713,7 +996,7 @@ class SafetyAnalyzer:
         view_control.set_front([1, 1, -1])
         view_control.set_up([0, 0, 1])
         
-        output_path_2 = self.output_dir / f"3d_safety_analysis_perspective_{timestamp}.png"
+        output_path_2 = self.output_dir / f"3d_safety_analysis_perspective_{timestamp}{suffix}.png"
         vis.capture_screen_image(str(output_path_2), do_render=True)
         output_paths.append(str(output_path_2))
         
@@ -767,7 +1050,7 @@ class SafetyAnalyzer:
         
         return str(analysis_id)
     
-    def generate_safety_report(self, safety_analysis, visualization_paths, output_format="html"):
+    def generate_safety_report(self, safety_analysis, visualization_paths, output_format="html", suffix=""):
         """
         Generate a safety report.
         
@@ -775,6 +1058,7 @@ class SafetyAnalyzer:
             safety_analysis (dict): Safety analysis results
             visualization_paths (list): Paths to visualizations
             output_format (str): Output format (html, pdf, json)
+            suffix (str): Appended to the file name (e.g. the observer height)
             
         Returns:
             str: Path to the generated report
@@ -792,13 +1076,13 @@ class SafetyAnalyzer:
                 "visualization_paths": visualization_paths
             }
             
-            output_path = self.output_dir / f"safety_report_{timestamp}.json"
+            output_path = self.output_dir / f"safety_report_{timestamp}{suffix}.json"
             with open(output_path, 'w') as f:
                 json.dump(report_data, f, indent=2)
                 
         elif output_format == "html":
             # Generate HTML report
-            output_path = self.output_dir / f"safety_report_{timestamp}.html"
+            output_path = self.output_dir / f"safety_report_{timestamp}{suffix}.html"
             
             # Simple HTML template
             html_content = f"""
@@ -879,7 +1163,7 @@ class SafetyAnalyzer:
             # For PDF output, you would need additional libraries like reportlab
             # This is a placeholder implementation
             self.logger.warning("PDF output is not implemented yet")
-            output_path = self.output_dir / f"safety_report_{timestamp}.txt"
+            output_path = self.output_dir / f"safety_report_{timestamp}{suffix}.txt"
             
             with open(output_path, 'w') as f:
                 f.write(f"SafetyGauss Safety Analysis Report\n")
@@ -898,24 +1182,31 @@ class SafetyAnalyzer:
         return str(output_path)
     
     def run_full_analysis(self, ply_path=None, observer_height=1.7, grid_resolution=1.0, 
-                         max_distance=10.0, output_format="html"):
+                         max_distance=10.0, output_format="html", interior_polygon=None,
+                         walkable_only=False, denoise=None, splat=None):
         """
         Run the full safety analysis pipeline.
         
         Args:
             ply_path (str, optional): Path to the PLY file
-            observer_height (float): Height of the observer (in meters)
+            observer_height (float or list): Height(s) of the observer (in meters); each
+                height is analyzed, visualized, saved and reported separately
             grid_resolution (float): Resolution of the grid (in meters)
             max_distance (float): Maximum visibility distance (in meters)
             output_format (str): Output format for the report
+            interior_polygon (str, optional): JSON/DXF interior boundary limiting the viewpoints
+            walkable_only (bool): Only analyze viewpoints on walkable floor
+            denoise (dict, optional): Outlier removal options for denoise.outlier_mask
+            splat (dict, optional): Gaussian splat pruning options for load_points_cached
             
         Returns:
-            dict: Analysis results
+            dict: Analysis results; for several heights, the stacked blind spot analysis
+                  and one single-height result per height under "per_height"
         """
         self.logger.info(f"Starting full safety analysis for scene: {self.scene_id}")
         
         # Load point cloud
-        if not self.load_point_cloud(ply_path):
+        if not self.load_point_cloud(ply_path, denoise=denoise, splat=splat):
             return None
             
         # Extract camera positions
@@ -925,45 +1216,56 @@ class SafetyAnalyzer:
         blind_spot_analysis = self.identify_blind_spots(
             observer_height=observer_height,
             grid_resolution=grid_resolution,
-            max_distance=max_distance
+            max_distance=max_distance,
+            interior_polygon=interior_polygon,
+            walkable_only=walkable_only
         )
         
         if not blind_spot_analysis:
             return None
-            
-        # Analyze safety risks
-        safety_analysis = self.analyze_safety_risks(blind_spot_analysis)
         
-        if not safety_analysis:
-            return None
+        multi_height = "per_height" in blind_spot_analysis
+        per_height = []
+        for height_analysis in blind_spot_analysis.get("per_height", [blind_spot_analysis]):
+            suffix = f"_h{height_analysis['observer_height']:g}" if multi_height else ""
             
-        # Generate visualizations
-        visualization_paths = []
-        
-        blind_spot_viz_path = self.visualize_blind_spots(blind_spot_analysis)
-        if blind_spot_viz_path:
-            visualization_paths.append(blind_spot_viz_path)
-            
-        safety_viz_paths = self.visualize_3d_safety_analysis(safety_analysis)
-        if safety_viz_paths:
-            visualization_paths.extend(safety_viz_paths)
+            # Analyze safety risks
+            safety_analysis = self.analyze_safety_risks(height_analysis)
             
-        # Save analysis to database
-        analysis_id = self.save_analysis_to_database(
-            blind_spot_analysis, safety_analysis, visualization_paths)
-            
-        # Generate safety report
-        report_path = self.generate_safety_report(
-            safety_analysis, visualization_paths, output_format)
+            if not safety_analysis:
+                return None
+                
+            # Generate visualizations
+            visualization_paths = []
             
-        # Prepare results
-        results = {
-            "analysis_id": analysis_id,
-            "blind_spot_analysis": blind_spot_analysis,
-            "safety_analysis": safety_analysis,
-            "visualization_paths": visualization_paths,
-            "report_path": report_path
-        }
+            blind_spot_viz_path = self.visualize_blind_spots(height_analysis, suffix)
+            if blind_spot_viz_path:
+                visualization_paths.append(blind_spot_viz_path)
+                
+            safety_viz_paths = self.visualize_3d_safety_analysis(safety_analysis, suffix)
+            if safety_viz_paths:
+                visualization_paths.extend(safety_viz_paths)
+                
+            # Save analysis to database
+            analysis_id = self.save_analysis_to_database(
+                height_analysis, safety_analysis, visualization_paths)
+                
+            # Generate safety report
+            report_path = self.generate_safety_report(
+                safety_analysis, visualization_paths, output_format, suffix)
+                
+            # Prepare results
+            per_height.append({
+                "analysis_id": analysis_id,
+                "blind_spot_analysis": height_analysis,
+                "safety_analysis": safety_analysis,
+                "visualization_paths": visualization_paths,
+                "report_path": report_path
+            })
+        
+        results = per_height[0]
+        if multi_height:
+            results = {"blind_spot_analysis": blind_spot_analysis, "per_height": per_height}
         
         self.logger.info(f"Safety analysis completed successfully for scene: {self.scene_id}")
         
@@ -980,17 +1282,23 @@ def main():
     parser.add_argument("--scene", required=True, help="Scene ID to analyze")
     parser.add_argument("--ply-path", default=None, help="Path to point cloud PLY file")
     parser.add_argument("--output", default=None, help="Output directory")
-    parser.add_argument("--observer-height", type=float, default=1.7, 
-                        help="Observer height in meters")
+    parser.add_argument("--observer-height", type=float, nargs='+', default=[1.7], 
+                        help="Observer height(s) in meters")
     parser.add_argument("--grid-resolution", type=float, default=1.0, 
                         help="Grid resolution in meters")
     parser.add_argument("--max-distance", type=float, default=10.0, 
                         help="Maximum visibility distance in meters")
+    parser.add_argument("--interior-polygon", default=None,
+                        help="JSON/DXF interior boundary (e.g. outer_boundary.json) limiting the viewpoints")
+    parser.add_argument("--walkable-only", action="store_true",
+                        help="Only analyze viewpoints on floor with no obstacle below head height")
     parser.add_argument("--report-format", choices=["html", "pdf", "json"], default="html", 
                         help="Report output format")
     parser.add_argument("--db-connection", default="mongodb://localhost:27017/", 
                         help="MongoDB connection string")
     parser.add_argument("--db-name", default="safetyGauss", help="MongoDB database name")
+    add_denoise_arguments(parser)
+    add_splat_arguments(parser)
     
     args = parser.parse_args()
     
@@ -1017,18 +1325,24 @@ def main():
     
     results = analyzer.run_full_analysis(
         ply_path=args.ply_path,
-        observer_height=args.observer_height,
+        observer_height=args.observer_height[0] if len(args.observer_height) == 1 else args.observer_height,
         grid_resolution=args.grid_resolution,
         max_distance=args.max_distance,
-        output_format=args.report_format
+        output_format=args.report_format,
+        interior_polygon=args.interior_polygon,
+        walkable_only=args.walkable_only,
+        denoise=denoise_options(args),
+        splat=splat_options(args)
     )
     
     if results:
         print(f"Safety analysis completed successfully for scene: {args.scene}")
-        print(f"Analysis ID: {results['analysis_id']}")
-        print(f"Risk Score: {results['safety_analysis']['risk_score']:.2f}")
-        print(f"Risk Level: {results['safety_analysis']['risk_level'].upper()}")
-        print(f"Report: {results['report_path']}")
+        for result in results.get("per_height", [results]):
+            print(f"Observer height: {result['blind_spot_analysis']['observer_height']:g}m")
+            print(f"Analysis ID: {result['analysis_id']}")
+            print(f"Risk Score: {result['safety_analysis']['risk_score']:.2f}")
+            print(f"Risk Level: {result['safety_analysis']['risk_level'].upper()}")
+            print(f"Report: {result['report_path']}")
         return 0
     else:
         print(f"Safety analysis failed for scene: {args.scene}")
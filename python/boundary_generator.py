@@ -1,18 +1,225 @@
 #!/usr/bin/env python3
 """
-Calculates the 2D Convex Hull boundary of a point cloud projected onto the XY plane.
+Calculates the 2D outer boundary of a point cloud projected onto the XY plane:
+the convex hull, or an alpha shape that follows L- and U-shaped footprints.
+
+Alpha shape (--method alpha):
+  - the XY points are binned on a coarse grid (cells_across cells along the
+    longer side); only occupied cells on the edge of the occupancy, i.e. with
+    an empty neighbour, contribute candidates: the points extreme in x, y,
+    x + y and x - y per cell
+  - the candidates are triangulated (Delaunay) and a triangle is kept when its
+    longest edge is at most alpha; edge length rather than circumradius keeps
+    the slivers along straight walls
+  - alpha defaults to the upper outlier fence (Q3 + 1.5 IQR) of the Delaunay
+    edge lengths, and at least 3 cells
+  - the largest counter-clockwise ring of the kept triangles is the boundary
 """
+import json
 import numpy as np
-import open3d as o3d
 import matplotlib.pyplot as plt
-from scipy.spatial import ConvexHull
+from scipy.spatial import ConvexHull, Delaunay
+from scipy.ndimage import binary_erosion
 from pathlib import Path
 import argparse
 import ezdxf
 
-def get_outer_boundary(input_file, output_dir, use_floor_points=False, floor_offset=0.1):
+try:
+    from skimage.measure import approximate_polygon
+except ImportError:
+    approximate_polygon = None
+
+from ply_io import add_splat_arguments, splat_options
+from point_cache import load_points_cached
+from denoise import outlier_mask, add_denoise_arguments, denoise_options, MASK_FILENAME
+from scene_profile import get_scene_profile
+from dxf_export import export_dxf, add_dxf_arguments
+
+METHODS = {'convex': ('convex_hull', 'Convex Hull'), 'alpha': ('alpha_shape', 'Alpha Shape')}
+MAX_PLOT_POINTS = 200_000
+
+
+def boundary_candidates(points_2d, cell_size):
+    """
+    Thinned boundary candidates: per-cell extremes (x, y, x + y, x - y) of the occupied
+    cells of a coarse grid that have an empty 8-neighbour.
+
+    Args:
+        points_2d (np.array): Nx2 points.
+        cell_size (float): Coarse cell size (meters).
+    Returns:
+        np.array: Mx2 candidate points (float64).
+    """
+    origin = points_2d.min(axis=0).astype(np.float64)
+    cells = np.floor((points_2d - origin) / cell_size).astype(np.int64)
+    shape = cells.max(axis=0) + 1
+    cell_ids = cells[:, 0] * shape[1] + cells[:, 1]
+    occupied = np.zeros(int(shape[0] * shape[1]), dtype=bool)
+    occupied[cell_ids] = True
+    grid = occupied.reshape(shape)
+    edge = (grid & ~binary_erosion(grid, structure=np.ones((3, 3), dtype=bool), border_value=0)).ravel()
+
+    selected = np.flatnonzero(edge[cell_ids])
+    cell_ids = cell_ids[selected]
+    points = np.asarray(points_2d[selected], dtype=np.float64)
+    picks = []
+    for key in (points[:, 0], points[:, 1], points[:, 0] + points[:, 1], points[:, 0] - points[:, 1]):
+        # Sorted by cell, then key: the first and last entry of each cell are its extremes
+        order = np.lexsort((key, cell_ids))
+        sorted_ids = cell_ids[order]
+        first = np.flatnonzero(np.r_[True, sorted_ids[1:] != sorted_ids[:-1]])
+        last = np.r_[first[1:] - 1, len(order) - 1]
+        picks.extend((order[first], order[last]))
+    return points[np.unique(np.concatenate(picks))]
+
+
+def _boundary_rings(edges, vertices):
+    """Closed rings (vertex index lists) walked along directed boundary edges."""
+    outgoing = {}
+    for a, b in edges:
+        outgoing.setdefault(int(a), []).append(int(b))
+    rings = []
+    while outgoing:
+        start = next(iter(outgoing))
+        ring, previous, current = [start], None, start
+        while current in outgoing:
+            options = outgoing[current]
+            index = 0
+            if previous is not None and len(options) > 1:
+                # Pinch vertex: take the rightmost turn to stay on the outer side
+                d_in = vertices[current] - vertices[previous]
+                d_out = vertices[options] - vertices[current]
+                turns = np.arctan2(d_in[0] * d_out[:, 1] - d_in[1] * d_out[:, 0], d_out @ d_in)
+                index = int(np.argmin(turns))
+            nxt = options.pop(index)
+            if not options:
+                del outgoing[current]
+            previous, current = current, nxt
+            if current == start:
+                break
+            ring.append(current)
+        if len(ring) >= 3:
+            rings.append(ring)
+    return rings
+
+
+def alpha_shape_boundary(points_2d, alpha=None, cell_size=None, cells_across=200):
+    """
+    Outer boundary of the alpha shape of XY points (see module docstring).
+
+    Args:
+        points_2d (np.array): Nx2 points.
+        alpha (float, optional): Longest kept triangle edge (meters); default from
+                                 the Delaunay edge length statistics.
+        cell_size (float, optional): Candidate grid cell size (meters); default
+                                     longer side / cells_across.
+        cells_across (int): Cells along the longer side when cell_size is not given.
+    Returns:
+        dict or None: {"boundary": Kx2 counter-clockwise vertices, "alpha", "cell_size",
+                       "candidates"}, or None if no boundary was found.
+    """
+    span = points_2d.max(axis=0) - points_2d.min(axis=0)
+    if cell_size is None:
+        cell_size = float(max(span.max(), 1e-6)) / cells_across
+    candidates = boundary_candidates(points_2d, cell_size)
+    print(f"Alpha shape: {len(candidates)} boundary candidates from {len(points_2d)} points "
+          f"(cell {cell_size:.3f}m)")
+    if len(candidates) < 3:
+        return None
+    simplices = Delaunay(candidates).simplices.copy()
+    a, b, c = (candidates[simplices[:, k]] for k in range(3))
+    clockwise = (b[:, 0] - a[:, 0]) * (c[:, 1] - a[:, 1]) - (b[:, 1] - a[:, 1]) * (c[:, 0] - a[:, 0]) < 0
+    simplices[clockwise] = simplices[clockwise][:, [0, 2, 1]]
+
+    # Directed edges, triangle-major: edge k of triangle t is row k * T + t
+    edges = np.vstack((simplices[:, [0, 1]], simplices[:, [1, 2]], simplices[:, [2, 0]]))
+    lengths = np.linalg.norm(candidates[edges[:, 0]] - candidates[edges[:, 1]], axis=1)
+    if alpha is None:
+        undirected = np.unique(np.sort(edges, axis=1), axis=0)
+        unique_lengths = np.linalg.norm(candidates[undirected[:, 0]] - candidates[undirected[:, 1]], axis=1)
+        q1, q3 = np.percentile(unique_lengths, [25, 75])
+        alpha = max(q3 + 1.5 * (q3 - q1), 3 * cell_size)
+    keep = lengths.reshape(3, -1).max(axis=0) <= alpha
+    print(f"Alpha {alpha:.3f}m keeps {int(keep.sum())} of {len(keep)} triangles")
+
+    # Edges of exactly one kept triangle bound the shape (interior on their left)
+    kept_edges = edges[np.tile(keep, 3)]
+    keys = np.sort(kept_edges, axis=1)
+    keys = keys[:, 0] * len(candidates) + keys[:, 1]
+    _, inverse, counts = np.unique(keys, return_inverse=True, return_counts=True)
+    rings = _boundary_rings(kept_edges[counts[inverse] == 1], candidates)
+    best, best_area = None, 0.0
+    for ring in rings:
+        x, y = candidates[ring, 0], candidates[ring, 1]
+        area = 0.5 * float(np.dot(x, np.roll(y, -1)) - np.dot(y, np.roll(x, -1)))
+        if area > best_area:
+            best, best_area = ring, area
+    if best is None:
+        return None
+    boundary = candidates[best]
+    if approximate_polygon is not None:
+        closed = approximate_polygon(np.vstack((boundary, boundary[:1])), cell_size / 2)
+        if len(closed) >= 4:
+            boundary = closed[:-1]
+    print(f"Alpha shape boundary with {len(boundary)} vertices, area {best_area:.2f} m^2")
+    return {"boundary": boundary, "alpha": float(alpha), "cell_size": float(cell_size),
+            "candidates": int(len(candidates))}
+
+
+def save_hull_products(output_path, points_2d, hull_points, dim_mode='full', dim_scale=0.01, method='convex',
+                       info=None):
     """
-    Generates the 2D convex hull boundary from a PLY file.
+    Write a boundary as outer_boundary_<convex_hull|alpha_shape>.json, .png (over the
+    projected points, thinned to MAX_PLOT_POINTS) and .dxf.
+
+    Args:
+        method (str): 'convex' or 'alpha' (see METHODS).
+        info (dict, optional): Extra entries of the JSON file.
+    """
+    output_path = Path(output_path)
+    name, label = METHODS[method]
+    hull_points_closed = np.vstack((hull_points, hull_points[0]))
+    boundary_json = output_path / f"outer_boundary_{name}.json"
+    with open(boundary_json, 'w') as f:
+        json.dump(dict(info or {}, boundary=np.asarray(hull_points).tolist()), f, indent=2)
+    print(f"Saved boundary polygon to {boundary_json}")
+
+    # --- Visualization ---
+    plot_points = points_2d[::max(1, len(points_2d) // MAX_PLOT_POINTS)]
+    plt.figure(figsize=(10, 10))
+    plt.plot(plot_points[:, 0], plot_points[:, 1], '.', markersize=1, color='gray', alpha=0.5, label='Projected Points')
+    plt.plot(hull_points_closed[:, 0], hull_points_closed[:, 1], 'r-', linewidth=2, label=f'{label} Boundary')
+    plt.scatter(hull_points[:, 0], hull_points[:, 1], c='red', s=20, zorder=5) # Mark vertices
+    plt.title(f'2D {label} Boundary')
+    plt.xlabel('X (meters)')
+    plt.ylabel('Y (meters)')
+    plt.gca().set_aspect('equal', adjustable='box')
+    plt.legend()
+    plt.grid(True)
+    vis_path = output_path / f"outer_boundary_{name}.png"
+    plt.savefig(vis_path, bbox_inches='tight', dpi=150)
+    plt.close()
+    print(f"Saved boundary visualization to {vis_path}")
+
+    # --- DXF Output ---
+    try:
+        dxf_path = output_path / f"outer_boundary_{name}.dxf"
+        stats = export_dxf(dxf_path, [{"points": hull_points, "closed": True, "layer": 'BOUNDARY'}],
+                           dim_mode, dim_min_length=0.1, dim_scale_fraction=dim_scale, dim_offset=0.5,
+                           layer_colors={'DIMENSIONS': ezdxf.colors.CYAN})
+        print(f"Saved boundary DXF to {dxf_path} ({stats['dimensions']} dimensions)")
+
+    except ImportError:
+        print("Info: ezdxf not found. Skipping DXF output.")
+    except Exception as e:
+        print(f"Error during DXF creation: {e}")
+
+
+def get_outer_boundary(input_file, output_dir, use_floor_points=False, floor_offset=0.1, denoise=None,
+                       dim_mode='full', dim_scale=0.01, method='convex', alpha=None, alpha_cell_size=None,
+                       splat=None):
+    """
+    Generates the 2D convex hull or alpha shape boundary from a PLY file.
 
     Args:
         input_file (str): Path to input PLY file.
@@ -21,29 +228,39 @@ def get_outer_boundary(input_file, output_dir, use_floor_points=False, floor_off
                                  If False, use all points projected to 2D.
         floor_offset (float): If use_floor_points is True, defines the thickness
                               above the detected floor to consider (meters).
+        denoise (dict, optional): Outlier removal options for denoise.outlier_mask.
+        dim_mode (str): DXF dimensions: 'full', 'lightweight' (MTEXT + leader lines) or 'none'.
+        dim_scale (float): Skip dimensions shorter than this fraction of the hull's diagonal.
+        method (str): 'convex' (convex hull) or 'alpha' (alpha shape, see module docstring).
+        alpha (float, optional): Alpha shape edge length limit (meters); default automatic.
+        alpha_cell_size (float, optional): Alpha shape candidate grid cell (meters); default automatic.
+        splat (dict, optional): Gaussian splat pruning options for load_points_cached (ply_io.splat_options).
     """
     output_path = Path(output_dir)
     output_path.mkdir(parents=True, exist_ok=True)
 
     print(f"Loading point cloud from {input_file}...")
     try:
-        pcd = o3d.io.read_point_cloud(input_file)
-        if not pcd.has_points():
+        points, _ = load_points_cached(input_file, with_colors=False, **(splat or {}))
+        if len(points) == 0:
             print("Error: Point cloud is empty.")
             return False
-        points = np.asarray(pcd.points)
     except Exception as e:
         print(f"Error loading point cloud: {e}")
         return False
 
+    if denoise:
+        points = points[outlier_mask(points, ply_path=input_file, mask_path=output_path / MASK_FILENAME, **denoise)]
+
     points_2d = None
     if use_floor_points:
         print("Using points near floor...")
         heights = points[:, 2]
-        if len(heights) == 0:
+        profile = get_scene_profile(input_file)
+        if profile is None:
             print("Error: No points to determine floor height.")
             return False
-        floor_height = np.percentile(heights, 5)
+        floor_height = profile["floor_height"]
         print(f"Detected floor near {floor_height:.3f}m")
         floor_mask = (heights >= floor_height - floor_offset/2) & (heights <= floor_height + floor_offset/2)
         if np.sum(floor_mask) < 3:
@@ -59,78 +276,56 @@ def get_outer_boundary(input_file, output_dir, use_floor_points=False, floor_off
              print("Error: Less than 3 points in the point cloud. Cannot compute hull.")
              return False
 
-    print("Calculating 2D Convex Hull...")
-    try:
-        hull = ConvexHull(points_2d)
-        hull_points = points_2d[hull.vertices]
-        # Close the loop
-        hull_points_closed = np.vstack((hull_points, hull_points[0]))
-    except Exception as e:
-        print(f"Error calculating Convex Hull: {e}")
-        # This can happen if points are collinear, etc.
-        return False
-
-    print(f"Convex Hull found with {len(hull_points)} vertices.")
-
-    # --- Visualization ---
-    plt.figure(figsize=(10, 10))
-    plt.plot(points_2d[:, 0], points_2d[:, 1], '.', markersize=1, color='gray', alpha=0.5, label='Projected Points')
-    plt.plot(hull_points_closed[:, 0], hull_points_closed[:, 1], 'r-', linewidth=2, label='Convex Hull Boundary')
-    plt.scatter(hull_points[:, 0], hull_points[:, 1], c='red', s=20, zorder=5) # Mark vertices
-    plt.title('2D Convex Hull Boundary')
-    plt.xlabel('X (meters)')
-    plt.ylabel('Y (meters)')
-    plt.gca().set_aspect('equal', adjustable='box')
-    plt.legend()
-    plt.grid(True)
-    vis_path = output_path / "outer_boundary_convex_hull.png"
-    plt.savefig(vis_path, bbox_inches='tight', dpi=150)
-    plt.close()
-    print(f"Saved boundary visualization to {vis_path}")
+    info = None
+    if method == 'alpha':
+        print("Calculating 2D Alpha Shape...")
+        try:
+            result = alpha_shape_boundary(points_2d, alpha, alpha_cell_size)
+        except Exception as e:
+            print(f"Error calculating Alpha Shape: {e}")
+            return False
+        if result is None:
+            print("Error: No alpha shape boundary found. Try a larger --alpha.")
+            return False
+        hull_points = result.pop("boundary")
+        info = result
+    else:
+        print("Calculating 2D Convex Hull...")
+        try:
+            hull = ConvexHull(points_2d)
+            hull_points = points_2d[hull.vertices]
+        except Exception as e:
+            print(f"Error calculating Convex Hull: {e}")
+            # This can happen if points are collinear, etc.
+            return False
 
-    # --- DXF Output ---
-    try:
-        import ezdxf
-        doc = ezdxf.new('R2010')
-        msp = doc.modelspace()
-        msp.add_lwpolyline(hull_points_closed, dxfattribs={'layer': 'BOUNDARY'})
-
-        # Add dimensions (optional, less common for simple hull)
-        doc.layers.add(name='DIMENSIONS', color=ezdxf.colors.CYAN)
-        for i in range(len(hull_points)):
-            p1 = hull_points[i]
-            p2 = hull_points[(i + 1) % len(hull_points)] # Next point, wrap around
-            segment_length = np.linalg.norm(np.array(p2) - np.array(p1))
-            if segment_length > 0.1: # Only dimension non-trivial segments
-                 try:
-                      msp.add_aligned_dim(p1=p1, p2=p2, distance=0.5, # Offset distance
-                                          dxfattribs={'layer': 'DIMENSIONS'}).render()
-                 except Exception as dim_e:
-                      print(f"Warning: Could not add dimension for segment {i}: {dim_e}")
-
-
-        dxf_path = output_path / "outer_boundary_convex_hull.dxf"
-        doc.saveas(dxf_path)
-        print(f"Saved boundary DXF to {dxf_path}")
+        print(f"Convex Hull found with {len(hull_points)} vertices.")
 
-    except ImportError:
-        print("Info: ezdxf not found. Skipping DXF output.")
-    except Exception as e:
-        print(f"Error during DXF creation: {e}")
+    save_hull_products(output_path, points_2d, hull_points, dim_mode, dim_scale, method, info)
 
     print("Outer boundary generation complete.")
     return True
 
 
 def main():
-    parser = argparse.ArgumentParser(description="Generate the 2D Convex Hull outer boundary from a PLY point cloud.")
+    parser = argparse.ArgumentParser(description="Generate the 2D Convex Hull or Alpha Shape outer boundary from a PLY point cloud.")
     parser.add_argument("input", help="Input PLY file")
     parser.add_argument("output", help="Output directory")
     parser.add_argument("--use-floor", action='store_true', help="Calculate boundary using only points near the estimated floor level.")
     parser.add_argument("--floor-offset", type=float, default=0.1, help="Thickness around floor level if --use-floor is set (meters).")
+    parser.add_argument("--method", choices=sorted(METHODS), default="convex",
+                        help="Convex hull, or alpha shape (concave; follows L- and U-shaped footprints).")
+    parser.add_argument("--alpha", type=float, default=None,
+                        help="Alpha shape: longest kept triangle edge (meters; default from edge length statistics).")
+    parser.add_argument("--alpha-cell", type=float, default=None,
+                        help="Alpha shape: candidate grid cell size (meters; default 1/200 of the longer side).")
+    add_dxf_arguments(parser)
+    add_denoise_arguments(parser)
+    add_splat_arguments(parser)
 
     args = parser.parse_args()
-    get_outer_boundary(args.input, args.output, args.use_floor, args.floor_offset)
+    get_outer_boundary(args.input, args.output, args.use_floor, args.floor_offset, denoise_options(args),
+                       args.dim_mode, args.dim_scale, args.method, args.alpha, args.alpha_cell, splat_options(args))
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Statistical and radius outlier removal shared by the point cloud tools.
+
+Stray points above the floor break wall slices, inflate hulls and act as
+fake occluders in the visibility analysis. This module computes a boolean
+"kept" mask with Open3D-compatible filters, using batched multi-threaded
+KD-tree queries in chunks so memory stays bounded:
+
+  statistical  mean distance to the k nearest neighbours must be within
+               mean + std_ratio * std over the whole cloud
+  radius       at least min_neighbors other points within `radius`
+  both         statistical and radius
+
+The KD-tree comes from spatial_index, so it is reused from (and shared with)
+the sidecar next to the PLY. The mask is saved as `outlier_mask.npz` next to
+the tool's output, together with the filter parameters and a hash of the
+points, so repeated runs skip the filtering.
+
+Usage:
+  python denoise.py input.ply output.ply [--method both] [--k 20] [--std-ratio 2.0]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import numpy as np
+
+from ply_io import read_ply, write_ply
+from point_cache import load_points_cached
+from spatial_index import load_or_build_kdtree, points_hash
+
+DENOISE_METHODS = ('none', 'statistical', 'radius', 'both')
+
+MASK_FILENAME = "outlier_mask.npz"
+
+
+def statistical_outlier_mask(points, kdtree, nb_neighbors=20, std_ratio=2.0, chunk_size=500_000, workers=-1):
+    """
+    Keep points whose mean k-NN distance is at most mean + std_ratio * std.
+
+    Args:
+        points (np.array): Nx3 points.
+        kdtree (KDTree): Tree over `points`.
+        nb_neighbors (int): Neighbours per point (excluding the point itself).
+        std_ratio (float): Threshold in standard deviations.
+        chunk_size (int): Points queried per batch.
+        workers (int): Query threads (-1 for all cores).
+    Returns:
+        np.array: N boolean kept mask.
+    """
+    # Small clouds: the query pads missing neighbours with inf, so never ask for more than exist
+    nb_neighbors = min(nb_neighbors, len(points) - 1)
+    if nb_neighbors < 1:
+        return np.ones(len(points), dtype=bool)
+
+    mean_distances = np.empty(len(points))
+    for start in range(0, len(points), chunk_size):
+        distances, _ = kdtree.query(points[start:start + chunk_size], k=nb_neighbors + 1, workers=workers)
+        # Column 0 is the point itself
+        mean_distances[start:start + chunk_size] = distances[:, 1:].mean(axis=1)
+    finite = mean_distances[np.isfinite(mean_distances)]
+    if len(finite) == 0:
+        return np.ones(len(points), dtype=bool)
+    threshold = finite.mean() + std_ratio * finite.std()
+    return mean_distances <= threshold
+
+
+def radius_outlier_mask(points, kdtree, radius=0.05, min_neighbors=5, chunk_size=500_000, workers=-1):
+    """
+    Keep points with at least `min_neighbors` other points within `radius`.
+
+    Args:
+        points (np.array): Nx3 points.
+        kdtree (KDTree): Tree over `points`.
+        radius (float): Search radius (meters).
+        min_neighbors (int): Minimum neighbours (excluding the point itself).
+        chunk_size (int): Points queried per batch.
+        workers (int): Query threads (-1 for all cores).
+    Returns:
+        np.array: N boolean kept mask.
+    """
+    keep = np.empty(len(points), dtype=bool)
+    for start in range(0, len(points), chunk_size):
+        counts = kdtree.query_ball_point(points[start:start + chunk_size], radius,
+                                         return_length=True, workers=workers)
+        keep[start:start + chunk_size] = counts - 1 >= min_neighbors
+    return keep
+
+
+def _load_mask(mask_path, content_hash, params):
+    try:
+        with np.load(mask_path) as saved:
+            if str(saved["content_hash"]) != content_hash or json.loads(str(saved["params"])) != params:
+                return None
+            return np.unpackbits(saved["keep"], count=int(saved["count"])).astype(bool)
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def outlier_mask(points, method='statistical', nb_neighbors=20, std_ratio=2.0, radius=0.05, min_neighbors=5,
+                 ply_path=None, mask_path=None, kdtree=None, chunk_size=500_000, workers=-1):
+    """
+    Compute (or reuse) the kept mask of an outlier removal stage.
+
+    Args:
+        points (np.array): Nx3 points.
+        method (str): 'statistical', 'radius', 'both' or 'none'.
+        nb_neighbors, std_ratio: Statistical filter parameters.
+        radius, min_neighbors: Radius filter parameters.
+        ply_path (str, optional): PLY the points were loaded from; its KD-tree sidecar is reused.
+        mask_path (str, optional): Where the mask is saved and looked up.
+        kdtree (KDTree, optional): Prebuilt tree over `points`.
+        chunk_size (int): Points queried per batch.
+        workers (int): Query threads (-1 for all cores).
+    Returns:
+        np.array: N boolean kept mask.
+    """
+    if method not in DENOISE_METHODS:
+        raise ValueError(f"Unknown denoise method '{method}', expected one of {DENOISE_METHODS}")
+    if method == 'none' or len(points) == 0:
+        return np.ones(len(points), dtype=bool)
+
+    params = {"method": method}
+    if method in ('statistical', 'both'):
+        params.update(nb_neighbors=nb_neighbors, std_ratio=std_ratio)
+    if method in ('radius', 'both'):
+        params.update(radius=radius, min_neighbors=min_neighbors)
+    content_hash = points_hash(points)
+    if mask_path is not None and os.path.exists(mask_path):
+        keep = _load_mask(mask_path, content_hash, params)
+        if keep is not None:
+            print(f"Reusing outlier mask {mask_path}: keeping {keep.sum()}/{len(keep)} points")
+            return keep
+
+    start = time.time()
+    if kdtree is None:
+        kdtree = load_or_build_kdtree(points, ply_path, content_hash=content_hash)
+    keep = np.ones(len(points), dtype=bool)
+    if method in ('statistical', 'both'):
+        keep &= statistical_outlier_mask(points, kdtree, nb_neighbors, std_ratio, chunk_size, workers)
+    if method in ('radius', 'both'):
+        keep &= radius_outlier_mask(points, kdtree, radius, min_neighbors, chunk_size, workers)
+    print(f"Outlier removal ({method}) kept {keep.sum()}/{len(keep)} points in {time.time() - start:.2f}s")
+
+    if mask_path is not None:
+        np.savez(mask_path, keep=np.packbits(keep), count=len(keep),
+                 content_hash=content_hash, params=json.dumps(params))
+    return keep
+
+
+def add_denoise_arguments(parser):
+    """Add the shared outlier removal flags to a tool's argument parser."""
+    parser.add_argument("--denoise", choices=DENOISE_METHODS, default="none",
+                        help="Outlier removal before processing (statistical k-NN, radius, or both).")
+    parser.add_argument("--denoise-k", type=int, default=20,
+                        help="Neighbours for statistical outlier removal.")
+    parser.add_argument("--denoise-std", type=float, default=2.0,
+                        help="Std ratio for statistical outlier removal.")
+    parser.add_argument("--denoise-radius", type=float, default=0.05,
+                        help="Radius for radius outlier removal (meters).")
+    parser.add_argument("--denoise-min-neighbors", type=int, default=5,
+                        help="Minimum neighbours within the radius.")
+
+
+def denoise_options(args):
+    """Keyword arguments for `outlier_mask` from parsed flags, or None if disabled."""
+    if args.denoise == 'none':
+        return None
+    return {"method": args.denoise, "nb_neighbors": args.denoise_k, "std_ratio": args.denoise_std,
+            "radius": args.denoise_radius, "min_neighbors": args.denoise_min_neighbors}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Remove statistical/radius outliers from a PLY file.")
+    parser.add_argument("input", help="Input PLY file")
+    parser.add_argument("output", help="Output PLY file (all vertex properties are kept)")
+    parser.add_argument("--method", choices=DENOISE_METHODS[1:], default="statistical")
+    parser.add_argument("--k", type=int, default=20, help="Neighbours for statistical outlier removal.")
+    parser.add_argument("--std-ratio", type=float, default=2.0, help="Std ratio for statistical outlier removal.")
+    parser.add_argument("--radius", type=float, default=0.05, help="Radius for radius outlier removal (meters).")
+    parser.add_argument("--min-neighbors", type=int, default=5, help="Minimum neighbours within the radius.")
+    args = parser.parse_args()
+
+    # Raw vertices (no splat pruning) so the mask lines up with the output rows
+    points, _ = load_points_cached(args.input, with_colors=False, min_opacity=0)
+    keep = outlier_mask(points, args.method, args.k, args.std_ratio, args.radius, args.min_neighbors,
+                        ply_path=args.input, mask_path=os.path.splitext(args.output)[0] + "_" + MASK_FILENAME)
+    write_ply(args.output, read_ply(args.input)[keep])
+    print(f"Wrote {keep.sum()} points to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
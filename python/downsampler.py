@@ -1,36 +1,343 @@
-import open3d as o3d
+import sys
+import argparse
 import numpy as np
 
-def process_eth3d_point_cloud(input_file, voxel_size=0.005, remove_ceiling=True):
+try:
+    import open3d as o3d
+except ImportError:
+    o3d = None
+
+from ply_io import (read_ply, ply_points, ply_bounds, ply_colors, ply_color_fields, vertex_array, write_ply,
+                    write_ply_elements, is_gaussian_splat, splat_keep_mask, add_splat_arguments, splat_options,
+                    PYRAMID_COMMENT, DEFAULT_MIN_OPACITY)
+from scene_profile import get_scene_profile
+
+# Default pyramid resolutions (meters): wall extraction, concave boundary, coarse views, raycasting
+DEFAULT_PYRAMID_LEVELS = (0.005, 0.02, 0.05, 0.1)
+
+# Per-voxel reducers available to build_voxel_pyramid
+PYRAMID_REDUCERS = ('mean', 'sum', 'min', 'max', 'first')
+
+def _reduce_by_key(keys, values):
+    """
+    Sum the rows of `values` that share a key.
+    
+    Parameters:
+    - keys: N int64 keys
+    - values: NxM float array
+    
+    Returns:
+    - (sorted unique keys, KxM summed values)
+    """
+    unique_keys, inverse = np.unique(keys, return_inverse=True)
+    sums = np.empty((len(unique_keys), values.shape[1]))
+    for j in range(values.shape[1]):
+        sums[:, j] = np.bincount(inverse, weights=values[:, j], minlength=len(unique_keys))
+    return unique_keys, sums
+
+def voxel_grid(bounds, voxel_size):
+    """
+    The voxel grid shared by the downsampling routines: anchored at
+    min_bound - voxel_size / 2 like Open3D's voxel_down_sample
+    
+    Parameters:
+    - bounds: {"min": [x, y, z], "max": [x, y, z]} of the cloud
+    - voxel_size: Voxel size (meters)
+    
+    Returns:
+    - (origin, dims): grid origin (3,) and number of voxels per axis (3,)
+    """
+    origin = np.asarray(bounds["min"], dtype=np.float64) - voxel_size * 0.5
+    dims = np.floor((np.asarray(bounds["max"], dtype=np.float64) - origin) / voxel_size).astype(np.int64) + 1
+    return origin, dims
+
+def _voxel_sums(points, colors, origin, dims, voxel_size):
+    """
+    Point count, coordinate sums and colour sums per occupied voxel of one chunk
+    
+    Returns:
+    - (sorted voxel keys, Kx4 or Kx7 rows [count, sum_x, sum_y, sum_z(, sum_r, sum_g, sum_b)])
+    
+    Raises:
+    - ValueError: if a point lies outside the grid (points are never merged into border voxels)
+    """
+    voxel_index = np.floor((points - origin) / voxel_size).astype(np.int64)
+    if np.any(voxel_index < 0) or np.any(voxel_index >= dims):
+        raise ValueError("Points outside the voxel grid bounds")
+    keys = (voxel_index[:, 0] * dims[1] + voxel_index[:, 1]) * dims[2] + voxel_index[:, 2]
+    columns = [np.ones((len(points), 1)), points]
+    if colors is not None:
+        columns.append(colors)
+    return _reduce_by_key(keys, np.hstack(columns))
+
+def _voxel_means(values, has_colors):
+    counts = values[:, :1]
+    return values[:, 1:4] / counts, (values[:, 4:7] / counts if has_colors else None)
+
+def voxel_down_sample(points, colors, voxel_size):
+    """
+    Voxel-downsample in-memory arrays on the same grid as stream_voxel_down_sample
+    
+    Parameters:
+    - points: Nx3 points
+    - colors: Nx3 colours or None
+    - voxel_size: Voxel size (meters)
+    
+    Returns:
+    - (Kx3 voxel-averaged points, Kx3 averaged colours or None)
+    """
+    points = np.asarray(points, dtype=np.float64)
+    origin, dims = voxel_grid({"min": points.min(axis=0), "max": points.max(axis=0)}, voxel_size)
+    _, values = _voxel_sums(points, colors, origin, dims, voxel_size)
+    return _voxel_means(values, colors is not None)
+
+def stream_voxel_down_sample(vertices, voxel_size, bounds=None, chunk_size=5_000_000,
+                             min_opacity=DEFAULT_MIN_OPACITY, max_scale=None):
+    """
+    Voxel-downsample a PLY in fixed-size chunks, for files larger than RAM
+    
+    Each chunk updates a running voxel-hash accumulator (point count, coordinate
+    sums and colour sums per occupied voxel), so memory scales with the number of
+    occupied voxels rather than the input size. The voxel grid and averaging match
+    Open3D's voxel_down_sample (grid anchored at min_bound - voxel_size / 2).
+    
+    Parameters:
+    - vertices: Structured vertex array from ply_io.read_ply (usually a memmap) or a PLY path
+    - voxel_size: Voxel size (meters)
+    - bounds: Exact {"min": [x, y, z], "max": [x, y, z]} of the cloud; by default
+      computed with one extra streaming min/max pass (ply_io.ply_bounds)
+    - chunk_size: Number of points read per chunk
+    - min_opacity, max_scale: Gaussian splat files: splats to drop in each chunk
+      (see ply_io.splat_keep_mask)
+    
+    Returns:
+    - (Kx3 voxel-averaged points, Kx3 averaged colours in [0, 1] or None)
+    
+    Raises:
+    - ValueError: if a point lies outside `bounds` (points are never merged into border voxels)
+    """
+    if isinstance(vertices, str):
+        vertices = read_ply(vertices)
+    has_colors = ply_colors(vertices[:1]) is not None
+    prune = is_gaussian_splat(vertices)
+    if bounds is None:
+        bounds = ply_bounds(vertices, chunk_size, *((min_opacity, max_scale) if prune else ()))
+    
+    origin, dims = voxel_grid(bounds, voxel_size)
+    
+    # Accumulator rows: [count, sum_x, sum_y, sum_z(, sum_r, sum_g, sum_b)]
+    acc_keys = np.empty(0, dtype=np.int64)
+    acc_values = np.empty((0, 7 if has_colors else 4))
+    
+    for start in range(0, len(vertices), chunk_size):
+        chunk = vertices[start:start + chunk_size]
+        if prune:
+            chunk = chunk[splat_keep_mask(chunk, min_opacity, max_scale)]
+        if len(chunk) == 0:
+            continue
+        chunk_keys, chunk_values = _voxel_sums(ply_points(chunk), ply_colors(chunk) if has_colors else None,
+                                               origin, dims, voxel_size)
+        
+        # Merge the reduced chunk into the running accumulator
+        acc_keys, acc_values = _reduce_by_key(np.concatenate((acc_keys, chunk_keys)),
+                                              np.vstack((acc_values, chunk_values)))
+        print(f"Processed {min(start + chunk_size, len(vertices))}/{len(vertices)} points, "
+              f"{len(acc_keys)} occupied voxels")
+    
+    return _voxel_means(acc_values, has_colors)
+
+def _reduce_level(vertices, weights, voxel_index, reducers):
+    """
+    Aggregate every property of `vertices` per voxel with a single sort.
+    
+    Parameters:
+    - vertices: Structured array of points (or of a finer pyramid level)
+    - weights: N point counts per row (1 for raw points)
+    - voxel_index: Nx3 int64 voxel indices
+    - reducers: {field: reducer name}, fields not listed use 'mean'
+    
+    Returns:
+    - (structured level array with an extra 'count' field, Kx3 voxel indices)
+    """
+    # Shift to non-negative indices (points may lie below a user-given origin)
+    shifted = voxel_index - voxel_index.min(axis=0)
+    dims = shifted.max(axis=0) + 1
+    keys = (shifted[:, 0] * dims[1] + shifted[:, 1]) * dims[2] + shifted[:, 2]
+    order = np.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+    starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+    
+    sorted_weights = weights[order].astype(np.float64)
+    counts = np.add.reduceat(sorted_weights, starts)
+    
+    fields = [name for name in vertices.dtype.names if name != 'count']
+    level = np.empty(len(starts), dtype=[(name, vertices.dtype[name].newbyteorder('<')) for name in fields]
+                     + [('count', '<u4')])
+    for name in fields:
+        reducer = reducers.get(name, 'mean')
+        values = np.asarray(vertices[name])[order]
+        if reducer == 'mean':
+            reduced = np.add.reduceat(values * sorted_weights, starts) / counts
+        elif reducer == 'sum':
+            reduced = np.add.reduceat(values.astype(np.float64), starts)
+        elif reducer == 'min':
+            reduced = np.minimum.reduceat(values, starts)
+        elif reducer == 'max':
+            reduced = np.maximum.reduceat(values, starts)
+        elif reducer == 'first':
+            reduced = values[starts]
+        else:
+            raise ValueError(f"Unknown reducer '{reducer}' for '{name}', expected one of {PYRAMID_REDUCERS}")
+        
+        if np.issubdtype(level.dtype[name], np.integer):
+            info = np.iinfo(level.dtype[name])
+            reduced = np.clip(np.rint(reduced), info.min, info.max)
+        level[name] = reduced
+    level['count'] = counts
+    return level, voxel_index[order[starts]]
+
+def build_voxel_pyramid(vertices, voxel_sizes=DEFAULT_PYRAMID_LEVELS, reducers=None, origin=None):
+    """
+    Voxel-downsample a cloud to several resolutions, keeping every PLY property
+    
+    All levels share one grid origin, so when a voxel size is an integer multiple
+    of the previous one the coarser level is aggregated from the finer level
+    (count-weighted) instead of from the raw points. Each level is produced by
+    one sort over voxel keys followed by ufunc.reduceat per property, so normals,
+    opacity, scales, SH coefficients etc. are carried along with positions and colours.
+    
+    Parameters:
+    - vertices: Structured vertex array from ply_io.read_ply or a PLY path
+    - voxel_sizes: Voxel sizes of the levels (meters)
+    - reducers: {field: 'mean' | 'sum' | 'min' | 'max' | 'first'}, default 'mean' for all fields
+    - origin: Grid origin (defaults to the minimum corner of the cloud)
+    
+    Returns:
+    - List of (voxel_size, structured level array) from finest to coarsest; each
+      level has the input fields plus a 'count' field with the number of source points
+    """
+    if isinstance(vertices, str):
+        vertices = read_ply(vertices)
+    reducers = reducers or {}
+    points = ply_points(vertices)
+    if origin is None:
+        origin = points.min(axis=0)
+    origin = np.asarray(origin, dtype=np.float64)
+    
+    levels = []
+    previous = None
+    for voxel_size in sorted(voxel_sizes):
+        ratio = voxel_size / previous[0] if previous is not None else 0.0
+        if ratio >= 1 and abs(ratio - round(ratio)) < 1e-6:
+            # Nested grid: aggregate the finer level's voxels
+            _, finer, finer_index = previous
+            voxel_index = finer_index // int(round(ratio))
+            level, voxel_index = _reduce_level(finer, finer['count'], voxel_index, reducers)
+        else:
+            voxel_index = np.floor((points - origin) / voxel_size).astype(np.int64)
+            level, voxel_index = _reduce_level(vertices, np.ones(len(vertices)), voxel_index, reducers)
+        print(f"Pyramid level {voxel_size}m: {len(level)} voxels")
+        levels.append((voxel_size, level))
+        previous = (voxel_size, level, voxel_index)
+    return levels
+
+def save_voxel_pyramid(output_file, levels, ascii=False):
+    """
+    Save pyramid levels into one PLY container
+    
+    The finest level is the regular 'vertex' element (so plain PLY readers see a
+    normal point cloud); coarser levels follow as 'level_1', 'level_2', ... and
+    are listed in header comments. Open a level with ply_io.read_pyramid_level.
+    
+    Parameters:
+    - output_file: Path of the container .ply
+    - levels: Output of build_voxel_pyramid
+    - ascii: Write ASCII instead of binary PLY
+    """
+    elements = {}
+    comments = []
+    for i, (voxel_size, level) in enumerate(levels):
+        name = 'vertex' if i == 0 else f'level_{i}'
+        elements[name] = level
+        comments.append(f"{PYRAMID_COMMENT} {name} {voxel_size:g}")
+    write_ply_elements(output_file, elements, ascii=ascii, comments=comments)
+
+def process_voxel_pyramid(input_file, output_file, voxel_sizes=DEFAULT_PYRAMID_LEVELS, reducers=None,
+                          chunk_size=5_000_000, min_opacity=DEFAULT_MIN_OPACITY, max_scale=None):
+    """
+    Build a voxel pyramid from a PLY file and save it as one container
+    
+    Gaussian splat files are pruned first, so no level carries floaters.
+    
+    Parameters:
+    - input_file: Path to the input .ply file
+    - output_file: Path of the pyramid container .ply
+    - voxel_sizes: Voxel sizes of the levels (meters)
+    - reducers: Per-field reducers (see build_voxel_pyramid)
+    - chunk_size: Number of splats pruned per chunk
+    - min_opacity, max_scale: Gaussian splat pruning thresholds (see ply_io.splat_keep_mask)
+    
+    Returns:
+    - List of (voxel_size, structured level array) from finest to coarsest
+    """
+    vertices = read_ply(input_file)
+    if is_gaussian_splat(vertices):
+        kept = [chunk[splat_keep_mask(chunk, min_opacity, max_scale)]
+                for chunk in (vertices[start:start + chunk_size] for start in range(0, len(vertices), chunk_size))]
+        print(f"Kept {sum(len(chunk) for chunk in kept)}/{len(vertices)} Gaussians")
+        vertices = np.concatenate(kept) if kept else vertices[:0]
+    levels = build_voxel_pyramid(vertices, voxel_sizes, reducers)
+    save_voxel_pyramid(output_file, levels)
+    print(f"Saved {len(levels)} pyramid levels to {output_file}")
+    return levels
+
+def process_eth3d_point_cloud(input_file, voxel_size=0.005, remove_ceiling=True, ceiling_margin=0.1,
+                              chunk_size=5_000_000, min_opacity=DEFAULT_MIN_OPACITY, max_scale=None):
     """
     Process ETH3d point cloud dataset .ply file
     
+    The PLY is memory-mapped and streamed in chunks, so clouds larger than RAM
+    can be processed; only the downsampled cloud is held in memory.
+    
     Parameters:
     - input_file: Path to the input .ply file
     - voxel_size: Voxel size for downsampling (default 0.05 meters)
     - remove_ceiling: Whether to remove ceiling points (default True)
+    - ceiling_margin: Distance below the estimated ceiling that is also removed (meters)
+    - chunk_size: Number of points streamed per chunk
+    - min_opacity, max_scale: Gaussian splat pruning thresholds (see ply_io.splat_keep_mask)
     
     Returns:
     - Processed point cloud
     """
-    # Read the point cloud
-    pcd = o3d.io.read_point_cloud(input_file)
+    if o3d is None:
+        raise ImportError("open3d is required: pip install open3d")
+    
+    # Memory-map the point cloud; nothing is read until it is streamed
+    vertices = read_ply(input_file)
     
     # Print initial point cloud information for debugging
     print("Original Point Cloud:")
-    print(f"Number of points: {len(pcd.points)}")
-    print(f"Has colors: {len(pcd.colors) > 0}")
+    print(f"Number of points: {len(vertices)}")
+    print(f"Has colors: {ply_color_fields(vertices) is not None}")
     
-    # Downsample using voxel grid
-    downsampled_pcd = pcd.voxel_down_sample(voxel_size=voxel_size)
+    # Shared scene profile (cached next to the PLY) for the ceiling estimate
+    profile = get_scene_profile(input_file)
     
-    # Convert points to numpy array for processing
-    points = np.asarray(downsampled_pcd.points)
-    colors = np.asarray(downsampled_pcd.colors)
+    # Downsample using a streaming voxel grid (bounds from its own min/max pass)
+    points, colors = stream_voxel_down_sample(vertices, voxel_size, chunk_size=chunk_size,
+                                              min_opacity=min_opacity, max_scale=max_scale)
+    downsampled_pcd = o3d.geometry.PointCloud()
+    downsampled_pcd.points = o3d.utility.Vector3dVector(points)
+    if colors is not None:
+        downsampled_pcd.colors = o3d.utility.Vector3dVector(colors)
+    else:
+        colors = np.empty((0, 3))
     
     if remove_ceiling:
-        # Estimate ceiling height (95th percentile of z-coordinates)
-        ceiling_height_threshold = np.percentile(points[:, 2], 75)
+        # Ceiling height from the shared scene profile
+        ceiling_height_threshold = profile["ceiling_height"] - ceiling_margin
+        print(f"Removing points above {ceiling_height_threshold:.3f}m (ceiling at {profile['ceiling_height']:.3f}m)")
         
         # Create mask for points below ceiling
         mask = points[:, 2] < ceiling_height_threshold
@@ -64,7 +371,8 @@ def save_point_cloud(pcd, output_file):
     - pcd: Processed point cloud
     - output_file: Path to save the processed point cloud
     """
-    o3d.io.write_point_cloud(output_file, pcd)
+    colors = np.asarray(pcd.colors) if pcd.has_colors() else None
+    write_ply(output_file, vertex_array(np.asarray(pcd.points), colors, point_dtype='f8'))
 
 def visualize_point_cloud(pcd):
     """
@@ -76,20 +384,35 @@ def visualize_point_cloud(pcd):
     o3d.visualization.draw_geometries([pcd])
 
 
-
-if __name__ == "__main__":
-    input_file = 'delivery_area/scan_clean/scan1.ply'  # Replace with your input .ply file path
-    output_file = 'processed.ply'  # Replace with your desired output path
+def main():
+    parser = argparse.ArgumentParser(description="Downsample a point cloud, or build a voxel pyramid container.")
+    parser.add_argument("input", nargs='?', default='delivery_area/scan_clean/scan1.ply', help="Input PLY file")
+    parser.add_argument("output", nargs='?', default='processed.ply', help="Output PLY file")
+    parser.add_argument("--voxel-size", type=float, default=0.005, help="Voxel size for downsampling (meters).")
+    parser.add_argument("--keep-ceiling", action="store_true", help="Do not remove ceiling points.")
+    parser.add_argument("--pyramid", type=float, nargs='+', default=None, metavar="VOXEL_SIZE",
+                        help="Write a voxel pyramid container with these level sizes instead "
+                             f"(e.g. {' '.join(f'{size:g}' for size in DEFAULT_PYRAMID_LEVELS)}).")
+    parser.add_argument("--no-visualize", action="store_true", help="Do not open the 3D viewer.")
+    add_splat_arguments(parser)
+    args = parser.parse_args()
+    
+    if args.pyramid:
+        process_voxel_pyramid(args.input, args.output, args.pyramid, **splat_options(args))
+        return 0
     
     # Process point cloud
-    processed_pcd = process_eth3d_point_cloud(
-        input_file, 
-        voxel_size=0.005,  # Adjust voxel size as needed
-        remove_ceiling=True
-    )
+    processed_pcd = process_eth3d_point_cloud(args.input, voxel_size=args.voxel_size,
+                                              remove_ceiling=not args.keep_ceiling, **splat_options(args))
     
     # Visualize processed point cloud
-    o3d.visualization.draw_geometries([processed_pcd])
+    if not args.no_visualize:
+        visualize_point_cloud(processed_pcd)
     
     # Save processed point cloud
-    save_point_cloud(processed_pcd, output_file)
+    save_point_cloud(processed_pcd, args.output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+Shared DXF export for the floorplan tools.
+
+Dimensioning every segment of a raw contour with add_aligned_dim(...).render()
+creates one anonymous block per dimension, and that dominated the export time.
+This module builds the geometry first and writes it in one pass:
+  - dimensions go on straight runs, not on raw segments: each polyline is
+    simplified for dimensioning and near-collinear consecutive spans are merged
+  - duplicates (the two faces of a wall, spans shared by contours) are dropped
+  - spans shorter than max(dim_min_length, dim_scale_fraction * drawing
+    diagonal) are skipped, so the threshold follows the drawing size
+  - dim_mode:
+      full         DIMENSION entities (rendered blocks), as before
+      lightweight  an MTEXT label plus one leader polyline (extension and
+                   dimension lines) per dimension; no blocks
+      none         geometry only
+
+Usage:
+  export_dxf("plan.dxf", [{"points": contour, "closed": True, "layer": "WALLS"}],
+             dim_mode="lightweight", dim_min_length=0.5)
+"""
+
+import time
+import numpy as np
+from scipy.spatial import cKDTree
+
+try:
+    import ezdxf
+except ImportError:
+    ezdxf = None
+
+try:
+    from skimage.measure import approximate_polygon
+except ImportError:
+    approximate_polygon = None
+
+DIM_MODES = ('full', 'lightweight', 'none')
+DIM_STYLE_NAME = 'ARCH_METRIC'
+
+
+def _merge_collinear_spans(points, closed, angle_tolerance_deg):
+    """Drop vertices where a polyline turns by less than the tolerance (vectorized)."""
+    if len(points) < 3:
+        return points
+    ring = points[:-1] if closed and np.allclose(points[0], points[-1]) else points
+    edges = np.roll(ring, -1, axis=0) - ring if closed else np.diff(ring, axis=0)
+    angles = np.arctan2(edges[:, 1], edges[:, 0])
+    turn = np.abs(np.mod(angles - np.roll(angles, 1) + np.pi, 2 * np.pi) - np.pi)
+    keep = turn > np.radians(angle_tolerance_deg)
+    if closed:
+        if not np.any(keep):
+            return points
+        kept = ring[keep]
+        return np.vstack((kept, kept[:1]))
+    # Open polylines always keep their end vertices
+    keep = np.concatenate(([True], keep[1:], [True]))
+    return ring[keep]
+
+
+def dimension_spans(points, closed=False, tolerance=0.05, angle_tolerance_deg=3.0):
+    """
+    Straight runs of a polyline to dimension, as Kx4 spans (x1, y1, x2, y2).
+
+    The polyline is simplified with Douglas-Peucker at `tolerance` (scikit-image,
+    when available), then consecutive spans turning by less than
+    `angle_tolerance_deg` are merged.
+    """
+    points = np.asarray(points, dtype=np.float64)[:, :2]
+    if len(points) < 2:
+        return np.empty((0, 4))
+    if closed and not np.allclose(points[0], points[-1]):
+        points = np.vstack((points, points[:1]))
+    if approximate_polygon is not None and tolerance > 0:
+        points = approximate_polygon(points, tolerance)
+    points = _merge_collinear_spans(points, closed, angle_tolerance_deg)
+    return np.hstack((points[:-1], points[1:]))
+
+
+def deduplicate_spans(spans, distance=0.5, angle_tolerance_deg=3.0, min_overlap=0.9):
+    """
+    Drop spans that repeat a longer one: parallel, within `distance` of its line and
+    overlapping it by at least `min_overlap` of both lengths (e.g. the two faces of a wall).
+    """
+    if len(spans) < 2:
+        return spans
+    delta = spans[:, 2:4] - spans[:, 0:2]
+    lengths = np.hypot(delta[:, 0], delta[:, 1])
+    directions = delta / np.maximum(lengths, 1e-12)[:, None]
+    midpoints = (spans[:, 0:2] + spans[:, 2:4]) / 2
+    # Duplicates have nearby midpoints; only those pairs are compared
+    pairs = cKDTree(midpoints).query_pairs(distance, output_type='ndarray')
+    if len(pairs) == 0:
+        return spans
+    i, j = pairs[:, 0], pairs[:, 1]
+    parallel = np.abs(np.einsum('ij,ij->i', directions[i], directions[j])) >= np.cos(np.radians(angle_tolerance_deg))
+    t_a = np.einsum('ij,ij->i', spans[i, 0:2] - spans[j, 0:2], directions[j])
+    t_b = np.einsum('ij,ij->i', spans[i, 2:4] - spans[j, 0:2], directions[j])
+    overlap = np.minimum(np.maximum(t_a, t_b), lengths[j]) - np.maximum(np.minimum(t_a, t_b), 0.0)
+    duplicate = parallel & (overlap >= min_overlap * np.maximum(lengths[i], lengths[j]))
+    # Of each duplicate pair the shorter span goes (ties: the later one)
+    drop = np.where(lengths[i[duplicate]] >= lengths[j[duplicate]], j[duplicate], i[duplicate])
+    keep = np.ones(len(spans), dtype=bool)
+    keep[drop] = False
+    return spans[keep]
+
+
+def new_document(layers=None):
+    """
+    New R2010 DXF document with the ARCH_METRIC dimension style.
+
+    Args:
+        layers (dict, optional): {layer name: ACI colour} to create.
+    """
+    doc = ezdxf.new('R2010')
+    for name, color in (layers or {}).items():
+        if name not in doc.layers:
+            doc.layers.add(name=name, color=color)
+    if DIM_STYLE_NAME not in doc.dimstyles:
+        doc.dimstyles.new(DIM_STYLE_NAME, dxfattribs={'dimtxt': 0.1, 'dimasz': 0.05, 'dimblk': 'ARCHTICK',
+                                                      'dimclrd': ezdxf.colors.RED, 'dimclrt': ezdxf.colors.RED,
+                                                      'dimdec': 2, 'dimpost': '<> m', 'dimtad': 1})
+    return doc
+
+
+def _lightweight_dimension(span, offset, text_height):
+    """Leader polyline (extension + dimension lines) and label placement of one span."""
+    p1, p2 = span[0:2], span[2:4]
+    delta = p2 - p1
+    length = np.hypot(*delta)
+    normal = np.array([-delta[1], delta[0]]) / length
+    leader = [p1, p1 + offset * normal, p2 + offset * normal, p2]
+    angle = np.degrees(np.arctan2(delta[1], delta[0]))
+    # Keep labels readable (never upside down)
+    if angle > 90 or angle <= -90:
+        angle -= 180 if angle > 0 else -180
+    label = (p1 + p2) / 2 + (offset + 0.6 * text_height) * normal
+    return leader, label, angle, length
+
+
+def export_dxf(path, polylines, dim_mode='full', dim_min_length=0.5, dim_scale_fraction=0.01,
+               dim_offset=None, text_height=None, simplify_tolerance=0.05, dedup_distance=0.5,
+               layer_colors=None):
+    """
+    Write polylines and their deduplicated dimensions to a DXF file in one pass.
+
+    Args:
+        path (str): Output DXF path.
+        polylines (list): [{"points": Nx2, "closed": bool, "layer": str,
+                            "dim_layer": str (default "DIMENSIONS"),
+                            "dim_spans": Kx4 spans to dimension instead of the polyline's runs (optional)}]
+        dim_mode (str): 'full', 'lightweight' or 'none' (see module docstring).
+        dim_min_length (float): Minimum dimensioned length (meters).
+        dim_scale_fraction (float): Also skip spans shorter than this fraction of the drawing diagonal.
+        dim_offset (float, optional): Dimension line offset (default: 2 * text height).
+        text_height (float, optional): Label height (default: 1% of the diagonal, within 0.05-0.5 m).
+        simplify_tolerance (float): Douglas-Peucker tolerance of the dimensioned runs (meters).
+        dedup_distance (float): Maximum distance between duplicate spans (meters; 0 disables).
+        layer_colors (dict, optional): {layer name: ACI colour}.
+    Returns:
+        dict: {"entities", "dimensions", "seconds"}
+    """
+    if ezdxf is None:
+        raise ImportError("ezdxf is required for DXF export")
+    if dim_mode not in DIM_MODES:
+        raise ValueError(f"Unknown dimension mode '{dim_mode}', expected one of {DIM_MODES}")
+    start = time.time()
+    polylines = [p for p in polylines if len(p["points"]) >= 2]
+    if polylines:
+        all_points = np.vstack([np.asarray(p["points"], dtype=np.float64)[:, :2] for p in polylines])
+        diagonal = float(np.linalg.norm(all_points.max(axis=0) - all_points.min(axis=0)))
+    else:
+        diagonal = 0.0
+    if text_height is None:
+        text_height = float(np.clip(0.01 * diagonal, 0.05, 0.5))
+    if dim_offset is None:
+        dim_offset = 2 * text_height
+    min_length = max(dim_min_length, dim_scale_fraction * diagonal)
+
+    # Geometry first: dimension spans per dimension layer
+    spans_by_layer = {}
+    if dim_mode != 'none':
+        for p in polylines:
+            spans = p.get("dim_spans")
+            if spans is None:
+                spans = dimension_spans(p["points"], p.get("closed", False), simplify_tolerance)
+            spans = np.asarray(spans, dtype=np.float64).reshape(-1, 4)
+            spans_by_layer.setdefault(p.get("dim_layer", "DIMENSIONS"), []).append(spans)
+        for layer, spans in spans_by_layer.items():
+            spans = np.vstack(spans)
+            spans = spans[np.hypot(spans[:, 2] - spans[:, 0], spans[:, 3] - spans[:, 1]) >= min_length]
+            spans_by_layer[layer] = deduplicate_spans(spans, dedup_distance) if dedup_distance > 0 else spans
+
+    layers = {p["layer"]: ezdxf.colors.WHITE for p in polylines}
+    layers.update({layer: ezdxf.colors.RED for layer in spans_by_layer})
+    layers.update(layer_colors or {})
+    doc = new_document(layers)
+    msp = doc.modelspace()
+
+    # One bulk pass over all entities
+    entities = 0
+    for p in polylines:
+        msp.add_lwpolyline(np.asarray(p["points"], dtype=np.float64)[:, :2].tolist(),
+                           close=bool(p.get("closed", False)), dxfattribs={'layer': p["layer"]})
+        entities += 1
+    dimensions = 0
+    for layer, spans in spans_by_layer.items():
+        for span in spans:
+            if dim_mode == 'full':
+                try:
+                    msp.add_aligned_dim(p1=tuple(span[0:2]), p2=tuple(span[2:4]), distance=dim_offset,
+                                        dimstyle=DIM_STYLE_NAME, dxfattribs={'layer': layer}).render()
+                except Exception as e:
+                    print(f"Warning: Could not add dimension: {e}")
+                    continue
+                entities += 1
+            else:
+                leader, label, angle, length = _lightweight_dimension(span, dim_offset, text_height)
+                msp.add_lwpolyline([tuple(v) for v in leader], dxfattribs={'layer': layer})
+                msp.add_mtext(f"{length:.2f} m", dxfattribs={
+                    'layer': layer, 'char_height': text_height, 'rotation': angle,
+                    'attachment_point': 5, 'insert': tuple(label)})
+                entities += 2
+            dimensions += 1
+    doc.saveas(str(path))
+    return {"entities": entities, "dimensions": dimensions, "seconds": time.time() - start}
+
+
+def add_dxf_arguments(parser):
+    """Add the shared DXF dimension flags to a tool's argument parser."""
+    parser.add_argument("--dim-mode", choices=DIM_MODES, default="full",
+                        help="DXF dimensions: full DIMENSION entities, lightweight MTEXT + leader lines, or none.")
+    parser.add_argument("--dim-scale", type=float, default=0.01,
+                        help="Skip dimensions shorter than this fraction of the drawing diagonal.")
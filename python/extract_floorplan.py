@@ -3,17 +3,31 @@
 Extract a wall-based floorplan (without simplification) from a 3D point cloud PLY file,
 vectorize it into polylines, and output a DXF with annotated wall lengths.
 Focus on tuning parameters to get a good intermediate grid image.
+With --levels, every storey detected from the z-histogram is extracted from a single load.
 """
 
 import os
 import sys
+import json
 import numpy as np
-import open3d as o3d
 import matplotlib.pyplot as plt
 from pathlib import Path
 import argparse
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
 from scipy.ndimage import binary_dilation, binary_erosion, binary_closing, gaussian_filter
 
+from ply_io import vertex_array, write_ply, add_splat_arguments, splat_options
+from point_cache import load_points_cached
+from denoise import outlier_mask, add_denoise_arguments, denoise_options, MASK_FILENAME
+from raster import rasterize, raster_bounds, density_mask, save_raster
+from scene_profile import get_scene_profile, detect_floor_levels
+from z_index import load_or_build_z_index, z_slice
+from wall_segments import extract_wall_graph, save_wall_graph
+from dxf_export import export_dxf, add_dxf_arguments
+from tiled_raster import (use_tiles, tiled_occupancy, tiled_filter, tiled_contours, tiled_preview, wall_grid_halo,
+                          occupied_cells, tiled_nbytes, DEFAULT_TILE_SIZE)
+
 # Attempt to import optional dependencies
 try:
     from skimage import measure
@@ -23,114 +37,28 @@ except ImportError:
     print("Warning: scikit-image not found. Contour extraction will be skipped.")
 
 try:
-    import ezdxf
+    import ezdxf  # noqa: F401 (DXF output through dxf_export)
     ezdxf_available = True
 except ImportError:
     ezdxf_available = False
     print("Warning: ezdxf not found. DXF output will be skipped.")
 
+# Default grid cleanup parameters (see floorplan_sweep.py to tune them)
+DEFAULT_MORPHOLOGY = {
+    "dilate_iterations": 3,  # Try increasing (e.g., 3, 4) if walls are broken
+    "erode_iterations": 1,   # Try decreasing (e.g., 1, 0) if walls vanish
+    "close_iterations": 3,   # Try increasing (e.g., 3, 4, 5) to fill gaps
+    "gaussian_sigma": 1.5,   # Try increasing (e.g., 1.5, 2.0) to connect nearby blobs
+    "threshold": 0.4,        # Try decreasing (e.g., 0.4, 0.3) if walls are faint after smoothing
+}
 
-def extract_wall_floorplan_basic(input_file, output_dir, wall_height=None, slice_thickness=0.1,
-                                 grid_size=0.05, auto_height_offset=1.2,
-                                 min_contour_length=10, dim_min_length=0.5):
+
+def process_wall_grid(grid, dilate_iterations=3, erode_iterations=1, close_iterations=3,
+                      gaussian_sigma=1.5, threshold=0.4):
     """
-    Extracts, processes, vectorizes (no simplify), and exports a floorplan.
-    Focus on tuning slice height and internal image processing parameters.
+    Clean a binary wall grid with dilation, erosion, closing and a Gaussian smooth + threshold.
+    Returns the processed uint8 grid.
     """
-    output_path = Path(output_dir)
-    output_path.mkdir(parents=True, exist_ok=True)
-
-    print(f"Loading point cloud from {input_file}...")
-    try:
-        pcd = o3d.io.read_point_cloud(input_file)
-        if not pcd.has_points():
-            print("Error: Point cloud is empty.")
-            return False
-        points = np.asarray(pcd.points)
-    except Exception as e:
-        print(f"Error loading point cloud: {e}")
-        return False
-    print(f"Loaded {len(points)} points.")
-
-    floor_height = None
-    if wall_height is None:
-        print("Auto-detecting floor height...")
-        heights = points[:, 2]
-        if len(heights) == 0:
-             print("Error: No points found to determine height.")
-             return False
-        try:
-            floor_height = np.percentile(heights, 5) # Robust floor estimate
-            wall_height = floor_height + auto_height_offset
-            print(f"Detected floor near {floor_height:.3f}m")
-            print(f"Taking wall slice at {wall_height:.3f}m (floor + {auto_height_offset}m)")
-        except IndexError:
-             print("Error: Could not calculate floor height.")
-             return False
-    else:
-        print(f"Using specified wall height: {wall_height:.3f}m")
-
-    slice_min_z = wall_height - slice_thickness / 2
-    slice_max_z = wall_height + slice_thickness / 2
-    mask = (points[:, 2] >= slice_min_z) & (points[:, 2] < slice_max_z)
-    wall_points = points[mask]
-
-    if len(wall_points) == 0:
-        print(f"Error: No points found in slice {slice_min_z:.3f}m - {slice_max_z:.3f}m.")
-        # Suggest alternative heights based on point density peaks
-        try:
-            hist, edges = np.histogram(points[:, 2], bins=100) # More bins might help
-            centers = (edges[:-1] + edges[1:]) / 2
-            peak_indices = np.argsort(hist)[-10:]
-            print("\nPotential heights with more points (bin centers):")
-            for i in reversed(peak_indices):
-                 if hist[i] > 50: # Suggest bins with at least 50 points
-                      print(f"  --height {centers[i]:.3f}  ({hist[i]} points in bin)")
-        except Exception as e:
-            print(f"Could not analyze height distribution: {e}")
-        return False
-    print(f"Found {len(wall_points)} points in wall slice.")
-
-    wall_pcd = o3d.geometry.PointCloud()
-    wall_pcd.points = o3d.utility.Vector3dVector(wall_points)
-    wall_ply_path = output_path / "wall_points.ply"
-    o3d.io.write_point_cloud(str(wall_ply_path), wall_pcd)
-    print(f"Saved wall points to {wall_ply_path}")
-
-    if len(wall_points) < 2:
-         print("Error: Not enough points in slice for bounds calculation.")
-         return False
-    min_x, max_x = np.min(wall_points[:, 0]), np.max(wall_points[:, 0])
-    min_y, max_y = np.min(wall_points[:, 1]), np.max(wall_points[:, 1])
-    x_range = max_x - min_x
-    y_range = max_y - min_y
-    padding = 0.1 * max(x_range, y_range, 1.0)
-    min_x -= padding
-    max_x += padding
-    min_y -= padding
-    max_y += padding
-
-    grid_width = int((max_x - min_x) // grid_size) + 1
-    grid_height = int((max_y - min_y) // grid_size) + 1
-    if grid_width <= 0 or grid_height <= 0:
-         print(f"Error: Invalid grid dimensions calculated ({grid_height}x{grid_width}).")
-         return False
-    print(f"Creating grid ({grid_height} x {grid_width}) with cell size {grid_size}m")
-    grid = np.zeros((grid_height, grid_width), dtype=np.uint8)
-    xs = ((wall_points[:, 0] - min_x) / grid_size).astype(int)
-    ys = ((wall_points[:, 1] - min_y) / grid_size).astype(int)
-    valid_idx = (xs >= 0) & (xs < grid_width) & (ys >= 0) & (ys < grid_height)
-    grid[ys[valid_idx], xs[valid_idx]] = 1
-
-    # --- !!! EDIT THESE PARAMETERS FOR TUNING !!! ---
-    print("Processing grid image...")
-    dilate_iterations = 3  # Try increasing (e.g., 3, 4) if walls are broken
-    erode_iterations = 1   # Try decreasing (e.g., 1, 0) if walls vanish
-    close_iterations = 3   # Try increasing (e.g., 3, 4, 5) to fill gaps
-    gaussian_sigma = 1.5   # Try increasing (e.g., 1.5, 2.0) to connect nearby blobs
-    threshold = 0.4        # Try decreasing (e.g., 0.4, 0.3) if walls are faint after smoothing
-    # --- End of parameters to edit ---
-
     grid_processed = grid.copy()
     if dilate_iterations > 0:
         grid_processed = binary_dilation(grid_processed, iterations=dilate_iterations)
@@ -140,15 +68,102 @@ def extract_wall_floorplan_basic(input_file, output_dir, wall_height=None, slice
         grid_processed = binary_closing(grid_processed, iterations=close_iterations)
     if gaussian_sigma > 0:
         grid_smoothed = gaussian_filter(grid_processed.astype(float), sigma=gaussian_sigma)
-        grid_binary = (grid_smoothed > threshold).astype(np.uint8)
-        print(f"Applied Gaussian smooth (sigma={gaussian_sigma}) and threshold ({threshold})")
-    else:
-        grid_binary = grid_processed
-        print("Skipped Gaussian smoothing.")
-    # --- End Image Processing ---
+        return (grid_smoothed > threshold).astype(np.uint8)
+    return grid_processed.astype(np.uint8)
+
+
+def grid_contours(grid_binary, origin, grid_size, min_contour_length=10):
+    """
+    Trace the contours of a processed grid and convert them to world coordinates.
+    Contours with fewer than `min_contour_length` vertices are dropped.
+    """
+    min_x, min_y = origin
+    padded_grid = np.pad(grid_binary, pad_width=1, mode='constant', constant_values=0)
+    raw_contours_grid = measure.find_contours(padded_grid, 0.5) # Threshold fixed at 0.5 for find_contours
 
+    contours_world = []
+    for contour_grid in raw_contours_grid:
+        if len(contour_grid) < min_contour_length:
+            continue
+        contour_world = np.empty_like(contour_grid)
+        contour_world[:, 0] = (contour_grid[:, 1] - 1) * grid_size + min_x
+        contour_world[:, 1] = (contour_grid[:, 0] - 1) * grid_size + min_y
+        contours_world.append(contour_world)
+    return contours_world
+
+
+def clean_wall_grid(wall_points, grid_size, min_density, params, tile_size=None, raster_path=None):
+    """
+    Rasterize a wall slice (10% padding) and clean it with process_wall_grid.
+
+    Grids larger than tiled_raster.DENSE_CELL_LIMIT cells (or any grid, with
+    `tile_size` > 0; 0 forces dense) are built and cleaned as bit-packed tiles,
+    which gives the same result without allocating the bounding box. Tiled
+    grids have no count raster to save at `raster_path`.
+
+    Returns:
+        tuple: (processed uint8 grid or tiled grid, image for plots, its extent, padding)
+    """
+    min_x, max_x, min_y, max_y = raster_bounds(wall_points)
+    padding = 0.1 * max(max_x - min_x, max_y - min_y, 1.0)
+    bounds = raster_bounds(wall_points, padding)
+    if use_tiles(bounds, grid_size, tile_size):
+        grid = tiled_occupancy(wall_points, grid_size, bounds, min_count=min_density,
+                               tile_size=tile_size or DEFAULT_TILE_SIZE)
+        return process_occupancy(grid, grid["extent"], params) + (padding,)
+    raster = rasterize(wall_points, grid_size, bounds=bounds)
+    if raster_path is not None:
+        save_raster(raster_path, raster)
+    return process_occupancy(density_mask(raster, min_density), raster["extent"], params) + (padding,)
+
+
+def process_occupancy(grid, extent, params):
+    """
+    process_wall_grid on a dense occupancy grid, or tile by tile on a tiled one.
+
+    Returns:
+        tuple: (processed grid, image for plots, its extent)
+    """
+    if isinstance(grid, dict):
+        grid = tiled_filter(grid, partial(process_wall_grid, **params), wall_grid_halo(**params))
+        print(f"Tiled grid {grid['shape'][0]} x {grid['shape'][1]}: {len(grid['tiles'])} tiles of "
+              f"{grid['tile_size']} cells, {occupied_cells(grid)} wall cells in {tiled_nbytes(grid) / 1e6:.1f} MB")
+        image, extent = tiled_preview(grid)
+        return grid, image, extent
+    grid_binary = process_wall_grid(grid, **params)
+    return grid_binary, grid_binary, extent
+
+
+def wall_grid_contours(grid, extent, grid_size, min_contour_length=10):
+    """Contours of a dense or tiled grid from clean_wall_grid, in world coordinates."""
+    if isinstance(grid, dict):
+        return tiled_contours(grid, min_contour_length)
+    return grid_contours(grid, (extent[0], extent[2]), grid_size, min_contour_length)
+
+
+def contour_polylines(contours_world, grid_size, walls_layer='WALLS', dims_layer='DIMENSIONS'):
+    """DXF polylines (see dxf_export.export_dxf) of grid contours; contours ending at their start are closed."""
+    return [{"points": c, "closed": bool(np.allclose(c[0], c[-1], atol=grid_size/2)),
+             "layer": walls_layer, "dim_layer": dims_layer}
+            for c in contours_world if len(c) >= 2]
+
+
+def save_wall_plan(output_path, image, extent, padding, grid_size, wall_height, contours_world=None,
+                   dim_mode='full', dim_min_length=0.5, dim_scale=0.01):
+    """
+    Write the processed grid check image and, for traced contours, wall_contours.json,
+    wall_contours_raw.png and floorplan_raw_contours_with_dims.dxf.
+
+    Args:
+        image (np.array): Processed grid (or its tiled preview) covering `extent`.
+        padding (float): Grid padding (meters), for the scale bar.
+        contours_world (list, optional): Contours from wall_grid_contours.
+    """
+    output_path = Path(output_path)
+    min_x, max_x, min_y, max_y = extent
+    grid_height, grid_width = image.shape
     plt.figure(figsize=(10, 10 * grid_height/grid_width if grid_width > 0 else 10))
-    plt.imshow(grid_binary, cmap='binary', origin='lower', extent=[min_x, max_x, min_y, max_y])
+    plt.imshow(image, cmap='binary', origin='lower', extent=[min_x, max_x, min_y, max_y])
     plt.title(f'Processed Wall Grid (Slice at {wall_height:.2f}m) - CHECK THIS IMAGE!')
     plt.xlabel('X (meters)')
     plt.ylabel('Y (meters)')
@@ -162,27 +177,15 @@ def extract_wall_floorplan_basic(input_file, output_dir, wall_height=None, slice
     plt.close()
     print(f"Saved processed grid map image (CHECK THIS FILE!) to {grid_img_path}")
 
-    if not skimage_available:
-        print("Skipping contour extraction and DXF output (scikit-image not available).")
-        return True
-
-    print("Extracting contours from processed grid...")
-    padded_grid = np.pad(grid_binary, pad_width=1, mode='constant', constant_values=0)
-    raw_contours_grid = measure.find_contours(padded_grid, 0.5) # Threshold fixed at 0.5 for find_contours
-
-    contours_world = []
-    for contour_grid in raw_contours_grid:
-        if len(contour_grid) < min_contour_length:
-            continue
-        contour_world = np.empty_like(contour_grid)
-        contour_world[:, 0] = (contour_grid[:, 1] - 1) * grid_size + min_x
-        contour_world[:, 1] = (contour_grid[:, 0] - 1) * grid_size + min_y
-        contours_world.append(contour_world)
-    print(f"Found {len(contours_world)} contours.")
+    if contours_world is None:
+        return
+    contours_json = output_path / "wall_contours.json"
+    with open(contours_json, 'w') as f:
+        json.dump({"contours": [c.tolist() for c in contours_world]}, f)
 
     # Visualize contours
     plt.figure(figsize=(12, 12 * grid_height/grid_width if grid_width > 0 else 12))
-    plt.imshow(grid_binary, cmap='binary', origin='lower', extent=[min_x, max_x, min_y, max_y], alpha=0.3)
+    plt.imshow(image, cmap='binary', origin='lower', extent=[min_x, max_x, min_y, max_y], alpha=0.3)
     for i, contour in enumerate(contours_world):
         plt.plot(contour[:, 0], contour[:, 1], 'b-', linewidth=1.5)
     plt.title('Extracted Wall Contours (No Simplification)')
@@ -193,50 +196,285 @@ def extract_wall_floorplan_basic(input_file, output_dir, wall_height=None, slice
     plt.close()
     print(f"Saved raw contour visualization to {contour_img_path}")
 
-
     if not ezdxf_available:
         print("Skipping DXF creation (ezdxf not available).")
-        return True
+        return
 
     print("Creating DXF file...")
     try:
-        doc = ezdxf.new('R2010')
-        msp = doc.modelspace()
-        doc.layers.add(name='WALLS', color=ezdxf.colors.WHITE)
-        doc.layers.add(name='DIMENSIONS', color=ezdxf.colors.RED)
-        # Setup dimension style (same as before)
-        dim_style_name = 'ARCH_METRIC'
-        if dim_style_name not in doc.dimstyles:
-             doc.dimstyles.new(dim_style_name, dxfattribs={'dimtxt': 0.1, 'dimasz': 0.05, 'dimblk': 'ARCHTICK', 'dimclrd': ezdxf.colors.RED, 'dimclrt': ezdxf.colors.RED, 'dimdec': 2, 'dimpost': ' m', 'dimtad': 1})
-
-        added_dims = 0
-        for idx, poly_points in enumerate(contours_world): # Use raw contours
-            if len(poly_points) < 2: continue
-            is_closed = np.allclose(poly_points[0], poly_points[-1], atol=grid_size/2)
-            msp.add_lwpolyline(poly_points, close=is_closed, dxfattribs={'layer': 'WALLS'})
-
-            num_segments = len(poly_points) - 1 if not is_closed else len(poly_points)
-            for i in range(num_segments):
-                p1 = tuple(poly_points[i]) # Ensure tuples for ezdxf
-                p2 = tuple(poly_points[(i + 1) % len(poly_points)])
-                segment_length = np.linalg.norm(np.array(p2) - np.array(p1))
-                if segment_length > dim_min_length:
-                    try:
-                        dim = msp.add_aligned_dim(p1=p1, p2=p2, distance=0.2, style=dim_style_name, dxfattribs={'layer': 'DIMENSIONS'})
-                        dim.render()
-                        added_dims += 1
-                    except Exception as e:
-                        print(f"Warning: Error adding dimension for segment {i} in contour {idx}: {e}")
-
         dxf_path = output_path / "floorplan_raw_contours_with_dims.dxf"
-        doc.saveas(str(dxf_path))
-        print(f"Saved DXF floorplan with {added_dims} dimensions to {dxf_path}")
+        stats = export_dxf(dxf_path, contour_polylines(contours_world, grid_size), dim_mode, dim_min_length,
+                           dim_scale_fraction=dim_scale, dim_offset=0.2)
+        print(f"Saved DXF floorplan with {stats['dimensions']} dimensions to {dxf_path} ({stats['seconds']:.2f}s)")
 
     except Exception as e:
         print(f"Error during DXF creation: {e}")
         import traceback
         traceback.print_exc()
 
+
+def export_wall_graph(wall_points, output_path, wall_height, dim_min_length=0.5, dim_mode='full', dim_scale=0.01):
+    """
+    Fit the wall graph of a slice and write wall_graph.json, wall_graph.png and a DXF
+    with one polyline and at most one dimension per wall (`dim_mode`, see dxf_export).
+    """
+    print("Fitting wall segments to slice points...")
+    result = extract_wall_graph(wall_points)
+    save_wall_graph(output_path / "wall_graph.json", result)
+    print(f"Saved wall graph to {output_path / 'wall_graph.json'}")
+    walls = result["walls"]
+
+    plt.figure(figsize=(10, 10))
+    plt.scatter(wall_points[:, 0], wall_points[:, 1], s=0.2, c='lightgray')
+    for segment in result["segments"]:
+        plt.plot(segment[[0, 2]], segment[[1, 3]], 'b-', linewidth=0.8)
+    for wall in walls:
+        plt.plot([wall["start"][0], wall["end"][0]], [wall["start"][1], wall["end"][1]], 'r-', linewidth=2)
+    nodes = np.array(result["graph"]["nodes"]).reshape(-1, 2)
+    plt.scatter(nodes[:, 0], nodes[:, 1], c='k', s=12, zorder=3)
+    plt.title(f'Wall Graph (Slice at {wall_height:.2f}m): {len(walls)} walls')
+    plt.xlabel('X (meters)')
+    plt.ylabel('Y (meters)')
+    plt.axis('equal')
+    plt.savefig(output_path / "wall_graph.png", bbox_inches='tight', dpi=150)
+    plt.close()
+
+    if not ezdxf_available:
+        print("Skipping DXF creation (ezdxf not available).")
+        return True
+    polylines = []
+    for wall in walls:
+        start, end = np.array(wall["start"]), np.array(wall["end"])
+        # One dimension per wall, along its centerline
+        entry = {"layer": 'WALLS', "dim_spans": [np.concatenate((start, end))]}
+        if wall["thickness"]:
+            direction = (end - start) / max(np.linalg.norm(end - start), 1e-12)
+            half = np.array([-direction[1], direction[0]]) * wall["thickness"] / 2
+            entry.update(points=np.array([start + half, end + half, end - half, start - half]), closed=True)
+        else:
+            entry.update(points=np.array([start, end]), closed=False)
+        polylines.append(entry)
+    try:
+        dxf_path = output_path / "floorplan_wall_graph.dxf"
+        stats = export_dxf(dxf_path, polylines, dim_mode, dim_min_length, dim_scale_fraction=dim_scale,
+                           dim_offset=0.3, dedup_distance=0)
+        print(f"Saved DXF with {len(walls)} walls and {stats['dimensions']} dimensions to {dxf_path} "
+              f"({stats['seconds']:.2f}s)")
+    except Exception as e:
+        print(f"Error during DXF creation: {e}")
+    return True
+
+
+def _extract_level(level, wall_points, output_dir, grid_size, min_density, morphology, min_contour_length,
+                   tile_size=None):
+    """Rasterize, clean and trace one level's wall slice (runs in a worker process)."""
+    level_path = Path(output_dir) / f"level_{level['level']:02d}"
+    level_path.mkdir(parents=True, exist_ok=True)
+    grid, image, extent, _ = clean_wall_grid(wall_points, grid_size, min_density, morphology, tile_size,
+                                             raster_path=level_path / "raster.npz")
+    contours_world = wall_grid_contours(grid, extent, grid_size, min_contour_length)
+    with open(level_path / "wall_contours.json", 'w') as f:
+        json.dump({"contours": [c.tolist() for c in contours_world]}, f)
+
+    grid_height, grid_width = image.shape
+    plt.figure(figsize=(10, 10 * grid_height/grid_width))
+    plt.imshow(image, cmap='binary', origin='lower', extent=extent, alpha=0.3)
+    for contour in contours_world:
+        plt.plot(contour[:, 0], contour[:, 1], 'b-', linewidth=1.5)
+    plt.title(f"Level {level['level']} (slice at {level['wall_height']:.2f}m)")
+    plt.xlabel('X (meters)')
+    plt.ylabel('Y (meters)')
+    plt.savefig(level_path / "wall_contours.png", bbox_inches='tight', dpi=150)
+    plt.close()
+    return contours_world
+
+
+def extract_multilevel_floorplan(input_file, output_dir, slice_thickness=0.1, grid_size=0.05,
+                                 auto_height_offset=1.2, min_contour_length=10, dim_min_length=0.5,
+                                 denoise=None, min_density=2, morphology=None, min_level_height=2.0,
+                                 workers=None, dim_mode='full', dim_scale=0.01, tile_size=None, splat=None):
+    """
+    Extract the floorplan of every storey from a single load of the point cloud.
+
+    Levels are detected from the z-histogram peaks (scene_profile.detect_floor_levels)
+    and each is sliced at its own floor + `auto_height_offset`. The levels are
+    rasterized and traced in parallel worker processes (`workers`, default CPU
+    count; 1 runs inline). Writes level_NN/ directories with each level's
+    raster, contours and image, one DXF with per-level WALLS_Ln / DIMENSIONS_Ln
+    layers and a levels.json summary. Other arguments are as for
+    extract_wall_floorplan_basic.
+    """
+    output_path = Path(output_dir)
+    output_path.mkdir(parents=True, exist_ok=True)
+
+    print(f"Loading point cloud from {input_file}...")
+    try:
+        points, _ = load_points_cached(input_file, with_colors=False, **(splat or {}))
+    except Exception as e:
+        print(f"Error loading point cloud: {e}")
+        return False
+    if len(points) == 0:
+        print("Error: Point cloud is empty.")
+        return False
+    print(f"Loaded {len(points)} points.")
+
+    keep = None
+    if denoise:
+        keep = outlier_mask(points, ply_path=input_file, mask_path=output_path / MASK_FILENAME, **denoise)
+
+    profile = get_scene_profile(input_file)
+    index = load_or_build_z_index(points, input_file, **(splat or {}))
+    levels = detect_floor_levels(profile, min_level_height=min_level_height)
+    print(f"Detected {len(levels)} level(s).")
+
+    params = dict(DEFAULT_MORPHOLOGY, **(morphology or {}))
+    jobs = []
+    for level in levels:
+        # Keep the slice below the level's ceiling
+        level["wall_height"] = min(level["floor_height"] + auto_height_offset,
+                                   level["ceiling_height"] - slice_thickness)
+        wall_points = z_slice(index, level["wall_height"] - slice_thickness / 2,
+                              level["wall_height"] + slice_thickness / 2, keep)
+        level["num_slice_points"] = len(wall_points)
+        print(f"Level {level['level']}: floor {level['floor_height']:.3f}m, ceiling {level['ceiling_height']:.3f}m, "
+              f"slice at {level['wall_height']:.3f}m with {len(wall_points)} points")
+        if len(wall_points) >= 2:
+            jobs.append((level, wall_points))
+
+    if not skimage_available:
+        print("Skipping contour extraction and DXF output (scikit-image not available).")
+        return False
+
+    args = [(level, wall_points, str(output_path), grid_size, min_density, params, min_contour_length, tile_size)
+            for level, wall_points in jobs]
+    if workers == 1 or len(args) <= 1:
+        results = [_extract_level(*a) for a in args]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(_extract_level, *zip(*args)))
+
+    contours_by_level = {}
+    for (level, _), contours_world in zip(jobs, results):
+        contours_by_level[level["level"]] = contours_world
+        level["num_contours"] = len(contours_world)
+        level["contours_file"] = f"level_{level['level']:02d}/wall_contours.json"
+
+    with open(output_path / "levels.json", 'w') as f:
+        json.dump({"input": str(input_file), "grid_size": grid_size, "slice_thickness": slice_thickness,
+                   "morphology": params, "levels": levels}, f, indent=2)
+    print(f"Saved level summary to {output_path / 'levels.json'}")
+
+    if not ezdxf_available:
+        print("Skipping DXF creation (ezdxf not available).")
+        return True
+
+    polylines = []
+    for level_id, contours_world in contours_by_level.items():
+        polylines += contour_polylines(contours_world, grid_size, f"WALLS_L{level_id}", f"DIMENSIONS_L{level_id}")
+    try:
+        dxf_path = output_path / "floorplan_levels_with_dims.dxf"
+        stats = export_dxf(dxf_path, polylines, dim_mode, dim_min_length, dim_scale_fraction=dim_scale, dim_offset=0.2)
+        print(f"Saved DXF with {len(contours_by_level)} level layer(s) and {stats['dimensions']} dimensions "
+              f"to {dxf_path} ({stats['seconds']:.2f}s)")
+    except Exception as e:
+        print(f"Error during DXF creation: {e}")
+    return True
+
+
+def extract_wall_floorplan_basic(input_file, output_dir, wall_height=None, slice_thickness=0.1,
+                                 grid_size=0.05, auto_height_offset=1.2,
+                                 min_contour_length=10, dim_min_length=0.5, denoise=None, min_density=2,
+                                 morphology=None, vector=False, dim_mode='full', dim_scale=0.01, tile_size=None,
+                                 splat=None):
+    """
+    Extracts, processes, vectorizes (no simplify), and exports a floorplan.
+    Focus on tuning slice height and internal image processing parameters.
+    `denoise` optionally holds outlier removal options for denoise.outlier_mask, and
+    grid cells need at least `min_density` slice points to count as wall.
+    `morphology` overrides entries of DEFAULT_MORPHOLOGY for the grid cleanup.
+    With `vector`, walls are fitted directly to the slice points (wall_segments)
+    and written as a wall graph instead of traced grid contours.
+    `dim_mode` and `dim_scale` select the DXF dimensions (see dxf_export.export_dxf).
+    `tile_size` selects tiled grid processing (see clean_wall_grid), and `splat`
+    holds the Gaussian splat pruning options of load_points_cached (ply_io.splat_options).
+    """
+    output_path = Path(output_dir)
+    output_path.mkdir(parents=True, exist_ok=True)
+
+    print(f"Loading point cloud from {input_file}...")
+    try:
+        points, _ = load_points_cached(input_file, with_colors=False, **(splat or {}))
+        if len(points) == 0:
+            print("Error: Point cloud is empty.")
+            return False
+    except Exception as e:
+        print(f"Error loading point cloud: {e}")
+        return False
+    print(f"Loaded {len(points)} points.")
+
+    keep = None
+    if denoise:
+        keep = outlier_mask(points, ply_path=input_file, mask_path=output_path / MASK_FILENAME, **denoise)
+
+    profile = get_scene_profile(input_file)
+    floor_height = None
+    if wall_height is None:
+        print("Auto-detecting floor height...")
+        if profile is None:
+             print("Error: No points found to determine height.")
+             return False
+        floor_height = profile["floor_height"] # Shared RANSAC floor estimate
+        wall_height = floor_height + auto_height_offset
+        print(f"Detected floor near {floor_height:.3f}m")
+        print(f"Taking wall slice at {wall_height:.3f}m (floor + {auto_height_offset}m)")
+    else:
+        print(f"Using specified wall height: {wall_height:.3f}m")
+
+    slice_min_z = wall_height - slice_thickness / 2
+    slice_max_z = wall_height + slice_thickness / 2
+    wall_points = z_slice(load_or_build_z_index(points, input_file, **(splat or {})), slice_min_z, slice_max_z, keep)
+
+    if len(wall_points) == 0:
+        print(f"Error: No points found in slice {slice_min_z:.3f}m - {slice_max_z:.3f}m.")
+        # Suggest alternative heights based on the profile's z-histogram peaks
+        peaks = sorted(profile["peaks"], key=lambda p: p["count"], reverse=True)[:10]
+        print("\nPotential heights with more points (histogram peaks):")
+        for peak in peaks:
+             if peak["count"] > 50: # Suggest peaks with at least 50 points
+                  print(f"  --height {peak['height']:.3f}  ({peak['count']} points in bin)")
+        print("Multi-storey scan? Use --levels to slice every detected level.")
+        return False
+    print(f"Found {len(wall_points)} points in wall slice.")
+
+    wall_ply_path = output_path / "wall_points.ply"
+    write_ply(wall_ply_path, vertex_array(wall_points, point_dtype='f8'))
+    print(f"Saved wall points to {wall_ply_path}")
+
+    if len(wall_points) < 2:
+         print("Error: Not enough points in slice for bounds calculation.")
+         return False
+
+    if vector:
+        return export_wall_graph(wall_points, output_path, wall_height, dim_min_length, dim_mode, dim_scale)
+    print("Processing grid image...")
+    params = dict(DEFAULT_MORPHOLOGY, **(morphology or {}))
+    grid, image, extent, padding = clean_wall_grid(wall_points, grid_size, min_density, params, tile_size,
+                                                   raster_path=output_path / "raster.npz")
+    if not isinstance(grid, dict):
+        print(f"Grid ({grid.shape[0]} x {grid.shape[1]}) with cell size {grid_size}m")
+    print("Morphology: " + ", ".join(f"{k}={v}" for k, v in params.items()))
+
+    contours_world = None
+    if skimage_available:
+        print("Extracting contours from processed grid...")
+        contours_world = wall_grid_contours(grid, extent, grid_size, min_contour_length)
+        print(f"Found {len(contours_world)} contours.")
+    save_wall_plan(output_path, image, extent, padding, grid_size, wall_height, contours_world,
+                   dim_mode, dim_min_length, dim_scale)
+    if contours_world is None:
+        print("Skipped contour extraction and DXF output (scikit-image not available).")
+        return True
+
     print(f"Basic floorplan extraction completed. Results saved to {output_path}")
     return True
 
@@ -250,6 +488,21 @@ def main():
     parser.add_argument("--grid-size", type=float, default=0., help="Grid resolution (meters/cell).")
     parser.add_argument("--min-contour-pts", type=int, default=100, help="Min points per contour.")
     parser.add_argument("--min-dim-len", type=float, default=0.5, help="Min length for dimensioning (meters).")
+    parser.add_argument("--min-density", type=int, default=2, help="Min slice points per grid cell (1 = any point).")
+    parser.add_argument("--dilate", type=int, default=DEFAULT_MORPHOLOGY["dilate_iterations"], help="Dilation iterations.")
+    parser.add_argument("--erode", type=int, default=DEFAULT_MORPHOLOGY["erode_iterations"], help="Erosion iterations.")
+    parser.add_argument("--close", type=int, default=DEFAULT_MORPHOLOGY["close_iterations"], help="Closing iterations.")
+    parser.add_argument("--sigma", type=float, default=DEFAULT_MORPHOLOGY["gaussian_sigma"], help="Gaussian smoothing sigma (0 = off).")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_MORPHOLOGY["threshold"], help="Threshold after smoothing.")
+    parser.add_argument("--vector", action="store_true", help="Fit wall segments to the slice and write a wall graph instead of grid contours.")
+    parser.add_argument("--levels", action="store_true", help="Detect floor levels and extract every level from one load.")
+    parser.add_argument("--min-level-height", type=float, default=2.0, help="Min floor-to-ceiling height of a level (meters).")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes for --levels (default: CPU count).")
+    parser.add_argument("--tile-size", type=int, default=None,
+                        help="Process the grid in bit-packed tiles of this many cells (0 = dense; default: tiles for large grids).")
+    add_dxf_arguments(parser)
+    add_denoise_arguments(parser)
+    add_splat_arguments(parser)
     args = parser.parse_args()
 
     # Basic dependency check
@@ -258,6 +511,29 @@ def main():
          sys.exit(1)
     # ezdxf check is done before DXF creation
 
+    morphology = {"dilate_iterations": args.dilate, "erode_iterations": args.erode,
+                  "close_iterations": args.close, "gaussian_sigma": args.sigma, "threshold": args.threshold}
+    if args.levels:
+        extract_multilevel_floorplan(
+            input_file=args.input,
+            output_dir=args.output,
+            slice_thickness=args.thickness,
+            grid_size=args.grid_size,
+            auto_height_offset=args.offset,
+            min_contour_length=args.min_contour_pts,
+            dim_min_length=args.min_dim_len,
+            denoise=denoise_options(args),
+            min_density=args.min_density,
+            morphology=morphology,
+            min_level_height=args.min_level_height,
+            workers=args.workers,
+            dim_mode=args.dim_mode,
+            dim_scale=args.dim_scale,
+            tile_size=args.tile_size,
+            splat=splat_options(args)
+        )
+        return
+
     extract_wall_floorplan_basic(
         input_file=args.input,
         output_dir=args.output,
@@ -266,7 +542,15 @@ def main():
         grid_size=args.grid_size,
         auto_height_offset=args.offset,
         min_contour_length=args.min_contour_pts,
-        dim_min_length=args.min_dim_len
+        dim_min_length=args.min_dim_len,
+        denoise=denoise_options(args),
+        min_density=args.min_density,
+        morphology=morphology,
+        vector=args.vector,
+        dim_mode=args.dim_mode,
+        dim_scale=args.dim_scale,
+        tile_size=args.tile_size,
+        splat=splat_options(args)
     )
 
 if __name__ == "__main__":
@@ -5,7 +5,7 @@ Extract a "concave boundary" around a 3D scene by:
   2. Projecting to a 2D grid
   3. Filling / morphological operations
   4. Extracting the largest contour
-  5. Simplifying and snapping the contour to yield straight (axis-aligned) segments
+  5. Simplifying and snapping the contour to its dominant wall directions (Manhattan frames)
   6. Exporting a DXF with dimension annotations
 
 Handles very large point clouds by optional downsampling.
@@ -13,14 +13,15 @@ Handles very large point clouds by optional downsampling.
 Usage:
   python extract_concave_boundary.py input.ply output_dir
     [--use-wall-slice] [--wall-height WALL_H] [--slice-thickness THICK]
-    [--grid-size GRID] [--voxel-size VOX] [--no-simplify]
+    [--grid-size GRID] [--voxel-size VOX] [--no-simplify] [--snap auto|axis|none]
+    [--dim-mode full|lightweight|none]
 """
 
 import os
 import sys
+import json
 import argparse
 import numpy as np
-import open3d as o3d
 import matplotlib.pyplot as plt
 from pathlib import Path
 
@@ -31,6 +32,17 @@ from scipy.ndimage import (
     gaussian_filter
 )
 
+from ply_io import add_splat_arguments, splat_options
+from point_cache import load_points_cached
+from denoise import outlier_mask, add_denoise_arguments, denoise_options, MASK_FILENAME
+from raster import rasterize, raster_bounds, density_mask, save_raster
+from scene_profile import get_scene_profile
+from z_index import load_or_build_z_index, z_slice
+from manhattan import edge_orientations, dominant_orientations, snap_polygon
+from dxf_export import export_dxf, add_dxf_arguments
+from tiled_raster import (use_tiles, tiled_occupancy, tiled_filter, tiled_contours, tiled_preview, wall_grid_halo,
+                          occupied_cells, DEFAULT_TILE_SIZE)
+
 try:
     import ezdxf
 except ImportError:
@@ -49,174 +61,63 @@ except ImportError:
     Polygon = None
     print("Warning: shapely not installed. Contour simplification will be skipped.")
 
-def snap_to_axis(coords, angle_threshold_deg=10):
-    """
-    Snap nearly horizontal or vertical segments to be exactly axis-aligned.
-    
-    Args:
-        coords (np.array): Nx2 array of (x,y) coordinates.
-        angle_threshold_deg (float): Angle threshold (in degrees) for snapping.
-    Returns:
-        np.array: The snapped coordinate array.
-    """
-    snapped = [coords[0]]
-    for pt in coords[1:]:
-        prev = snapped[-1]
-        dx = pt[0] - prev[0]
-        dy = pt[1] - prev[1]
-        if dx == 0 and dy == 0:
-            snapped.append(pt)
-            continue
-        angle = np.degrees(np.arctan2(dy, dx))
-        # Near horizontal: angle near 0 or 180 degrees
-        if abs(angle) < angle_threshold_deg or abs(angle) > (180 - angle_threshold_deg):
-            # Snap to horizontal: set y equal to previous
-            pt = (pt[0], prev[1])
-        # Near vertical: angle near 90 or -90 degrees
-        elif abs(abs(angle) - 90) < angle_threshold_deg:
-            # Snap to vertical: set x equal to previous
-            pt = (prev[0], pt[1])
-        snapped.append(pt)
-    return np.array(snapped)
-
-def extract_concave_boundary(input_file,
-                             output_dir,
-                             use_wall_slice=False,
-                             wall_height=None,
-                             wall_offset=1.2,
-                             slice_thickness=0.1,
-                             grid_size=0.05,
-                             voxel_size=0.02,
-                             no_simplify=False):
-    """
-    Args:
-        input_file (str): Path to input PLY file.
-        output_dir (str): Directory to save results.
-        use_wall_slice (bool): Whether to slice at a certain wall height.
-        wall_height (float): If provided, use this exact height for the slice.
-                             If None and use_wall_slice=True, auto-detect floor and set height = floor + wall_offset.
-        wall_offset (float): The offset above the floor if auto-detecting wall height.
-        slice_thickness (float): Thickness of the wall slice in meters.
-        grid_size (float): 2D grid resolution (meters).
-        voxel_size (float): Downsampling voxel size (meters). If 0 or None, skip downsampling.
-        no_simplify (bool): If True, skip shapely simplification of the contour.
-    """
-    out_path = Path(output_dir)
-    out_path.mkdir(parents=True, exist_ok=True)
-
-    print(f"Loading point cloud from: {input_file}")
-    pcd = o3d.io.read_point_cloud(input_file)
-    if not pcd or not pcd.has_points():
-        print("Error: Point cloud is empty or invalid.")
-        return False
-
-    # Optional: Downsample if voxel_size > 0
-    n_pts_before = len(pcd.points)
-    if voxel_size and voxel_size > 0:
-        print(f"Downsampling from {n_pts_before} points using voxel size = {voxel_size}...")
-        pcd = pcd.voxel_down_sample(voxel_size=voxel_size)
-        n_pts_after = len(pcd.points)
-        print(f"Downsampled to {n_pts_after} points.")
-    else:
-        print("Skipping downsampling...")
-
-    points = np.asarray(pcd.points)
-    if len(points) < 3:
-        print("Not enough points to form a boundary.")
-        return False
-
-    # If slicing at wall height
-    if use_wall_slice:
-        print("Using wall slice approach.")
-        if wall_height is None:
-            z_vals = points[:, 2]
-            sorted_z = np.sort(z_vals)
-            floor_approx = np.mean(sorted_z[: int(len(sorted_z)*0.1)])
-            wall_height = floor_approx + wall_offset
-            print(f"Detected floor ~ {floor_approx:.3f}m; using wall_height = {wall_height:.3f}m")
-        else:
-            print(f"Using specified wall_height = {wall_height:.3f}m")
-        half_thick = slice_thickness / 2.0
-        mask = (points[:, 2] >= (wall_height - half_thick)) & \
-               (points[:, 2] <= (wall_height + half_thick))
-        slice_points = points[mask]
-        if len(slice_points) < 3:
-            print("Warning: Not enough points in the wall slice. No boundary created.")
-            return False
-        points_2d = slice_points[:, :2]
-        print(f"Wall slice: {len(slice_points)} points selected.")
-    else:
-        print("Using all points projected to XY.")
-        points_2d = points[:, :2]
-
-    # Create a 2D occupancy grid
-    min_x, max_x = np.min(points_2d[:,0]), np.max(points_2d[:,0])
-    min_y, max_y = np.min(points_2d[:,1]), np.max(points_2d[:,1])
-    padding = 0.05 * max(max_x - min_x, max_y - min_y)
-    min_x -= padding
-    max_x += padding
-    min_y -= padding
-    max_y += padding
-
-    width = int((max_x - min_x) / grid_size) + 1
-    height = int((max_y - min_y) / grid_size) + 1
-    print(f"Creating grid of size {width} x {height} at {grid_size} m resolution.")
-
-    grid = np.zeros((height, width), dtype=np.uint8)
-    for pt in points_2d:
-        gx = int((pt[0] - min_x) / grid_size)
-        gy = int((pt[1] - min_y) / grid_size)
-        if 0 <= gx < width and 0 <= gy < height:
-            grid[gy, gx] = 1
+# Reach of clean_occupancy_grid's operations (see tiled_raster.wall_grid_halo)
+CLEANUP_HALO = {"dilate_iterations": 2, "erode_iterations": 1, "close_iterations": 2, "gaussian_sigma": 1}
 
-    # Save raw grid image
-    plt.figure(figsize=(10,10))
-    plt.imshow(grid, origin='lower', extent=[min_x, max_x, min_y, max_y], cmap='gray')
-    plt.title("Raw Occupancy Grid")
-    plt.xlabel("X (m)")
-    plt.ylabel("Y (m)")
-    plt.axis('equal')
-    raw_grid_path = out_path / "raw_grid.png"
-    plt.savefig(raw_grid_path, dpi=150, bbox_inches='tight')
-    plt.close()
-    print(f"Saved raw grid image to {raw_grid_path}")
 
-    # Morphological cleanup
+def clean_occupancy_grid(grid):
+    """Dilate, erode, close, blur and re-threshold an occupancy grid."""
     grid_dil = binary_dilation(grid, iterations=2)
     grid_ero = binary_erosion(grid_dil, iterations=1)
     grid_close = binary_closing(grid_ero, iterations=2)
     grid_blur = gaussian_filter(grid_close.astype(float), sigma=1)
-    grid_binary = (grid_blur > 0.5).astype(np.uint8)
+    return (grid_blur > 0.5).astype(np.uint8)
 
-    plt.figure(figsize=(10,10))
-    plt.imshow(grid_binary, origin='lower', extent=[min_x, max_x, min_y, max_y], cmap='gray')
-    plt.title("Cleaned Occupancy Grid")
-    plt.xlabel("X (m)")
-    plt.ylabel("Y (m)")
-    plt.axis('equal')
-    clean_grid_path = out_path / "clean_grid.png"
-    plt.savefig(clean_grid_path, dpi=150, bbox_inches='tight')
-    plt.close()
-    print(f"Saved cleaned grid image to {clean_grid_path}")
+
+def trace_concave_boundary(grid, grid_size, extent, no_simplify=False, snap='auto', max_frames=2, snap_angle=10.0):
+    """
+    Clean an occupancy grid and trace its largest contour as a simplified, snapped boundary.
+
+    Args:
+        grid: Dense (H, W) occupancy grid, or a tiled grid (see tiled_raster).
+        grid_size (float): Cell size (meters).
+        extent (list): [min_x, max_x, min_y, max_y] of the grid.
+        no_simplify, snap, max_frames, snap_angle: As for extract_concave_boundary.
+    Returns:
+        dict: {"boundary": closed Nx2 polygon or None, "clean_image": cleaned grid (or its tiled preview)}
+    """
+    min_x, max_x, min_y, max_y = extent
+    tiled = isinstance(grid, dict)
+
+    # Morphological cleanup
+    if tiled:
+        grid_binary = tiled_filter(grid, clean_occupancy_grid, wall_grid_halo(**CLEANUP_HALO))
+        clean_image, _ = tiled_preview(grid_binary)
+    else:
+        grid_binary = clean_image = clean_occupancy_grid(grid)
+    result = {"boundary": None, "clean_image": clean_image}
 
     # Extract contours using scikit-image
     if measure is None:
         print("scikit-image not installed, skipping contour extraction.")
-        return True
-
-    contours = measure.find_contours(grid_binary, 0.5)
-    if not contours:
-        print("No contours found. Exiting.")
-        return True
-
-    # Convert contours from grid to world coordinates
-    polygons = []
-    for c in contours:
-        # c: (row, col) => (y, x)
-        c_x = c[:, 1] * grid_size + min_x
-        c_y = c[:, 0] * grid_size + min_y
-        poly_pts = np.column_stack((c_x, c_y))
-        polygons.append(poly_pts)
+        return result
+
+    if tiled:
+        # Contours stitched across tile borders, already in world coordinates
+        polygons = tiled_contours(grid_binary, min_contour_length=0)
+    else:
+        contours = measure.find_contours(grid_binary, 0.5)
+        # Convert contours from grid to world coordinates
+        polygons = []
+        for c in contours:
+            # c: (row, col) => (y, x)
+            c_x = c[:, 1] * grid_size + min_x
+            c_y = c[:, 0] * grid_size + min_y
+            poly_pts = np.column_stack((c_x, c_y))
+            polygons.append(poly_pts)
+    if not polygons:
+        print("No contours found.")
+        return result
 
     # Select the largest contour by area (using shapely if available)
     largest_area = -1
@@ -236,8 +137,8 @@ def extract_concave_boundary(input_file,
             largest_poly = poly_pts
 
     if largest_poly is None or len(largest_poly) < 3:
-        print("No valid large contour found. Exiting.")
-        return True
+        print("No valid large contour found.")
+        return result
 
     # Simplify the largest contour to remove noise and straighten edges
     if (Polygon is not None) and (not no_simplify):
@@ -245,24 +146,73 @@ def extract_concave_boundary(input_file,
         tolerance = 0.1  # Increased tolerance for stronger simplification (adjust as needed)
         shapely_simpl = shapely_contour.simplify(tolerance, preserve_topology=True)
         final_coords = np.array(shapely_simpl.exterior.coords)
+        simplified = True
         print(f"Simplified contour from {len(largest_poly)} to {len(final_coords)} points.")
     else:
         final_coords = largest_poly
+        simplified = False
         if not np.allclose(final_coords[0], final_coords[-1]):
             final_coords = np.vstack([final_coords, final_coords[0]])
         print(f"Using largest contour with {len(final_coords)} points.")
 
-    # Snap nearly horizontal/vertical segments to be exactly aligned
-    final_coords = snap_to_axis(final_coords, angle_threshold_deg=10)
-    if not np.allclose(final_coords[0], final_coords[-1]):
-        final_coords = np.vstack([final_coords, final_coords[0]])
+    # Snap edges to the dominant wall directions and merge collinear runs. A raw
+    # (unsimplified) contour is a staircase, so its directions are measured over a window
+    if snap != 'none':
+        window = 0 if simplified else 8
+        if snap == 'auto':
+            frames = dominant_orientations(*edge_orientations(final_coords, window), max_frames=max_frames)
+        else:
+            frames = [0.0]
+        print("Snapping to frame(s) at " + ", ".join(f"{np.degrees(f):.1f}" for f in frames) + " degrees")
+        num_before = len(final_coords)
+        final_coords = snap_polygon(final_coords, frames, angle_threshold_deg=snap_angle,
+                                    merge_distance=grid_size, window=window)
+        print(f"Snapped contour from {num_before} to {len(final_coords)} points.")
+
+    result["boundary"] = final_coords
+    return result
+
+
+def save_concave_boundary(out_path, raw_image, clean_image, extent, boundary=None, dim_mode='full', dim_scale=0.01):
+    """
+    Write raw_grid.png and clean_grid.png and, for a traced boundary, final_boundary.png,
+    outer_boundary.json and outer_boundary.dxf (see trace_concave_boundary).
+    """
+    out_path = Path(out_path)
+    min_x, max_x, min_y, max_y = extent
+
+    # Save raw grid image
+    plt.figure(figsize=(10,10))
+    plt.imshow(raw_image, origin='lower', extent=[min_x, max_x, min_y, max_y], cmap='gray')
+    plt.title("Raw Occupancy Grid")
+    plt.xlabel("X (m)")
+    plt.ylabel("Y (m)")
+    plt.axis('equal')
+    raw_grid_path = out_path / "raw_grid.png"
+    plt.savefig(raw_grid_path, dpi=150, bbox_inches='tight')
+    plt.close()
+    print(f"Saved raw grid image to {raw_grid_path}")
+
+    plt.figure(figsize=(10,10))
+    plt.imshow(clean_image, origin='lower', extent=[min_x, max_x, min_y, max_y], cmap='gray')
+    plt.title("Cleaned Occupancy Grid")
+    plt.xlabel("X (m)")
+    plt.ylabel("Y (m)")
+    plt.axis('equal')
+    clean_grid_path = out_path / "clean_grid.png"
+    plt.savefig(clean_grid_path, dpi=150, bbox_inches='tight')
+    plt.close()
+    print(f"Saved cleaned grid image to {clean_grid_path}")
+
+    if boundary is None:
+        return
 
     # Plot the final boundary
     plt.figure(figsize=(10,10))
-    plt.imshow(grid_binary, origin='lower', extent=[min_x, max_x, min_y, max_y],
+    plt.imshow(clean_image, origin='lower', extent=[min_x, max_x, min_y, max_y],
                cmap='gray', alpha=0.5)
-    plt.plot(final_coords[:, 0], final_coords[:, 1], 'r-', lw=2)
-    plt.scatter(final_coords[:, 0], final_coords[:, 1], c='r', s=10)
+    plt.plot(boundary[:, 0], boundary[:, 1], 'r-', lw=2)
+    plt.scatter(boundary[:, 0], boundary[:, 1], c='r', s=10)
     plt.title("Final Outer Boundary")
     plt.xlabel("X (m)")
     plt.ylabel("Y (m)")
@@ -272,39 +222,153 @@ def extract_concave_boundary(input_file,
     plt.close()
     print(f"Saved final boundary to {boundary_path}")
 
+    # Save the boundary polygon in world coordinates (e.g. to mask SafetyGauss viewpoints)
+    boundary_json = out_path / "outer_boundary.json"
+    with open(boundary_json, 'w') as f:
+        json.dump({"boundary": boundary.tolist()}, f, indent=2)
+    print(f"Saved boundary polygon to {boundary_json}")
+
     # Export DXF if ezdxf is available
     if ezdxf is None:
         print("ezdxf not installed. Skipping DXF export.")
-        return True
+        return
 
     try:
-        doc = ezdxf.new('R2010')
-        msp = doc.modelspace()
-        boundary_list = final_coords.tolist()
-        if not np.allclose(boundary_list[0], boundary_list[-1]):
-            boundary_list.append(boundary_list[0])
-        msp.add_lwpolyline(boundary_list, close=True, dxfattribs={'layer': 'BOUNDARY'})
-
-        doc.layers.add(name='DIMENSIONS', color=ezdxf.colors.CYAN)
-        dim_offset = 0.3
-        for i in range(len(boundary_list) - 1):
-            p1 = boundary_list[i]
-            p2 = boundary_list[i+1]
-            seg_len = np.linalg.norm(np.array(p2) - np.array(p1))
-            if seg_len < 0.2:
-                continue
-            try:
-                dim = msp.add_aligned_dim(p1=p1, p2=p2, distance=dim_offset,
-                                          dxfattribs={'layer': 'DIMENSIONS'})
-                dim.render()
-            except Exception as e:
-                print(f"Could not add dimension for segment {i}: {e}")
         dxf_out = out_path / "outer_boundary.dxf"
-        doc.saveas(dxf_out)
-        print(f"DXF saved to {dxf_out}")
+        stats = export_dxf(dxf_out, [{"points": boundary, "closed": True, "layer": 'BOUNDARY'}],
+                           dim_mode, dim_min_length=0.2, dim_scale_fraction=dim_scale, dim_offset=0.3,
+                           layer_colors={'DIMENSIONS': ezdxf.colors.CYAN})
+        print(f"DXF saved to {dxf_out} ({stats['dimensions']} dimensions, {stats['seconds']:.2f}s)")
     except Exception as e:
         print(f"Error creating DXF: {e}")
 
+
+def extract_concave_boundary(input_file,
+                             output_dir,
+                             use_wall_slice=False,
+                             wall_height=None,
+                             wall_offset=1.2,
+                             slice_thickness=0.1,
+                             grid_size=0.05,
+                             voxel_size=0.02,
+                             no_simplify=False,
+                             denoise=None,
+                             min_density=2,
+                             snap='auto',
+                             max_frames=2,
+                             snap_angle=10.0,
+                             dim_mode='full',
+                             dim_scale=0.01,
+                             tile_size=None,
+                             splat=None):
+    """
+    Args:
+        input_file (str): Path to input PLY file.
+        output_dir (str): Directory to save results.
+        use_wall_slice (bool): Whether to slice at a certain wall height.
+        wall_height (float): If provided, use this exact height for the slice.
+                             If None and use_wall_slice=True, auto-detect floor and set height = floor + wall_offset.
+        wall_offset (float): The offset above the floor if auto-detecting wall height.
+        slice_thickness (float): Thickness of the wall slice in meters.
+        grid_size (float): 2D grid resolution (meters).
+        voxel_size (float): Downsampling voxel size (meters). If 0 or None, skip downsampling.
+        no_simplify (bool): If True, skip shapely simplification of the contour.
+        denoise (dict, optional): Outlier removal options for denoise.outlier_mask.
+        min_density (int): Minimum points per grid cell to count as occupied.
+        snap (str): 'auto' snaps edges to the dominant Manhattan frames of the contour,
+                    'axis' to the global X/Y axes, 'none' disables snapping.
+        max_frames (int): Maximum number of frames for 'auto' (e.g. 2 for an angled wing).
+        snap_angle (float): Maximum deviation (degrees) of an edge from a frame axis to snap it.
+        dim_mode (str): DXF dimensions: 'full', 'lightweight' (MTEXT + leader lines) or 'none'.
+        dim_scale (float): Skip dimensions shorter than this fraction of the boundary's diagonal.
+        tile_size (int, optional): Process the grid in bit-packed tiles of this many cells
+                                   (0 = dense; None tiles grids above tiled_raster.DENSE_CELL_LIMIT cells).
+        splat (dict, optional): Gaussian splat pruning options for load_points_cached (ply_io.splat_options).
+    """
+    out_path = Path(output_dir)
+    out_path.mkdir(parents=True, exist_ok=True)
+
+    print(f"Loading point cloud from: {input_file}")
+    try:
+        # Full resolution, or pre-voxelized by the point cache
+        points, _ = load_points_cached(input_file, voxel_size=voxel_size or None, with_colors=False,
+                                       **(splat or {}))
+    except Exception as e:
+        print(f"Error loading point cloud: {e}")
+        return False
+    if len(points) == 0:
+        print("Error: Point cloud is empty or invalid.")
+        return False
+
+    keep = None
+    if denoise:
+        # The KD-tree sidecar only matches the full-resolution cloud
+        keep = outlier_mask(points, ply_path=None if voxel_size else input_file,
+                            mask_path=out_path / MASK_FILENAME, **denoise)
+
+    # Profile of the full-resolution cloud (cached next to the PLY)
+    profile = None
+    if use_wall_slice and wall_height is None:
+        profile = get_scene_profile(input_file)
+
+    if voxel_size and voxel_size > 0:
+        print(f"Downsampled to {len(points)} points (voxel size = {voxel_size}).")
+    else:
+        print("Skipping downsampling...")
+
+    if (len(points) if keep is None else np.count_nonzero(keep)) < 3:
+        print("Not enough points to form a boundary.")
+        return False
+
+    # If slicing at wall height
+    if use_wall_slice:
+        print("Using wall slice approach.")
+        if wall_height is None:
+            floor_approx = profile["floor_height"]
+            wall_height = floor_approx + wall_offset
+            print(f"Detected floor ~ {floor_approx:.3f}m; using wall_height = {wall_height:.3f}m")
+        else:
+            print(f"Using specified wall_height = {wall_height:.3f}m")
+        half_thick = slice_thickness / 2.0
+        index = load_or_build_z_index(points, input_file, voxel_size=voxel_size or None, **(splat or {}))
+        slice_points = z_slice(index, wall_height - half_thick, wall_height + half_thick, keep)
+        if len(slice_points) < 3:
+            print("Warning: Not enough points in the wall slice. No boundary created.")
+            return False
+        grid_points = slice_points
+        print(f"Wall slice: {len(slice_points)} points selected.")
+    else:
+        print("Using all points projected to XY.")
+        grid_points = points if keep is None else points[keep]
+
+    # Rasterize into a 2D density grid
+    min_x, max_x, min_y, max_y = raster_bounds(grid_points)
+    padding = 0.05 * max(max_x - min_x, max_y - min_y)
+    bounds = raster_bounds(grid_points, padding)
+    tiled = use_tiles(bounds, grid_size, tile_size)
+    # Occupied cells need at least `min_density` points, which drops isolated strays
+    if tiled:
+        grid = tiled_occupancy(grid_points, grid_size, bounds, min_count=min_density,
+                               tile_size=tile_size or DEFAULT_TILE_SIZE)
+        height, width = grid["shape"]
+        print(f"Creating tiled grid of size {width} x {height} at {grid_size} m resolution "
+              f"({len(grid['tiles'])} tiles of {grid['tile_size']} cells).")
+        print(f"{occupied_cells(grid)} cells with >= {min_density} points")
+        raw_image, image_extent = tiled_preview(grid)
+    else:
+        raster = rasterize(grid_points, grid_size, bounds=bounds)
+        height, width = raster["shape"]
+        print(f"Creating grid of size {width} x {height} at {grid_size} m resolution.")
+        save_raster(out_path / "raster.npz", raster)
+        grid = density_mask(raster, min_density)
+        print(f"{int(grid.sum())} cells with >= {min_density} points "
+              f"({int((raster['count'] > 0).sum())} with any point)")
+        raw_image, image_extent = grid, raster["extent"]
+
+    result = trace_concave_boundary(grid, grid_size, image_extent, no_simplify, snap, max_frames, snap_angle)
+    save_concave_boundary(out_path, raw_image, result["clean_image"], image_extent, result["boundary"],
+                          dim_mode, dim_scale)
+
     print("Done.")
     return True
 
@@ -328,6 +392,19 @@ def main():
                         help="Voxel downsample size (m). Set 0 to disable.")
     parser.add_argument("--no-simplify", action="store_true",
                         help="If set, do not simplify the extracted boundary with Shapely.")
+    parser.add_argument("--min-density", type=int, default=2,
+                        help="Minimum points per grid cell to count as occupied (1 = any point).")
+    parser.add_argument("--snap", choices=("auto", "axis", "none"), default="auto",
+                        help="Snap edges to the dominant wall directions (auto), the X/Y axes, or not at all.")
+    parser.add_argument("--max-frames", type=int, default=2,
+                        help="Maximum number of dominant directions for --snap auto (angled wings).")
+    parser.add_argument("--snap-angle", type=float, default=10.0,
+                        help="Maximum deviation (degrees) of an edge from a direction to snap it.")
+    parser.add_argument("--tile-size", type=int, default=None,
+                        help="Process the grid in bit-packed tiles of this many cells (0 = dense; default: tiles for large grids).")
+    add_dxf_arguments(parser)
+    add_denoise_arguments(parser)
+    add_splat_arguments(parser)
     args = parser.parse_args()
 
     extract_concave_boundary(
@@ -339,7 +416,16 @@ def main():
         slice_thickness=args.slice_thickness,
         grid_size=args.grid_size,
         voxel_size=args.voxel_size,
-        no_simplify=args.no_simplify
+        no_simplify=args.no_simplify,
+        denoise=denoise_options(args),
+        min_density=args.min_density,
+        snap=args.snap,
+        max_frames=args.max_frames,
+        snap_angle=args.snap_angle,
+        dim_mode=args.dim_mode,
+        dim_scale=args.dim_scale,
+        tile_size=args.tile_size,
+        splat=splat_options(args)
     )
 
 if __name__ == "__main__":
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+Accuracy and speed benchmark of the floorplan tools against ground truth.
+
+Each (tool, parameter set) run executes in a fresh process, which keeps the
+peak memory figures independent. Every run records:
+  load_s         decoding the PLY through the point cache (cold on the first run)
+  extract_s      the tool itself
+  metrics_s      registration and scoring
+  peak_rss_mb    peak resident memory of the run's process
+A run whose process crashes, raises or exceeds --timeout is recorded as failed.
+The extracted boundary is registered onto the reference outline
+(floorplan_data.json or gt_floorplan.png) with the editor's scale reference,
+when set, and a similarity ICP fit. The run then reports IoU, Hausdorff
+distance and mean edge distance (floorplan_metrics.compare_to_reference).
+
+Results are written as a CSV table for this run, and appended to a JSONL
+history (with timestamp and git commit) for regression tracking. The console
+shows the change from the previous entry for the same tool and parameters.
+
+Usage:
+  python floorplan_benchmark.py input.ply --reference floorplan_data.json [--config runs.json]
+      [--output benchmark_output] [--history benchmark_history.jsonl] [--timeout SECONDS]
+
+runs.json:
+  [{"tool": "extract_floorplan", "params": {"grid_size": 0.05}},
+   {"tool": "extract_wallplan", "params": {"use_wall_slice": true, "grid_size": 0.1}},
+   {"tool": "boundary_generator", "params": {}}]
+"""
+
+import os
+import sys
+import csv
+import json
+import time
+import argparse
+import queue as queue_module
+import resource
+import importlib
+import subprocess
+import multiprocessing
+import numpy as np
+from pathlib import Path
+
+from floorplan_metrics import load_reference_polygon, compare_to_reference, polygon_area
+
+# tool name -> (module, function, output file holding the extracted boundary)
+TOOLS = {
+    "extract_floorplan": ("extract_floorplan", "extract_wall_floorplan_basic", "wall_contours.json"),
+    "extract_wallplan": ("extract_wallplan", "extract_concave_boundary", "outer_boundary.json"),
+    "boundary_generator": ("boundary_generator", "get_outer_boundary", "outer_boundary_convex_hull.json"),
+}
+
+DEFAULT_RUNS = [{"tool": tool, "params": {}} for tool in TOOLS]
+
+CSV_FIELDS = ["tool", "params", "ok", "iou", "hausdorff", "mean_edge_distance", "units",
+              "load_s", "extract_s", "metrics_s", "peak_rss_mb"]
+
+FAILED_STATS = {"ok": False, "load_s": None, "extract_s": None, "peak_rss_mb": None}
+
+
+def _run_tool(tool, input_file, output_dir, params, queue):
+    """Child process: load through the cache, run one tool and report timings and memory."""
+    try:
+        import matplotlib
+        matplotlib.use('Agg')
+        from point_cache import load_points_cached
+
+        module_name, function_name, _ = TOOLS[tool]
+        function = getattr(importlib.import_module(module_name), function_name)
+
+        start = time.perf_counter()
+        load_points_cached(input_file, with_colors=False)
+        load_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        ok = bool(function(input_file, output_dir, **params))
+        extract_s = time.perf_counter() - start
+    except Exception as e:
+        print(f"Error running {tool}: {e}")
+        queue.put(dict(FAILED_STATS))
+        return
+
+    queue.put({"ok": ok, "load_s": load_s, "extract_s": extract_s,
+               # ru_maxrss is in kilobytes on Linux
+               "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024})
+
+
+def _wait_for_stats(process, queue, timeout=None, poll_s=1.0):
+    """
+    Wait for a run's stats without blocking on a dead or hung child.
+
+    Returns:
+        dict: The child's stats, or None if it exited without reporting or timed out.
+    """
+    deadline = None if timeout is None else time.monotonic() + timeout
+    while True:
+        try:
+            return queue.get(timeout=poll_s)
+        except queue_module.Empty:
+            pass
+        if not process.is_alive():
+            # The child may have reported just before exiting
+            try:
+                return queue.get(timeout=poll_s)
+            except queue_module.Empty:
+                return None
+        if deadline is not None and time.monotonic() > deadline:
+            return None
+
+
+def read_boundary(tool, output_dir):
+    """
+    Extracted boundary of a finished run as an Nx2 polygon (None if missing).
+
+    For extract_floorplan's wall contours the largest contour by area (the outer wall face) is used.
+    """
+    path = Path(output_dir) / TOOLS[tool][2]
+    if not path.exists():
+        return None
+    with open(path) as f:
+        data = json.load(f)
+    if "boundary" in data:
+        polygon = np.asarray(data["boundary"], dtype=np.float64)
+    else:
+        contours = [np.asarray(c, dtype=np.float64) for c in data.get("contours", []) if len(c) >= 3]
+        if not contours:
+            return None
+        polygon = max(contours, key=polygon_area)
+    if len(polygon) > 1 and np.allclose(polygon[0], polygon[-1]):
+        polygon = polygon[:-1]
+    return polygon if len(polygon) >= 3 else None
+
+
+def benchmark_run(tool, params, input_file, reference, meters_per_unit, output_dir, timeout=None):
+    """
+    Run one tool/parameter set in a fresh process and score its boundary.
+
+    Args:
+        timeout (float, optional): Seconds before a run is killed and recorded as failed.
+    Returns:
+        dict: One result row (see CSV_FIELDS).
+    """
+    if tool not in TOOLS:
+        raise ValueError(f"Unknown tool '{tool}', expected one of {sorted(TOOLS)}")
+    context = multiprocessing.get_context('spawn')
+    queue = context.Queue()
+    process = context.Process(target=_run_tool, args=(tool, input_file, str(output_dir), params, queue))
+    process.start()
+    stats = _wait_for_stats(process, queue, timeout)
+    if stats is None:
+        if process.is_alive():
+            print(f"{tool} timed out after {timeout}s")
+            process.terminate()
+        else:
+            print(f"{tool} exited with code {process.exitcode} without reporting")
+        stats = dict(FAILED_STATS)
+    process.join()
+
+    row = {"tool": tool, "params": json.dumps(params, sort_keys=True), **stats,
+           "iou": None, "hausdorff": None, "mean_edge_distance": None, "units": None, "metrics_s": None}
+    polygon = read_boundary(tool, output_dir) if stats["ok"] else None
+    if polygon is None:
+        row["ok"] = False
+        return row
+
+    start = time.perf_counter()
+    metrics = compare_to_reference(polygon, reference, meters_per_unit)
+    row["metrics_s"] = time.perf_counter() - start
+    row.update({k: metrics[k] for k in ("iou", "hausdorff", "mean_edge_distance", "units")})
+    return row
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def _previous_results(history_path):
+    """Latest history entry per (tool, params, input) key."""
+    previous = {}
+    if history_path.exists():
+        with open(history_path) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                previous[(entry["tool"], entry["params"], entry.get("input"))] = entry
+    return previous
+
+
+def _format(value, fmt, suffix=""):
+    return "n/a" if value is None else f"{value:{fmt}}{suffix}"
+
+
+def _delta(value, old, fmt):
+    if value is None or old is None:
+        return ""
+    return f" ({value - old:+{fmt}})"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark floorplan tools against a ground-truth outline.")
+    parser.add_argument("input", help="Input PLY file")
+    parser.add_argument("--reference", default="floorplan_data.json",
+                        help="Ground truth (floorplan_data.json or gt_floorplan.png)")
+    parser.add_argument("--config", default=None, help="JSON list of {\"tool\", \"params\"} runs")
+    parser.add_argument("--output", default="benchmark_output", help="Directory for tool outputs and results")
+    parser.add_argument("--history", default=None,
+                        help="JSONL history file (default: <output>/benchmark_history.jsonl)")
+    parser.add_argument("--timeout", type=float, default=None,
+                        help="Seconds before a run is killed and recorded as failed (default: no limit)")
+    args = parser.parse_args()
+
+    runs = DEFAULT_RUNS
+    if args.config:
+        with open(args.config) as f:
+            runs = json.load(f)
+
+    output_path = Path(args.output)
+    output_path.mkdir(parents=True, exist_ok=True)
+    history_path = Path(args.history) if args.history else output_path / "benchmark_history.jsonl"
+    previous = _previous_results(history_path)
+
+    reference, meters_per_unit = load_reference_polygon(args.reference)
+    commit = _git_commit()
+    timestamp = time.strftime("%Y-%m-%dT%H:%M:%S")
+
+    rows = []
+    for i, run in enumerate(runs):
+        tool, params = run["tool"], run.get("params", {})
+        print(f"\n=== [{i + 1}/{len(runs)}] {tool} {params} ===")
+        row = benchmark_run(tool, params, args.input, reference, meters_per_unit,
+                            output_path / f"run_{i:02d}_{tool}", timeout=args.timeout)
+        rows.append(row)
+
+        old = previous.get((tool, row["params"], os.path.abspath(args.input)), {})
+        if row["ok"]:
+            print(f"IoU {row['iou']:.4f}{_delta(row['iou'], old.get('iou'), '.4f')}  "
+                  f"Hausdorff {row['hausdorff']:.3f}{_delta(row['hausdorff'], old.get('hausdorff'), '.3f')}  "
+                  f"edge {row['mean_edge_distance']:.3f} {row['units']}")
+        else:
+            print("Run failed or produced no boundary.")
+        print(f"load {_format(row['load_s'], '.2f', 's')}  extract {_format(row['extract_s'], '.2f', 's')}"
+              f"{_delta(row['extract_s'], old.get('extract_s'), '.2f')}  "
+              f"peak RSS {_format(row['peak_rss_mb'], '.0f', ' MB')}")
+
+    csv_path = output_path / "benchmark_results.csv"
+    with open(csv_path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=CSV_FIELDS, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(rows)
+    with open(history_path, 'a') as f:
+        for row in rows:
+            f.write(json.dumps({"timestamp": timestamp, "commit": commit, "input": os.path.abspath(args.input),
+                                "reference": os.path.abspath(args.reference), **row}) + "\n")
+    print(f"\nResults saved to {csv_path} and appended to {history_path}")
+    return 0 if all(row["ok"] for row in rows) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+Compare extracted floorplan boundaries with a ground-truth outline.
+
+The reference is either the JSON written by floorplan.FloorplanEditor
+(`floorplan_data.json`: canvas points, optional scale reference) or an outline
+image such as `gt_floorplan.png`. Editor coordinates are image pixels with y
+pointing down; they are flipped to y-up and converted to meters when the
+editor's scale reference is present.
+
+Extracted boundaries live in world coordinates, so they are registered onto
+the reference with a 2D similarity transform. The transform is estimated
+with ICP on resampled boundary points, from several initial rotations, before
+any overlap score is computed.
+"""
+
+import json
+import numpy as np
+from scipy.spatial import cKDTree
+from scipy.spatial.distance import directed_hausdorff
+from scipy.ndimage import binary_fill_holes
+
+try:
+    from shapely.geometry import Polygon
+except ImportError:
+    Polygon = None
+
+try:
+    from skimage import measure
+except ImportError:
+    measure = None
+
+
+def polygon_area(poly):
+    """Unsigned shoelace area of an Nx2 polygon."""
+    x, y = poly[:, 0], poly[:, 1]
+    return 0.5 * abs(np.dot(x, np.roll(y, -1)) - np.dot(y, np.roll(x, -1)))
+
+
+def resample_boundary(poly, num_samples=400):
+    """Resample a closed polygon boundary at `num_samples` equally spaced points."""
+    closed = np.vstack((poly, poly[:1]))
+    seg = np.linalg.norm(np.diff(closed, axis=0), axis=1)
+    cum = np.concatenate(([0.0], np.cumsum(seg)))
+    if cum[-1] == 0:
+        return np.repeat(poly[:1], num_samples, axis=0)
+    t = np.linspace(0.0, cum[-1], num_samples, endpoint=False)
+    return np.column_stack((np.interp(t, cum, closed[:, 0]), np.interp(t, cum, closed[:, 1])))
+
+
+def _largest_contour(mask):
+    """Largest outer contour of a binary mask as Nx2 (col, row) coordinates."""
+    if measure is None:
+        raise ImportError("scikit-image is required to read image references")
+    contours = measure.find_contours(np.pad(mask.astype(float), 1), 0.5)
+    if not contours:
+        return None
+    contour = max(contours, key=lambda c: polygon_area(c[:, ::-1]))
+    return contour[:, ::-1] - 1
+
+
+def load_reference_polygon(path):
+    """
+    Load a ground-truth outline.
+
+    Args:
+        path (str): floorplan.FloorplanEditor JSON or an outline image (dark lines on light background).
+    Returns:
+        tuple: (Nx2 polygon with y up, meters per unit or None if the reference has no scale)
+    """
+    path = str(path)
+    if path.lower().endswith(".json"):
+        with open(path) as f:
+            data = json.load(f)
+        poly = np.asarray(data["points"], dtype=np.float64)
+        meters_per_unit = None
+        scale = data.get("scale")
+        if scale and scale.get("pixel_distance"):
+            meters_per_unit = scale["real_distance"] / scale["pixel_distance"]
+    else:
+        import matplotlib.image as mpimg
+        image = mpimg.imread(path)
+        gray = image[..., :3].mean(axis=2) if image.ndim == 3 else image
+        if gray.max() > 1.0:
+            gray = gray / 255.0
+        filled = binary_fill_holes(gray < 0.5)
+        poly = _largest_contour(filled)
+        if poly is None:
+            raise ValueError(f"No outline found in {path}")
+        meters_per_unit = None
+    poly[:, 1] = -poly[:, 1]
+    if meters_per_unit is not None:
+        poly = poly * meters_per_unit
+    return poly, meters_per_unit
+
+
+def _similarity_fit(src, dst, allow_scale=True):
+    """Least-squares 2D similarity (Umeyama) mapping src onto dst: dst ~ s * R @ src + t."""
+    mu_src, mu_dst = src.mean(axis=0), dst.mean(axis=0)
+    a, b = src - mu_src, dst - mu_dst
+    u, sig, vt = np.linalg.svd(b.T @ a / len(src))
+    d = np.sign(np.linalg.det(u @ vt))
+    rotation = u @ np.diag([1.0, d]) @ vt
+    scale = (sig[0] + d * sig[1]) / a.var(axis=0).sum() if allow_scale else 1.0
+    return scale, rotation, mu_dst - scale * rotation @ mu_src
+
+
+def apply_transform(points, transform):
+    """Apply a registration transform {"scale", "rotation", "translation"} to Nx2 points."""
+    return transform["scale"] * points @ np.asarray(transform["rotation"]).T + np.asarray(transform["translation"])
+
+
+def register_to_reference(polygon, reference, fixed_scale=None, num_samples=400, iterations=40,
+                          initial_rotations=8):
+    """
+    Register an extracted polygon onto the reference with similarity ICP.
+
+    The polygon is first normalized to the reference's centroid and area (or
+    `fixed_scale` when both are metric), then ICP is run from
+    `initial_rotations` evenly spaced starting angles and the best fit is kept.
+
+    Args:
+        polygon (np.array): Nx2 extracted boundary.
+        reference (np.array): Mx2 reference boundary.
+        fixed_scale (float, optional): Known scale from polygon to reference units.
+    Returns:
+        dict: {"scale", "rotation" (2x2 list), "translation", "residual" (mean boundary
+               distance in reference units), "polygon" (transformed Nx2 polygon)}
+    """
+    source = resample_boundary(polygon, num_samples)
+    target = resample_boundary(reference, num_samples)
+    tree = cKDTree(target)
+    src_center, dst_center = polygon.mean(axis=0), reference.mean(axis=0)
+    if fixed_scale is not None:
+        base_scale = fixed_scale
+    else:
+        base_scale = np.sqrt(polygon_area(reference) / max(polygon_area(polygon), 1e-12))
+
+    best = None
+    for k in range(initial_rotations):
+        angle = 2.0 * np.pi * k / initial_rotations
+        c, s = np.cos(angle), np.sin(angle)
+        transform = {"scale": base_scale, "rotation": np.array([[c, -s], [s, c]]),
+                     "translation": dst_center - base_scale * np.array([[c, -s], [s, c]]) @ src_center}
+        for _ in range(iterations):
+            moved = apply_transform(source, transform)
+            _, nearest = tree.query(moved)
+            scale, rotation, translation = _similarity_fit(source, target[nearest],
+                                                          allow_scale=fixed_scale is None)
+            transform = {"scale": scale, "rotation": rotation, "translation": translation}
+        distances, _ = tree.query(apply_transform(source, transform))
+        residual = float(distances.mean())
+        if best is None or residual < best["residual"]:
+            best = dict(transform, residual=residual)
+
+    best["polygon"] = apply_transform(polygon, best)
+    best["scale"] = float(best["scale"])
+    best["rotation"] = np.asarray(best["rotation"]).tolist()
+    best["translation"] = np.asarray(best["translation"]).tolist()
+    return best
+
+
+def polygon_iou(a, b, resolution=512):
+    """
+    Intersection over union of two Nx2 polygons (shapely, or rasterized without it).
+    """
+    if Polygon is not None:
+        pa, pb = Polygon(a).buffer(0), Polygon(b).buffer(0)
+        union = pa.union(pb).area
+        return float(pa.intersection(pb).area / union) if union > 0 else 0.0
+
+    from matplotlib.path import Path as MplPath
+    both = np.vstack((a, b))
+    lo, hi = both.min(axis=0), both.max(axis=0)
+    xs = np.linspace(lo[0], hi[0], resolution)
+    ys = np.linspace(lo[1], hi[1], resolution)
+    grid = np.column_stack([g.ravel() for g in np.meshgrid(xs, ys)])
+    in_a = MplPath(a).contains_points(grid)
+    in_b = MplPath(b).contains_points(grid)
+    union = np.count_nonzero(in_a | in_b)
+    return float(np.count_nonzero(in_a & in_b) / union) if union else 0.0
+
+
+def point_to_polygon_distances(points, poly):
+    """Distance from each of N points to the nearest edge of a closed polygon."""
+    a = poly
+    b = np.roll(poly, -1, axis=0)
+    ab = b - a
+    length_sq = np.maximum((ab ** 2).sum(axis=1), 1e-24)
+    ap = points[:, None, :] - a[None, :, :]
+    t = np.clip((ap * ab[None]).sum(axis=2) / length_sq[None], 0.0, 1.0)
+    nearest = a[None] + t[..., None] * ab[None]
+    return np.sqrt(((points[:, None, :] - nearest) ** 2).sum(axis=2)).min(axis=1)
+
+
+def hausdorff_distance(a, b, num_samples=2000):
+    """Symmetric Hausdorff distance between two polygon boundaries (densely resampled)."""
+    sa, sb = resample_boundary(a, num_samples), resample_boundary(b, num_samples)
+    return float(max(directed_hausdorff(sa, sb)[0], directed_hausdorff(sb, sa)[0]))
+
+
+def mean_edge_distance(a, b, num_samples=1000):
+    """Mean distance between two boundaries: boundary samples of each to the other's edges, averaged."""
+    d_ab = point_to_polygon_distances(resample_boundary(a, num_samples), b)
+    d_ba = point_to_polygon_distances(resample_boundary(b, num_samples), a)
+    return float((d_ab.mean() + d_ba.mean()) / 2.0)
+
+
+def compare_to_reference(polygon, reference, meters_per_unit=None):
+    """
+    Register an extracted boundary onto the reference and measure the agreement.
+
+    With a metric reference (editor scale set) the extracted boundary keeps its
+    scale and distances are in meters; otherwise the scale is fitted and
+    distances are in reference units (pixels).
+
+    Returns:
+        dict: {"iou", "hausdorff", "mean_edge_distance", "units", "scale", "residual"}
+    """
+    registration = register_to_reference(polygon, reference, fixed_scale=1.0 if meters_per_unit else None)
+    aligned = registration["polygon"]
+    return {
+        "iou": polygon_iou(aligned, reference),
+        "hausdorff": hausdorff_distance(aligned, reference),
+        "mean_edge_distance": mean_edge_distance(aligned, reference),
+        "units": "meters" if meters_per_unit else "reference units",
+        "scale": registration["scale"],
+        "residual": registration["residual"],
+    }
+
+
+def footprint_polygon(grid_binary, origin, grid_size):
+    """
+    Outer footprint of a wall grid: the largest contour of the grid with its
+    enclosed rooms filled, in world coordinates (None if the grid is empty).
+    """
+    contour = _largest_contour(binary_fill_holes(grid_binary))
+    if contour is None or len(contour) < 3:
+        return None
+    return contour * grid_size + np.asarray(origin)
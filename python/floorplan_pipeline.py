@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+One-load floorplan pipeline: convex hull, concave boundary and wall plan.
+
+Running boundary_generator.py, extract_wallplan.py and extract_floorplan.py one
+after another decodes the PLY, estimates the floor and rasterizes three times.
+This entry point:
+  - loads (through the point cache), denoises and profiles the cloud once
+  - computes the convex hull from the same arrays
+  - rasterizes once: the count channel (all points projected) feeds the
+    concave boundary and a height band at floor + offset feeds the wall plan
+  - writes the independent products (PNGs, JSON, DXFs) concurrently in
+    worker processes
+
+Products keep the file names of the individual tools, in one directory, plus
+raster.npz (count = all points, band 0 = wall slice) and pipeline.json
+(parameters and stage timings).
+
+Usage:
+  python floorplan_pipeline.py input.ply output_dir [--grid-size 0.05] [--offset 1.2] [--workers N]
+"""
+
+import sys
+import json
+import time
+import argparse
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+from scipy.spatial import ConvexHull
+
+from ply_io import add_splat_arguments, splat_options
+from point_cache import load_points_cached
+from denoise import outlier_mask, add_denoise_arguments, denoise_options, MASK_FILENAME
+from raster import rasterize, raster_bounds, density_mask, save_raster
+from scene_profile import get_scene_profile
+from z_index import load_or_build_z_index, z_slice
+from tiled_raster import use_tiles, tiled_occupancy, tiled_preview, DEFAULT_TILE_SIZE
+from dxf_export import add_dxf_arguments
+from boundary_generator import save_hull_products, MAX_PLOT_POINTS
+from extract_wallplan import trace_concave_boundary, save_concave_boundary
+from extract_floorplan import (DEFAULT_MORPHOLOGY, process_occupancy, wall_grid_contours, save_wall_plan,
+                               skimage_available)
+
+
+def run_pipeline(input_file, output_dir, grid_size=0.05, wall_height=None, auto_height_offset=1.2,
+                 slice_thickness=0.1, min_density=2, min_contour_length=10, dim_min_length=0.5, morphology=None,
+                 denoise=None, no_simplify=False, snap='auto', max_frames=2, snap_angle=10.0, dim_mode='full',
+                 dim_scale=0.01, tile_size=None, workers=None, splat=None):
+    """
+    Produce the convex hull, concave boundary and wall plan of a PLY from a single load.
+
+    Args:
+        input_file (str): Input PLY file.
+        output_dir (str): Output directory.
+        grid_size (float): Cell size of the shared raster (meters).
+        wall_height (float, optional): Wall slice height; default floor + `auto_height_offset`.
+        slice_thickness (float): Wall slice thickness (meters).
+        min_density (int): Minimum points per occupied cell.
+        min_contour_length, dim_min_length, morphology: As for extract_floorplan.
+        no_simplify, snap, max_frames, snap_angle: As for extract_wallplan.
+        dim_mode, dim_scale: DXF dimensions (see dxf_export.export_dxf).
+        denoise (dict, optional): Outlier removal options for denoise.outlier_mask.
+        tile_size (int, optional): Tiled grids (see tiled_raster.use_tiles).
+        workers (int, optional): Writer processes (default CPU count; 1 writes inline).
+        splat (dict, optional): Gaussian splat pruning options for load_points_cached (ply_io.splat_options).
+    Returns:
+        dict or None: Summary written to pipeline.json, or None on failure.
+    """
+    output_path = Path(output_dir)
+    output_path.mkdir(parents=True, exist_ok=True)
+    timings = {}
+    start = time.time()
+
+    print(f"Loading point cloud from {input_file}...")
+    try:
+        points, _ = load_points_cached(input_file, with_colors=False, **(splat or {}))
+    except Exception as e:
+        print(f"Error loading point cloud: {e}")
+        return None
+    if len(points) < 3:
+        print("Error: Not enough points.")
+        return None
+    keep = None
+    if denoise:
+        keep = outlier_mask(points, ply_path=input_file, mask_path=output_path / MASK_FILENAME, **denoise)
+    kept = points if keep is None else points[keep]
+    timings["load"] = time.time() - start
+
+    start = time.time()
+    profile = get_scene_profile(input_file)
+    if wall_height is None:
+        wall_height = profile["floor_height"] + auto_height_offset
+        print(f"Detected floor near {profile['floor_height']:.3f}m; wall slice at {wall_height:.3f}m")
+    band = (wall_height - slice_thickness / 2, wall_height + slice_thickness / 2)
+    timings["profile"] = time.time() - start
+
+    start = time.time()
+    points_2d = kept[:, :2]
+    try:
+        hull_points = points_2d[ConvexHull(points_2d).vertices]
+    except Exception as e:
+        print(f"Error calculating Convex Hull: {e}")
+        return None
+    print(f"Convex Hull found with {len(hull_points)} vertices.")
+    timings["hull"] = time.time() - start
+
+    # One raster for both grid products
+    start = time.time()
+    min_x, max_x, min_y, max_y = raster_bounds(kept)
+    padding = 0.05 * max(max_x - min_x, max_y - min_y, 1.0)
+    bounds = raster_bounds(kept, padding)
+    if use_tiles(bounds, grid_size, tile_size):
+        tile_size = tile_size or DEFAULT_TILE_SIZE
+        all_grid = tiled_occupancy(kept, grid_size, bounds, min_count=min_density, tile_size=tile_size)
+        wall_points = z_slice(load_or_build_z_index(points, input_file, **(splat or {})), band[0], band[1], keep)
+        wall_grid = tiled_occupancy(wall_points, grid_size, bounds, min_count=min_density, tile_size=tile_size)
+        extent = all_grid["extent"]
+        raw_image, raw_extent = tiled_preview(all_grid)
+        print(f"Tiled grids at {grid_size}m: {len(all_grid['tiles'])} / {len(wall_grid['tiles'])} tiles")
+    else:
+        raster = rasterize(kept, grid_size, bounds=bounds, bands=[band])
+        save_raster(output_path / "raster.npz", raster)
+        all_grid = density_mask(raster, min_density)
+        wall_grid = density_mask(raster, min_density, band=0)
+        extent = raw_extent = raster["extent"]
+        raw_image = all_grid
+        print(f"Raster {raster['shape'][0]} x {raster['shape'][1]} at {grid_size}m: "
+              f"{int(all_grid.sum())} occupied cells, {int(wall_grid.sum())} in the wall slice")
+    timings["raster"] = time.time() - start
+
+    start = time.time()
+    params = dict(DEFAULT_MORPHOLOGY, **(morphology or {}))
+    wall_binary, wall_image, wall_extent = process_occupancy(wall_grid, extent, params)
+    contours_world = None
+    if skimage_available:
+        contours_world = wall_grid_contours(wall_binary, extent, grid_size, min_contour_length)
+        print(f"Wall plan: {len(contours_world)} contours.")
+    timings["wall_plan"] = time.time() - start
+
+    start = time.time()
+    boundary = trace_concave_boundary(all_grid, grid_size, extent, no_simplify, snap, max_frames, snap_angle)
+    timings["boundary"] = time.time() - start
+
+    # The products are independent: write them concurrently. The hull plot only
+    # draws MAX_PLOT_POINTS points, so thin them here instead of pickling the cloud
+    start = time.time()
+    plot_points = points_2d[::max(1, len(points_2d) // MAX_PLOT_POINTS)]
+    jobs = [
+        (save_hull_products, (output_path, plot_points, hull_points, dim_mode, dim_scale)),
+        (save_concave_boundary, (output_path, raw_image, boundary["clean_image"], raw_extent,
+                                 boundary["boundary"], dim_mode, dim_scale)),
+        (save_wall_plan, (output_path, wall_image, wall_extent, padding, grid_size, wall_height, contours_world,
+                          dim_mode, dim_min_length, dim_scale)),
+    ]
+    if workers == 1:
+        for func, args in jobs:
+            func(*args)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for future in [executor.submit(func, *args) for func, args in jobs]:
+                future.result()
+    timings["write"] = time.time() - start
+
+    summary = {
+        "input": str(input_file), "num_points": int(len(kept)), "grid_size": grid_size,
+        "floor_height": profile["floor_height"], "wall_height": wall_height, "slice_thickness": slice_thickness,
+        "morphology": params, "hull_vertices": int(len(hull_points)),
+        "boundary_vertices": None if boundary["boundary"] is None else int(len(boundary["boundary"])),
+        "wall_contours": None if contours_world is None else len(contours_world),
+        "timings": timings,
+    }
+    with open(output_path / "pipeline.json", 'w') as f:
+        json.dump(summary, f, indent=2)
+    print("Stage timings: " + ", ".join(f"{k} {v:.2f}s" for k, v in timings.items()))
+    print(f"Saved pipeline summary to {output_path / 'pipeline.json'}")
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write the convex hull, concave boundary and wall plan of a PLY from one load.")
+    parser.add_argument("input", help="Input PLY file")
+    parser.add_argument("output", help="Output directory")
+    parser.add_argument("--grid-size", type=float, default=0.05, help="Shared raster resolution (meters/cell).")
+    parser.add_argument("--height", type=float, default=None, help="Height (Z) for wall slice (meters).")
+    parser.add_argument("--offset", type=float, default=1.2, help="Height above floor if auto-detecting (meters).")
+    parser.add_argument("--thickness", type=float, default=0.1, help="Wall slice thickness (meters).")
+    parser.add_argument("--min-density", type=int, default=2, help="Min points per grid cell (1 = any point).")
+    parser.add_argument("--min-contour-pts", type=int, default=100, help="Min points per wall contour.")
+    parser.add_argument("--min-dim-len", type=float, default=0.5, help="Min length for dimensioning (meters).")
+    parser.add_argument("--dilate", type=int, default=DEFAULT_MORPHOLOGY["dilate_iterations"], help="Dilation iterations.")
+    parser.add_argument("--erode", type=int, default=DEFAULT_MORPHOLOGY["erode_iterations"], help="Erosion iterations.")
+    parser.add_argument("--close", type=int, default=DEFAULT_MORPHOLOGY["close_iterations"], help="Closing iterations.")
+    parser.add_argument("--sigma", type=float, default=DEFAULT_MORPHOLOGY["gaussian_sigma"], help="Gaussian smoothing sigma (0 = off).")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_MORPHOLOGY["threshold"], help="Threshold after smoothing.")
+    parser.add_argument("--no-simplify", action="store_true", help="Do not simplify the concave boundary.")
+    parser.add_argument("--snap", choices=("auto", "axis", "none"), default="auto",
+                        help="Snap boundary edges to the dominant wall directions (auto), the X/Y axes, or not at all.")
+    parser.add_argument("--max-frames", type=int, default=2, help="Maximum number of dominant directions for --snap auto.")
+    parser.add_argument("--snap-angle", type=float, default=10.0, help="Maximum deviation (degrees) of an edge to snap it.")
+    parser.add_argument("--tile-size", type=int, default=None,
+                        help="Process grids in bit-packed tiles of this many cells (0 = dense; default: tiles for large grids).")
+    parser.add_argument("--workers", type=int, default=None, help="Processes writing the products (default: CPU count).")
+    add_dxf_arguments(parser)
+    add_denoise_arguments(parser)
+    add_splat_arguments(parser)
+    args = parser.parse_args()
+
+    morphology = {"dilate_iterations": args.dilate, "erode_iterations": args.erode,
+                  "close_iterations": args.close, "gaussian_sigma": args.sigma, "threshold": args.threshold}
+    summary = run_pipeline(args.input, args.output, grid_size=args.grid_size, wall_height=args.height,
+                           auto_height_offset=args.offset, slice_thickness=args.thickness,
+                           min_density=args.min_density, min_contour_length=args.min_contour_pts,
+                           dim_min_length=args.min_dim_len, morphology=morphology, denoise=denoise_options(args),
+                           no_simplify=args.no_simplify, snap=args.snap, max_frames=args.max_frames,
+                           snap_angle=args.snap_angle, dim_mode=args.dim_mode, dim_scale=args.dim_scale,
+                           tile_size=args.tile_size, workers=args.workers, splat=splat_options(args))
+    return 0 if summary is not None else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+Parameter sweep / auto-tuning for extract_floorplan's grid cleanup.
+
+The point cloud is loaded, sliced and rasterized once (or an existing
+`raster.npz` written by extract_floorplan or floorplan_pipeline is reused;
+a raster with height bands is swept on its first band, the wall slice). Then a grid or random
+search over the morphology parameters (dilate / erode / close iterations,
+Gaussian sigma, threshold) is evaluated in parallel worker processes, which
+all share that one raster.
+
+Each candidate is scored by:
+  closure      fraction of its footprint enclosed by walls (0 if walls never close)
+  contours     number of traced contours (fragmentation)
+  iou          IoU of its footprint with the reference outline after
+               similarity registration (floorplan_metrics)
+score = iou (or closure without a reference), halved if the walls do not
+close and divided by 1 + 0.05 per contour beyond the first two.
+
+Outputs in output_dir:
+  sweep_results.json       all candidates, best first
+  best_morphology.json     best parameters (pass to extract_floorplan --dilate ... or `morphology=`)
+  sweep_contact_sheet.png  top candidates side by side
+
+Usage:
+  python floorplan_sweep.py input.ply output_dir --reference floorplan_data.json [--random 60] [--workers 4]
+  python floorplan_sweep.py output_dir/raster.npz output_dir --reference gt_floorplan.png
+"""
+
+import sys
+import json
+import time
+import itertools
+import argparse
+import numpy as np
+import matplotlib.pyplot as plt
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+from scipy.ndimage import binary_fill_holes
+
+from ply_io import add_splat_arguments, splat_options
+from point_cache import load_points_cached
+from raster import rasterize, raster_bounds, density_mask, load_raster
+from scene_profile import get_scene_profile
+from z_index import load_or_build_z_index, z_slice
+from floorplan_metrics import load_reference_polygon, register_to_reference, polygon_iou, footprint_polygon
+from extract_floorplan import DEFAULT_MORPHOLOGY, process_wall_grid, grid_contours
+
+DEFAULT_PARAM_GRID = {
+    "dilate_iterations": [1, 2, 3, 4],
+    "erode_iterations": [0, 1, 2],
+    "close_iterations": [1, 3, 5],
+    "gaussian_sigma": [0.0, 1.0, 1.5, 2.0],
+    "threshold": [0.3, 0.4, 0.5],
+}
+
+# Shared by the worker processes (set once per worker by _init_worker)
+_shared = {}
+
+
+def grid_candidates(param_grid=None):
+    """All combinations of a parameter grid {name: [values]}."""
+    param_grid = param_grid or DEFAULT_PARAM_GRID
+    names = list(param_grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(param_grid[n] for n in names))]
+
+
+def random_candidates(num_candidates, param_grid=None, seed=0):
+    """`num_candidates` distinct random combinations drawn from a parameter grid."""
+    candidates = grid_candidates(param_grid)
+    rng = np.random.default_rng(seed)
+    picks = rng.choice(len(candidates), size=min(num_candidates, len(candidates)), replace=False)
+    return [candidates[i] for i in picks]
+
+
+def rasterize_wall_slice(input_file, wall_height=None, slice_thickness=0.1, grid_size=0.05,
+                         auto_height_offset=1.2, min_density=2, splat=None):
+    """
+    Load, slice and rasterize a PLY once, the same way extract_wall_floorplan_basic does.
+    `splat` holds the Gaussian splat pruning options of load_points_cached (ply_io.splat_options).
+
+    Returns:
+        tuple: (binary wall grid, (min_x, min_y) origin, grid_size)
+    """
+    points, _ = load_points_cached(input_file, with_colors=False, **(splat or {}))
+    if wall_height is None:
+        wall_height = get_scene_profile(input_file)["floor_height"] + auto_height_offset
+    wall_points = z_slice(load_or_build_z_index(points, input_file, **(splat or {})),
+                          wall_height - slice_thickness / 2, wall_height + slice_thickness / 2)
+    if len(wall_points) < 2:
+        raise ValueError(f"No points in the wall slice at {wall_height:.3f}m")
+    min_x, max_x, min_y, max_y = raster_bounds(wall_points)
+    raster = rasterize(wall_points, grid_size, padding=0.1 * max(max_x - min_x, max_y - min_y, 1.0))
+    print(f"Rasterized {len(wall_points)} slice points at {wall_height:.3f}m into {raster['shape']} cells")
+    return density_mask(raster, min_density), raster["origin"], grid_size
+
+
+def evaluate_candidate(grid, origin, grid_size, params, reference=None, fixed_scale=None, min_contour_length=10):
+    """
+    Run one morphology candidate and score it (see module docstring).
+
+    Returns:
+        dict: {"params", "score", "iou", "closure", "num_contours", "residual",
+               "registration" (scale, rotation and translation onto the reference, or None)}
+    """
+    grid_binary = process_wall_grid(grid, **params)
+    contours = grid_contours(grid_binary, origin, grid_size, min_contour_length)
+    filled = binary_fill_holes(grid_binary)
+    filled_area = np.count_nonzero(filled)
+    closure = (filled_area - np.count_nonzero(grid_binary)) / filled_area if filled_area else 0.0
+
+    iou = residual = transform = None
+    if reference is not None:
+        footprint = footprint_polygon(grid_binary, origin, grid_size)
+        if footprint is not None:
+            registration = register_to_reference(footprint, reference, fixed_scale=fixed_scale)
+            iou = polygon_iou(registration["polygon"], reference)
+            residual = registration["residual"]
+            transform = {k: registration[k] for k in ("scale", "rotation", "translation")}
+        else:
+            iou = 0.0
+
+    score = iou if reference is not None else closure
+    if closure <= 0:
+        score *= 0.5
+    score /= 1.0 + 0.05 * max(len(contours) - 2, 0)
+    return {"params": params, "score": float(score), "iou": iou, "closure": float(closure),
+            "num_contours": len(contours), "residual": residual, "registration": transform}
+
+
+def _init_worker(grid, origin, grid_size, reference, fixed_scale, min_contour_length):
+    _shared.update(grid=grid, origin=origin, grid_size=grid_size, reference=reference,
+                   fixed_scale=fixed_scale, min_contour_length=min_contour_length)
+
+
+def _evaluate_shared(params):
+    return evaluate_candidate(_shared["grid"], _shared["origin"], _shared["grid_size"], params,
+                              _shared["reference"], _shared["fixed_scale"], _shared["min_contour_length"])
+
+
+def sweep_morphology(grid, origin, grid_size, candidates=None, reference=None, fixed_scale=None,
+                     min_contour_length=10, workers=None):
+    """
+    Evaluate morphology candidates over one shared wall grid in parallel.
+
+    Args:
+        grid (np.array): Binary wall grid (e.g. from rasterize_wall_slice).
+        origin (tuple): World (min_x, min_y) of the grid.
+        grid_size (float): Cell size (meters).
+        candidates (list, optional): Parameter dicts (default: the full DEFAULT_PARAM_GRID).
+        reference (np.array, optional): Reference outline for IoU scoring.
+        fixed_scale (float, optional): Known world-to-reference scale (1.0 for a metric reference).
+        min_contour_length (int): Min vertices per traced contour.
+        workers (int, optional): Worker processes (default: CPU count; 1 runs inline).
+    Returns:
+        list: Candidate results sorted best first.
+    """
+    candidates = candidates if candidates is not None else grid_candidates()
+    shared = (grid, origin, grid_size, reference, fixed_scale, min_contour_length)
+    start = time.time()
+    if workers == 1:
+        _init_worker(*shared)
+        results = [_evaluate_shared(params) for params in candidates]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=shared) as executor:
+            results = list(executor.map(_evaluate_shared, candidates, chunksize=4))
+    print(f"Evaluated {len(candidates)} candidates in {time.time() - start:.1f}s")
+    return sorted(results, key=lambda r: r["score"], reverse=True)
+
+
+def save_contact_sheet(path, grid, origin, grid_size, results, reference=None, top=12):
+    """Plot the processed grids of the best `top` candidates (with the registered reference) on one sheet."""
+    shown = results[:top]
+    cols = min(4, len(shown))
+    rows = int(np.ceil(len(shown) / cols))
+    fig, axes = plt.subplots(rows, cols, figsize=(4 * cols, 4 * rows), squeeze=False)
+    height, width = grid.shape
+    extent = [origin[0], origin[0] + width * grid_size, origin[1], origin[1] + height * grid_size]
+    for ax, result in zip(axes.ravel(), shown):
+        grid_binary = process_wall_grid(grid, **result["params"])
+        ax.imshow(grid_binary, cmap='binary', origin='lower', extent=extent)
+        registration = result.get("registration")
+        if reference is not None and registration is not None:
+            # Draw the reference in world coordinates by inverting the sweep's registration
+            rotation = np.asarray(registration["rotation"])
+            ref_world = (reference - registration["translation"]) @ rotation / registration["scale"]
+            closed = np.vstack((ref_world, ref_world[:1]))
+            ax.plot(closed[:, 0], closed[:, 1], 'r-', linewidth=1)
+        p = result["params"]
+        iou = f"IoU {result['iou']:.3f} " if result["iou"] is not None else ""
+        ax.set_title(f"{iou}score {result['score']:.3f}\n"
+                     f"d{p['dilate_iterations']} e{p['erode_iterations']} c{p['close_iterations']} "
+                     f"s{p['gaussian_sigma']} t{p['threshold']}", fontsize=8)
+        ax.set_xticks([])
+        ax.set_yticks([])
+    for ax in axes.ravel()[len(shown):]:
+        ax.axis('off')
+    fig.tight_layout()
+    fig.savefig(path, dpi=100)
+    plt.close(fig)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep extract_floorplan's morphology parameters over one shared raster.")
+    parser.add_argument("input", help="Input PLY file, or a raster.npz written by the extractor")
+    parser.add_argument("output", help="Output directory")
+    parser.add_argument("--reference", default=None, help="Ground truth (floorplan_data.json or gt_floorplan.png)")
+    parser.add_argument("--random", type=int, default=None, help="Evaluate N random candidates instead of the full grid.")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count).")
+    parser.add_argument("--height", type=float, default=None, help="Height (Z) for wall slice (meters).")
+    parser.add_argument("--offset", type=float, default=1.2, help="Height above floor if auto-detecting (meters).")
+    parser.add_argument("--thickness", type=float, default=0.1, help="Slice thickness (meters).")
+    parser.add_argument("--grid-size", type=float, default=0.05, help="Grid resolution (meters/cell).")
+    parser.add_argument("--min-density", type=int, default=2, help="Min slice points per grid cell.")
+    parser.add_argument("--min-contour-pts", type=int, default=100, help="Min points per contour.")
+    parser.add_argument("--seed", type=int, default=0, help="Random search seed.")
+    add_splat_arguments(parser)
+    args = parser.parse_args()
+
+    output_path = Path(args.output)
+    output_path.mkdir(parents=True, exist_ok=True)
+
+    if args.input.endswith(".npz"):
+        raster = load_raster(args.input)
+        # The pipeline's raster counts all points; its wall slice is band 0
+        band = 0 if raster["bands"] else None
+        grid, origin, grid_size = density_mask(raster, args.min_density, band), raster["origin"], raster["cell_size"]
+    else:
+        grid, origin, grid_size = rasterize_wall_slice(args.input, args.height, args.thickness, args.grid_size,
+                                                       args.offset, args.min_density, splat_options(args))
+
+    reference, fixed_scale = None, None
+    if args.reference:
+        reference, meters_per_unit = load_reference_polygon(args.reference)
+        # A metric reference fixes the scale; otherwise it is estimated by the registration
+        fixed_scale = 1.0 if meters_per_unit is not None else None
+
+    candidates = random_candidates(args.random, seed=args.seed) if args.random else grid_candidates()
+    if DEFAULT_MORPHOLOGY not in candidates:
+        candidates.append(dict(DEFAULT_MORPHOLOGY))
+    results = sweep_morphology(grid, origin, grid_size, candidates, reference, fixed_scale,
+                               args.min_contour_pts, args.workers)
+
+    with open(output_path / "sweep_results.json", 'w') as f:
+        json.dump(results, f, indent=2)
+    with open(output_path / "best_morphology.json", 'w') as f:
+        json.dump(results[0]["params"], f, indent=2)
+    save_contact_sheet(output_path / "sweep_contact_sheet.png", grid, origin, grid_size, results, reference)
+
+    default = next(r for r in results if r["params"] == DEFAULT_MORPHOLOGY)
+    best = results[0]
+    print(f"Best parameters: {best['params']}")
+    print(f"  score {best['score']:.3f} (defaults: {default['score']:.3f}), "
+          f"closure {best['closure']:.2f}, {best['num_contours']} contours"
+          + (f", IoU {best['iou']:.3f}" if best["iou"] is not None else ""))
+    print(f"Results saved to {output_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
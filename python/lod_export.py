@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+"""
+Octree level-of-detail tile export for the web 3D viewer.
+
+Builds a Potree-style octree over a PLY point cloud so the viewer can stream
+only the visible nodes at the detail it needs instead of downloading the whole
+cloud. Every node holds a subsample of its points (one point per cell of a
+`grid_size`^3 grid over the node), and the remaining points are passed to
+its eight children, so a node's spacing halves at each level.
+
+Output layout:
+  <output>/hierarchy.json    node index (bounds, point counts, children, decoding)
+  <output>/nodes/<name>.bin  one tile per node: N x 3 int16 positions followed
+                             by N x 3 uint8 colours (if the cloud has colours)
+
+Node names follow Potree: the root is "r" and child i is name + str(i), with
+i = (x << 2) | (y << 1) | z for the child's half along each axis. A position is
+decoded as `offset + q * scale` using the node's "offset" and "scale".
+
+The PLY is memory-mapped and streamed once: the root subsample is selected
+on the fly and the remaining points are staged into one file per top-level
+octant, which are then built in parallel worker processes.
+
+Usage:
+  python lod_export.py input.ply output_dir [--grid-size 128] [--max-points 20000] [--workers N]
+"""
+
+import os
+import sys
+import json
+import shutil
+import argparse
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+from ply_io import (read_ply, ply_points, ply_bounds, ply_colors, is_gaussian_splat, splat_keep_mask,
+                    add_splat_arguments, splat_options, DEFAULT_MIN_OPACITY)
+
+HIERARCHY_VERSION = 1
+
+# Staged points of one top-level octant
+STAGE_DTYPE = np.dtype([('x', '<f8'), ('y', '<f8'), ('z', '<f8'),
+                        ('red', 'u1'), ('green', 'u1'), ('blue', 'u1')])
+
+# int16 quantization steps across one node
+QUANT_STEPS = 65536
+
+
+def _child_index(points, center):
+    """Octant index (x << 2) | (y << 1) | z of each point relative to the node center."""
+    above = points >= center
+    return (above[:, 0].astype(np.int64) << 2) | (above[:, 1].astype(np.int64) << 1) | above[:, 2]
+
+
+def _child_min(node_min, node_size, index):
+    """Minimum corner of child `index` of a node."""
+    half = node_size / 2.0
+    return node_min + half * np.array([(index >> 2) & 1, (index >> 1) & 1, index & 1], dtype=np.float64)
+
+
+def _grid_keys(points, node_min, node_size, grid_size):
+    """Flattened sampling-grid cell of each point within a node."""
+    cells = np.floor((points - node_min) / node_size * grid_size).astype(np.int64)
+    np.clip(cells, 0, grid_size - 1, out=cells)
+    return (cells[:, 0] * grid_size + cells[:, 1]) * grid_size + cells[:, 2]
+
+
+def _write_node(output_dir, name, points, colors, node_min, node_size):
+    """
+    Quantize and write one node tile.
+
+    Returns:
+        dict: Hierarchy entry for the node (without children).
+    """
+    scale = node_size / QUANT_STEPS
+    q = np.floor((points - node_min) / scale) - QUANT_STEPS // 2
+    positions = np.clip(q, -32768, 32767).astype('<i2')
+
+    path = os.path.join(output_dir, "nodes", f"{name}.bin")
+    with open(path, 'wb') as f:
+        positions.tofile(f)
+        if colors is not None:
+            np.ascontiguousarray(colors, dtype=np.uint8).tofile(f)
+
+    return {
+        "min": node_min.tolist(),
+        "size": float(node_size),
+        "num_points": int(len(points)),
+        # Cell centers: p = offset + q * scale
+        "offset": (node_min + (QUANT_STEPS // 2 + 0.5) * scale).tolist(),
+        "scale": float(scale),
+        "file": f"nodes/{name}.bin",
+        "children": [],
+    }
+
+
+def _build_node(output_dir, name, points, colors, node_min, node_size, depth, options, nodes):
+    """
+    Recursively subsample a node and build its children in memory.
+
+    Args:
+        points (np.array): Nx3 points inside the node.
+        colors (np.array): Nx3 uint8 colours or None.
+        options (dict): grid_size, max_points, max_depth.
+        nodes (dict): Hierarchy entries, filled in place.
+    """
+    if len(points) <= options["max_points"] or depth >= options["max_depth"]:
+        selected = np.ones(len(points), dtype=bool)
+    else:
+        keys = _grid_keys(points, node_min, node_size, options["grid_size"])
+        _, first = np.unique(keys, return_index=True)
+        selected = np.zeros(len(points), dtype=bool)
+        selected[first] = True
+
+    nodes[name] = _write_node(output_dir, name, points[selected],
+                              None if colors is None else colors[selected], node_min, node_size)
+    if selected.all():
+        return
+
+    rest = ~selected
+    points = points[rest]
+    colors = None if colors is None else colors[rest]
+    child_of = _child_index(points, node_min + node_size / 2.0)
+    for index in range(8):
+        in_child = child_of == index
+        if not in_child.any():
+            continue
+        child_name = f"{name}{index}"
+        _build_node(output_dir, child_name, points[in_child],
+                    None if colors is None else colors[in_child],
+                    _child_min(node_min, node_size, index), node_size / 2.0, depth + 1, options, nodes)
+        nodes[name]["children"].append(index)
+
+
+def _build_octant(task):
+    """
+    Worker entry point: build the subtree of one top-level octant from its staged file.
+
+    Returns:
+        dict: Hierarchy entries of the subtree.
+    """
+    output_dir, stage_path, name, node_min, node_size, has_colors, options = task
+    staged = np.fromfile(stage_path, dtype=STAGE_DTYPE)
+    points = np.column_stack((staged['x'], staged['y'], staged['z']))
+    colors = np.column_stack((staged['red'], staged['green'], staged['blue'])) if has_colors else None
+    del staged
+
+    nodes = {}
+    _build_node(output_dir, name, points, colors, np.asarray(node_min), node_size, 1, options, nodes)
+    os.remove(stage_path)
+    return nodes
+
+
+def export_lod_octree(input_file, output_dir, grid_size=128, max_points=20000, max_depth=12,
+                      chunk_size=5_000_000, workers=None, min_opacity=DEFAULT_MIN_OPACITY, max_scale=None):
+    """
+    Export a PLY point cloud as octree LOD tiles.
+
+    Args:
+        input_file (str): Input PLY file.
+        output_dir (str): Directory for hierarchy.json and the node tiles.
+        grid_size (int): Sampling grid cells per axis in each node (root spacing = cube size / grid_size).
+        max_points (int): Nodes with at most this many points become leaves holding all of them.
+        max_depth (int): Maximum octree depth.
+        chunk_size (int): Points streamed per chunk when building the root.
+        workers (int, optional): Worker processes for the top-level octants (default: CPU count).
+        min_opacity, max_scale: Gaussian splat files: splats to drop (see ply_io.splat_keep_mask).
+    Returns:
+        dict: The hierarchy written to hierarchy.json, or None if the cloud is empty.
+    """
+    vertices = read_ply(input_file)
+    # Exact bounds from a min/max pass, so no point falls outside the root cube
+    prune = is_gaussian_splat(vertices)
+    bounds = ply_bounds(vertices, chunk_size, *((min_opacity, max_scale) if prune else ()))
+    if bounds is None:
+        print("Error: Point cloud is empty.")
+        return None
+
+    # Cubic root node around the cloud
+    root_min = np.asarray(bounds["min"], dtype=np.float64)
+    root_size = float(np.max(np.asarray(bounds["max"]) - root_min)) or 1.0
+    root_size *= 1.0 + 1e-6
+    center = root_min + root_size / 2.0
+    has_colors = ply_colors(vertices[:1]) is not None
+    options = {"grid_size": grid_size, "max_points": max_points, "max_depth": max_depth}
+
+    os.makedirs(os.path.join(output_dir, "nodes"), exist_ok=True)
+    stage_dir = os.path.join(output_dir, "_staging")
+    os.makedirs(stage_dir, exist_ok=True)
+    stage_paths = [os.path.join(stage_dir, f"r{i}.bin") for i in range(8)]
+    stage_files = [open(path, 'wb') for path in stage_paths]
+    stage_counts = np.zeros(8, dtype=np.int64)
+
+    # Stream once: pick the root subsample (first point per root grid cell) and
+    # stage everything else by top-level octant
+    small_cloud = len(vertices) <= max_points
+    occupied = np.zeros(grid_size ** 3, dtype=bool)
+    root_points, root_colors = [], []
+    num_points = 0
+    try:
+        for start in range(0, len(vertices), chunk_size):
+            chunk = vertices[start:start + chunk_size]
+            if prune:
+                chunk = chunk[splat_keep_mask(chunk, min_opacity, max_scale)]
+            num_points += len(chunk)
+            points = ply_points(chunk)
+            colors = ply_colors(chunk)
+            colors = np.rint(colors * 255).astype(np.uint8) if colors is not None else None
+
+            if small_cloud:
+                selected = np.ones(len(points), dtype=bool)
+            else:
+                keys = _grid_keys(points, root_min, root_size, grid_size)
+                unique_keys, first = np.unique(keys, return_index=True)
+                new = ~occupied[unique_keys]
+                occupied[unique_keys[new]] = True
+                selected = np.zeros(len(points), dtype=bool)
+                selected[first[new]] = True
+
+            root_points.append(points[selected])
+            if colors is not None:
+                root_colors.append(colors[selected])
+
+            rest = ~selected
+            staged = np.zeros(int(rest.sum()), dtype=STAGE_DTYPE)
+            for axis, field in enumerate('xyz'):
+                staged[field] = points[rest, axis]
+            if colors is not None:
+                for channel, field in enumerate(('red', 'green', 'blue')):
+                    staged[field] = colors[rest, channel]
+            octant = _child_index(points[rest], center)
+            for index in range(8):
+                part = staged[octant == index]
+                part.tofile(stage_files[index])
+                stage_counts[index] += len(part)
+            print(f"Staged {min(start + chunk_size, len(vertices))}/{len(vertices)} points")
+    finally:
+        for f in stage_files:
+            f.close()
+
+    nodes = {}
+    nodes["r"] = _write_node(output_dir, "r", np.vstack(root_points),
+                             np.vstack(root_colors) if has_colors else None, root_min, root_size)
+
+    tasks = [(output_dir, stage_paths[i], f"r{i}", _child_min(root_min, root_size, i).tolist(),
+              root_size / 2.0, has_colors, options)
+             for i in range(8) if stage_counts[i] > 0]
+    nodes["r"]["children"] = [int(task[2][1:]) for task in tasks]
+
+    # Build the top-level octants in parallel
+    if workers == 1 or len(tasks) <= 1:
+        subtrees = list(map(_build_octant, tasks))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            subtrees = list(executor.map(_build_octant, tasks))
+    for task, subtree in zip(tasks, subtrees):
+        nodes.update(subtree)
+        print(f"Octant {task[2]}: {len(subtree)} nodes")
+    shutil.rmtree(stage_dir, ignore_errors=True)
+
+    hierarchy = {
+        "version": HIERARCHY_VERSION,
+        "source": os.path.basename(input_file),
+        "num_points": int(num_points),
+        "bounds": bounds,
+        "cube": {"min": root_min.tolist(), "size": root_size},
+        "spacing": root_size / grid_size,
+        "encoding": {
+            "position": "int16 x3, little-endian, p = offset + q * scale",
+            "color": "uint8 x3 (red, green, blue), after all positions" if has_colors else None,
+        },
+        "nodes": nodes,
+    }
+    with open(os.path.join(output_dir, "hierarchy.json"), 'w') as f:
+        json.dump(hierarchy, f)
+
+    depth = max(len(name) - 1 for name in nodes)
+    print(f"Wrote {len(nodes)} nodes (depth {depth}) to {output_dir}")
+    return hierarchy
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export a PLY point cloud as octree LOD tiles for the web viewer.")
+    parser.add_argument("input", help="Input PLY file")
+    parser.add_argument("output", help="Output directory")
+    parser.add_argument("--grid-size", type=int, default=128, help="Sampling grid cells per axis in each node.")
+    parser.add_argument("--max-points", type=int, default=20000, help="Maximum points in a leaf node.")
+    parser.add_argument("--max-depth", type=int, default=12, help="Maximum octree depth.")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count).")
+    add_splat_arguments(parser)
+    args = parser.parse_args()
+
+    hierarchy = export_lod_octree(args.input, args.output, grid_size=args.grid_size,
+                                  max_points=args.max_points, max_depth=args.max_depth,
+                                  workers=args.workers, **splat_options(args))
+    return 0 if hierarchy is not None else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Manhattan-frame estimation and orthogonal snapping of floorplan polygons.
+
+A Manhattan frame is a pair of perpendicular wall directions (theta, theta + 90
+degrees). Buildings scanned at an angle, or with angled wings, have frames
+that are not the global X/Y axes. Snapping to the global axes turns their
+walls into staircases.
+
+  dominant_orientations  frame angles from a length-weighted, circularly smoothed
+                         histogram of edge (or wall normal) angles modulo 90 degrees
+  snap_polygon           assign each edge to the nearest frame axis, merge
+                         collinear runs and rebuild the vertices as the line
+                         intersections. All steps are vectorized, which is
+                         the same as rotating into each frame, snapping and
+                         rotating back.
+
+Usage:
+  frames = dominant_orientations(*edge_orientations(polygon, window), max_frames=2)
+  snapped = snap_polygon(polygon, frames, angle_threshold_deg=10, merge_distance=0.05, window=window)
+"""
+
+import numpy as np
+
+QUARTER = np.pi / 2
+
+
+def edge_orientations(coords, window=0):
+    """
+    Directions and lengths of the edges of a closed polygon.
+
+    Args:
+        coords (np.array): Nx2 polygon (the closing vertex may be repeated).
+        window (int): Measure each edge's direction between the vertices `window`
+                      before and after it (smooths staircase contours).
+    Returns:
+        tuple: (N angles in radians, N edge lengths)
+    """
+    coords = _open_ring(np.asarray(coords, dtype=np.float64))
+    edges = np.roll(coords, -1, axis=0) - coords
+    chords = np.roll(coords, -1 - window, axis=0) - np.roll(coords, window, axis=0)
+    return np.arctan2(chords[:, 1], chords[:, 0]), np.hypot(edges[:, 0], edges[:, 1])
+
+
+def normal_orientations(normals):
+    """Wall directions (radians) of points with Nx2 or Nx3 normals: perpendicular to the XY normal."""
+    normals = np.asarray(normals)
+    return np.arctan2(normals[:, 1], normals[:, 0]) + QUARTER
+
+
+def dominant_orientations(angles, weights=None, max_frames=2, bin_deg=1.0, smooth_deg=2.0,
+                          min_weight_fraction=0.2, min_separation_deg=10.0):
+    """
+    Dominant Manhattan frames from a weighted histogram of angles modulo 90 degrees.
+
+    Args:
+        angles (np.array): Edge or wall directions (radians).
+        weights (np.array, optional): Weight per angle (e.g. edge length).
+        max_frames (int): Maximum number of frames returned.
+        bin_deg (float): Histogram bin width (degrees).
+        smooth_deg (float): Gaussian smoothing of the circular histogram (degrees).
+        min_weight_fraction (float): A secondary frame needs this fraction of the strongest peak.
+        min_separation_deg (float): Minimum angle between frames (degrees, modulo 90).
+    Returns:
+        list: Frame angles in radians within [0, pi/2), strongest first ([0.0] without edges).
+    """
+    angles = np.mod(np.asarray(angles, dtype=np.float64), QUARTER)
+    weights = np.ones(len(angles)) if weights is None else np.asarray(weights, dtype=np.float64)
+    if len(angles) == 0 or weights.sum() <= 0:
+        return [0.0]
+
+    num_bins = int(round(90.0 / bin_deg))
+    bins = np.minimum((angles / QUARTER * num_bins).astype(np.int64), num_bins - 1)
+    hist = np.bincount(bins, weights=weights, minlength=num_bins)
+    # Circular Gaussian smoothing (the histogram wraps at 90 degrees)
+    radius = max(int(np.ceil(3 * smooth_deg / bin_deg)), 1)
+    offsets = np.arange(-radius, radius + 1)
+    kernel = np.exp(-0.5 * (offsets * bin_deg / max(smooth_deg, 1e-9)) ** 2)
+    smoothed = np.convolve(np.concatenate((hist[-radius:], hist, hist[:radius])), kernel, mode='valid')
+
+    is_peak = (smoothed >= np.roll(smoothed, 1)) & (smoothed > np.roll(smoothed, -1))
+    peaks = np.nonzero(is_peak & (smoothed >= min_weight_fraction * smoothed.max()))[0]
+    peaks = peaks[np.argsort(smoothed[peaks])[::-1]]
+
+    # Refine each peak with a weighted circular mean (period 90 degrees -> multiply by 4)
+    frames = []
+    window = max(smooth_deg, bin_deg) * 2
+    for peak in peaks:
+        center = (peak + 0.5) * QUARTER / num_bins
+        diff = np.mod(angles - center + QUARTER / 2, QUARTER) - QUARTER / 2
+        near = np.abs(diff) <= np.radians(window)
+        if not np.any(near):
+            continue
+        mean = np.angle(np.sum(weights[near] * np.exp(4j * angles[near]))) / 4
+        frame = float(np.mod(mean, QUARTER))
+        separation = [abs(np.mod(frame - f + QUARTER / 2, QUARTER) - QUARTER / 2) for f in frames]
+        if all(s >= np.radians(min_separation_deg) for s in separation):
+            frames.append(frame)
+        if len(frames) == max_frames:
+            break
+    return frames or [0.0]
+
+
+def _open_ring(coords):
+    """Drop a repeated closing vertex and zero-length edges."""
+    if len(coords) > 1 and np.allclose(coords[0], coords[-1]):
+        coords = coords[:-1]
+    step = np.linalg.norm(np.roll(coords, -1, axis=0) - coords, axis=1)
+    return coords[step > 1e-12] if np.any(step > 1e-12) else coords[:1]
+
+
+def _circular_runs(same):
+    """
+    Label runs of a circular sequence, where same[i] means element i continues the run of i - 1.
+
+    Returns:
+        tuple: (order starting at the beginning of a run, run label per element of `order`)
+    """
+    same = same.copy()
+    if np.all(same):
+        same[0] = False
+    start = int(np.nonzero(~same)[0][0])
+    order = np.roll(np.arange(len(same)), -start)
+    return order, np.cumsum(~same[order]) - 1
+
+
+def snap_polygon(coords, frames=(0.0,), angle_threshold_deg=10.0, merge_distance=0.05, window=0,
+                 min_free_length=None):
+    """
+    Snap the edges of a closed polygon to the axes of the given Manhattan frames.
+
+    Each edge within `angle_threshold_deg` of a frame axis becomes a line along
+    that axis through the edge's midpoint; other edges keep their direction.
+    Consecutive edges on the same axis whose lines lie within `merge_distance`
+    are merged into one line (length-weighted offset). Vertices are the
+    intersections of consecutive lines; consecutive parallel lines (a step)
+    are joined by a perpendicular jog at the original vertex.
+
+    Args:
+        coords (np.array): Nx2 closed polygon (the closing vertex may be repeated).
+        frames (sequence): Frame angles in radians (see dominant_orientations).
+        angle_threshold_deg (float): Maximum deviation from an axis for snapping.
+        merge_distance (float): Maximum offset between collinear edges to merge (meters).
+        window (int): Measure each edge's direction between the vertices `window`
+                      before and after it; > 0 lets dense staircase contours
+                      (e.g. raw find_contours output) snap as straight walls.
+        min_free_length (float, optional): Unsnapped stretches between snapped
+                      edges shorter than this (default 2 * merge_distance, plus
+                      the span of the direction window) are dropped, so cut
+                      corners become right angles.
+    Returns:
+        np.array: Mx2 closed polygon (first vertex repeated at the end).
+    """
+    ring = _open_ring(np.asarray(coords, dtype=np.float64))
+    if len(ring) < 3:
+        return np.vstack((ring, ring[:1]))
+    angles, lengths = edge_orientations(ring, window)
+    if min_free_length is None:
+        min_free_length = 2 * merge_distance + 2 * window * np.median(lengths)
+    edge_start = ring
+    midpoints = (ring + np.roll(ring, -1, axis=0)) / 2
+
+    # Candidate axes: every frame angle and its perpendicular, as directions modulo pi
+    axes = np.concatenate([[f, f + QUARTER] for f in frames])
+    diff = np.mod(angles[:, None] - axes[None, :] + np.pi / 2, np.pi) - np.pi / 2
+    nearest = np.argmin(np.abs(diff), axis=1)
+    snapped = np.abs(diff[np.arange(len(ring)), nearest]) <= np.radians(angle_threshold_deg)
+    if not np.any(snapped):
+        return np.vstack((ring, ring[:1]))
+
+    # Drop short unsnapped stretches (cut corners, noise) between snapped edges
+    order, run = _circular_runs(~snapped & ~np.roll(snapped, 1))
+    free_length = np.bincount(run, weights=np.where(snapped, 0.0, lengths)[order])
+    drop = np.zeros(len(ring), dtype=bool)
+    drop[order] = ~snapped[order] & (free_length[run] < min_free_length)
+    keep_edges = ~drop
+    angles, lengths, nearest, snapped = angles[keep_edges], lengths[keep_edges], nearest[keep_edges], snapped[keep_edges]
+    edge_start, midpoints = edge_start[keep_edges], midpoints[keep_edges]
+
+    direction = np.where(snapped, axes[nearest], angles)
+    # Free edges get their own axis id so they never merge
+    axis_id = np.where(snapped, nearest, len(axes) + np.arange(len(angles)))
+    normals = np.column_stack((-np.sin(direction), np.cos(direction)))
+    offsets = np.einsum('ij,ij->i', normals, midpoints)
+
+    # Runs of consecutive edges on the same axis with nearby offsets form one line
+    same = (axis_id == np.roll(axis_id, 1)) & (np.abs(offsets - np.roll(offsets, 1)) <= merge_distance)
+    order, run = _circular_runs(same)
+    num_runs = run[-1] + 1
+    if num_runs < 3:
+        return np.vstack((ring, ring[:1]))
+    weight = np.bincount(run, weights=lengths[order], minlength=num_runs)
+    weight = np.where(weight > 0, weight, 1.0)
+    run_offset = np.bincount(run, weights=(offsets * lengths)[order], minlength=num_runs) / weight
+    first = np.searchsorted(run, np.arange(num_runs))
+    run_normal = normals[order][first]
+    # Original vertex where each run starts (shared with the previous run)
+    run_vertex = edge_start[order][first]
+
+    prev_normal, prev_offset = np.roll(run_normal, 1, axis=0), np.roll(run_offset, 1)
+    det = prev_normal[:, 0] * run_normal[:, 1] - prev_normal[:, 1] * run_normal[:, 0]
+    parallel = np.abs(det) < 1e-9
+    safe_det = np.where(parallel, 1.0, det)
+    corner = np.column_stack((
+        (prev_offset * run_normal[:, 1] - run_offset * prev_normal[:, 1]) / safe_det,
+        (prev_normal[:, 0] * run_offset - run_normal[:, 0] * prev_offset) / safe_det))
+
+    # Parallel neighbours: project the shared vertex onto both lines
+    jog_a = run_vertex - (np.einsum('ij,ij->i', prev_normal, run_vertex) - prev_offset)[:, None] * prev_normal
+    jog_b = run_vertex - (np.einsum('ij,ij->i', run_normal, run_vertex) - run_offset)[:, None] * run_normal
+    vertices = np.stack((np.where(parallel[:, None], jog_a, corner), jog_b), axis=1)
+    keep = np.column_stack((np.ones(num_runs, dtype=bool), parallel))
+    result = vertices[keep]
+    return np.vstack((result, result[:1]))
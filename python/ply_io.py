@@ -0,0 +1,496 @@
+#!/usr/bin/env python3
+"""
+Zero-copy PLY reader and fast PLY writer shared by the analysis scripts.
+
+Binary PLY files are opened as `np.memmap` structured arrays: the header is
+parsed, and every property of the vertex element (x/y/z, colours, normals,
+opacity, SH coefficients, ...) becomes a field view into the mapped file.
+Pages are only read when a column is touched, and nothing is copied until a
+caller asks for a contiguous array (e.g. via `ply_points`).
+
+ASCII files are supported too, but are parsed into memory.
+
+Usage:
+  vertices = read_ply("scan.ply")          # structured memmap
+  z = vertices["z"]                        # strided view, no copy
+  points, colors = load_points("scan.ply") # contiguous Nx3 arrays
+                                           # (Gaussian splats are pruned by opacity/scale)
+  write_ply("out.ply", vertex_array(points, colors))
+"""
+
+import sys
+import numpy as np
+
+# PLY scalar type names -> NumPy type codes (without byte order)
+PLY_TYPES = {
+    'char': 'i1', 'int8': 'i1',
+    'uchar': 'u1', 'uint8': 'u1',
+    'short': 'i2', 'int16': 'i2',
+    'ushort': 'u2', 'uint16': 'u2',
+    'int': 'i4', 'int32': 'i4',
+    'uint': 'u4', 'uint32': 'u4',
+    'float': 'f4', 'float32': 'f4',
+    'double': 'f8', 'float64': 'f8',
+}
+
+# NumPy kind+size -> canonical PLY type name for writing
+_NUMPY_TO_PLY = {
+    'i1': 'char', 'u1': 'uchar', 'i2': 'short', 'u2': 'ushort',
+    'i4': 'int', 'u4': 'uint', 'f4': 'float', 'f8': 'double',
+}
+
+# Header comment announcing a voxel pyramid level: "pyramid_level <element> <voxel_size>"
+PYRAMID_COMMENT = 'pyramid_level'
+
+# Zeroth-order spherical harmonic constant (f_dc -> RGB) used by 3DGS
+SH_C0 = 0.28209479177387814
+
+# Splats below this activated opacity are treated as floaters by default
+DEFAULT_MIN_OPACITY = 0.1
+
+_BYTE_ORDER = {'binary_little_endian': '<', 'binary_big_endian': '>', 'ascii': '='}
+
+
+def read_ply_header(path):
+    """
+    Parse a PLY header.
+
+    Args:
+        path (str): Path to the PLY file.
+    Returns:
+        dict: {"format": str, "header_size": int, "comments": [str], "elements": [
+                  {"name": str, "count": int, "properties": [(name, type) or
+                   (name, ("list", count_type, item_type))]}, ...]}
+    Raises:
+        ValueError: If the file is not a valid PLY file.
+    """
+    elements = []
+    comments = []
+    fmt = None
+    with open(path, 'rb') as f:
+        if f.readline().strip() != b'ply':
+            raise ValueError(f"{path} is not a PLY file")
+        while True:
+            line = f.readline()
+            if not line:
+                raise ValueError(f"{path}: unexpected end of file in PLY header")
+            tokens = line.decode('ascii', errors='replace').split()
+            if not tokens or tokens[0] == 'obj_info':
+                continue
+            if tokens[0] == 'comment':
+                comments.append(" ".join(tokens[1:]))
+                continue
+            if tokens[0] == 'format':
+                fmt = tokens[1]
+                if fmt not in _BYTE_ORDER:
+                    raise ValueError(f"{path}: unsupported PLY format '{fmt}'")
+            elif tokens[0] == 'element':
+                elements.append({"name": tokens[1], "count": int(tokens[2]), "properties": []})
+            elif tokens[0] == 'property':
+                if not elements:
+                    raise ValueError(f"{path}: property before any element in PLY header")
+                if tokens[1] == 'list':
+                    elements[-1]["properties"].append((tokens[4], ("list", tokens[2], tokens[3])))
+                else:
+                    if tokens[1] not in PLY_TYPES:
+                        raise ValueError(f"{path}: unknown PLY property type '{tokens[1]}'")
+                    elements[-1]["properties"].append((tokens[2], tokens[1]))
+            elif tokens[0] == 'end_header':
+                header_size = f.tell()
+                break
+    if fmt is None:
+        raise ValueError(f"{path}: PLY header has no format line")
+    return {"format": fmt, "header_size": header_size, "comments": comments, "elements": elements}
+
+
+def _element_dtype(element, byte_order):
+    fields = []
+    for name, ply_type in element["properties"]:
+        if isinstance(ply_type, tuple):
+            return None  # Variable-size records (e.g. face lists)
+        fields.append((name, byte_order + PLY_TYPES[ply_type]))
+    return np.dtype(fields)
+
+
+def read_ply(path, element='vertex', mmap=True):
+    """
+    Open one element of a PLY file as a structured array.
+
+    For binary files the result is a read-only `np.memmap`, so fields such as
+    `vertices['x']` are views into the file and are only paged in when touched.
+
+    Args:
+        path (str): Path to the PLY file.
+        element (str): Element to read (default 'vertex').
+        mmap (bool): Memory-map binary files instead of reading them into memory.
+    Returns:
+        np.ndarray: Structured array with one field per property.
+    Raises:
+        ValueError: If the element is missing or cannot be located in the file
+                    (e.g. it follows an element with list properties).
+    """
+    header = read_ply_header(path)
+    byte_order = _BYTE_ORDER[header["format"]]
+
+    offset = header["header_size"]
+    skip_rows = 0
+    for el in header["elements"]:
+        dtype = _element_dtype(el, byte_order)
+        if el["name"] == element:
+            if dtype is None:
+                raise ValueError(f"{path}: element '{element}' has list properties")
+            break
+        if dtype is None:
+            raise ValueError(f"{path}: cannot locate '{element}' after variable-size element '{el['name']}'")
+        offset += dtype.itemsize * el["count"]
+        skip_rows += el["count"]
+    else:
+        raise ValueError(f"{path}: no '{element}' element in PLY header")
+
+    count = el["count"]
+    if header["format"] == 'ascii':
+        with open(path, 'rb') as f:
+            f.seek(header["header_size"])
+            for _ in range(skip_rows):
+                f.readline()
+            table = np.loadtxt(f, max_rows=count, ndmin=2)
+        data = np.empty(count, dtype=dtype)
+        for i, name in enumerate(dtype.names):
+            data[name] = table[:, i]
+        return data
+    if count == 0:
+        return np.empty(0, dtype=dtype)
+    if mmap:
+        return np.memmap(path, dtype=dtype, mode='r', offset=offset, shape=(count,))
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        return np.fromfile(f, dtype=dtype, count=count)
+
+
+def ply_points(vertices, dtype=np.float64):
+    """Copy the x/y/z fields of a structured vertex array into a contiguous Nx3 array."""
+    points = np.empty((len(vertices), 3), dtype=dtype)
+    for i, name in enumerate(('x', 'y', 'z')):
+        points[:, i] = vertices[name]
+    return points
+
+
+def ply_bounds(vertices, chunk_size=5_000_000, min_opacity=0, max_scale=None):
+    """
+    Exact XYZ bounds of a structured vertex array, streamed in chunks.
+
+    Args:
+        min_opacity, max_scale: Gaussian splat arrays: bounds of the kept splats only
+                                (see splat_keep_mask); the default keeps all.
+    Returns:
+        dict: {"min": [x, y, z], "max": [x, y, z]}, or None if there are no vertices.
+    """
+    prune = is_gaussian_splat(vertices) and (min_opacity > 0 or max_scale is not None)
+    bounds_min = np.full(3, np.inf)
+    bounds_max = np.full(3, -np.inf)
+    for start in range(0, len(vertices), chunk_size):
+        chunk = vertices[start:start + chunk_size]
+        if prune:
+            chunk = chunk[splat_keep_mask(chunk, min_opacity, max_scale)]
+        if len(chunk) == 0:
+            continue
+        for i, name in enumerate(('x', 'y', 'z')):
+            bounds_min[i] = min(bounds_min[i], float(np.min(chunk[name])))
+            bounds_max[i] = max(bounds_max[i], float(np.max(chunk[name])))
+    if not np.all(np.isfinite(bounds_min)):
+        return None
+    return {"min": bounds_min.tolist(), "max": bounds_max.tolist()}
+
+
+def ply_color_fields(vertices):
+    """Return the names of the colour fields (red/green/blue or r/g/b), or None."""
+    names = vertices.dtype.names
+    for fields in (('red', 'green', 'blue'), ('r', 'g', 'b')):
+        if all(name in names for name in fields):
+            return fields
+    return None
+
+
+def ply_colors(vertices):
+    """
+    Return colours as an Nx3 float array in [0, 1], or None if there are none.
+
+    Integer red/green/blue (or r/g/b) fields are scaled by their type's maximum;
+    float fields are taken as-is. Gaussian splats without colour fields get
+    their colour from the f_dc_* coefficients.
+    """
+    fields = ply_color_fields(vertices)
+    if fields is None:
+        return splat_colors(vertices) if is_gaussian_splat(vertices) else None
+    colors = np.empty((len(vertices), 3), dtype=np.float64)
+    for i, name in enumerate(fields):
+        colors[:, i] = vertices[name]
+    kind = vertices.dtype[fields[0]]
+    if np.issubdtype(kind, np.integer):
+        colors /= np.iinfo(kind).max
+    return colors
+
+
+def is_gaussian_splat(vertices):
+    """True if the vertices carry 3D Gaussian splatting properties (opacity, scale_*, f_dc_*)."""
+    names = vertices.dtype.names
+    return 'opacity' in names and 'scale_0' in names and 'f_dc_0' in names
+
+
+def splat_colors(vertices):
+    """RGB in [0, 1] from the splats' DC spherical harmonic coefficients."""
+    colors = np.empty((len(vertices), 3), dtype=np.float64)
+    for i in range(3):
+        colors[:, i] = vertices[f'f_dc_{i}']
+    colors = 0.5 + SH_C0 * colors
+    return np.clip(colors, 0.0, 1.0, out=colors)
+
+
+def splat_keep_mask(vertices, min_opacity=DEFAULT_MIN_OPACITY, max_scale=None):
+    """
+    Mask of the splats to keep.
+
+    Opacity is stored as a logit and scales as logs (as written by 3DGS
+    `save_ply`), so the thresholds are compared in those spaces directly.
+
+    Args:
+        vertices (np.ndarray): Structured splat array (or a chunk of it).
+        min_opacity (float): Minimum sigmoid(opacity); 0 keeps all.
+        max_scale (float, optional): Maximum of exp(scale_*) per splat.
+    Returns:
+        np.array: N boolean mask.
+    """
+    keep = np.ones(len(vertices), dtype=bool)
+    if min_opacity > 0:
+        keep &= vertices['opacity'] >= np.log(min_opacity / (1.0 - min_opacity))
+    if max_scale is not None:
+        log_max = np.log(max_scale)
+        for name in vertices.dtype.names:
+            if name.startswith('scale_'):
+                keep &= vertices[name] <= log_max
+    return keep
+
+
+def add_splat_arguments(parser):
+    """Add the shared Gaussian splat pruning flags to a tool's argument parser."""
+    parser.add_argument("--min-opacity", type=float, default=DEFAULT_MIN_OPACITY,
+                        help="Gaussian splat files: drop splats with sigmoid(opacity) below this (0 keeps all).")
+    parser.add_argument("--max-scale", type=float, default=None,
+                        help="Gaussian splat files: drop splats with a scale above this (scene units).")
+
+
+def splat_options(args):
+    """Splat pruning keyword arguments (min_opacity, max_scale) from parsed flags."""
+    return {"min_opacity": args.min_opacity, "max_scale": args.max_scale}
+
+
+def load_gaussian_splat(path, min_opacity=DEFAULT_MIN_OPACITY, max_scale=None, dtype=np.float64,
+                        chunk_size=2_000_000):
+    """
+    Load a Gaussian splat PLY as a compact coloured point cloud.
+
+    The file is streamed in chunks and only the positions and f_dc colours of
+    the splats that pass the opacity and scale thresholds are copied, so
+    near-transparent floaters never reach the analysis.
+
+    Args:
+        path (str): Path to the splat PLY.
+        min_opacity (float): Minimum sigmoid(opacity).
+        max_scale (float, optional): Maximum splat scale (scene units).
+        dtype: Dtype of the returned points.
+        chunk_size (int): Splats processed per chunk.
+    Returns:
+        tuple: (Nx3 points, Nx3 colours in [0, 1])
+    """
+    vertices = read_ply(path)
+    points, colors = [], []
+    for start in range(0, len(vertices), chunk_size):
+        chunk = vertices[start:start + chunk_size]
+        kept = chunk[splat_keep_mask(chunk, min_opacity, max_scale)]
+        points.append(ply_points(kept, dtype=dtype))
+        colors.append(splat_colors(kept))
+    points = np.concatenate(points) if points else np.empty((0, 3), dtype=dtype)
+    colors = np.concatenate(colors) if colors else np.empty((0, 3))
+    if len(vertices):
+        print(f"Kept {len(points)}/{len(vertices)} Gaussians "
+              f"({100.0 * (1 - len(points) / len(vertices)):.1f}% pruned)")
+    return points, colors
+
+
+def load_points(path, dtype=np.float64, voxel_size=None, min_opacity=DEFAULT_MIN_OPACITY, max_scale=None):
+    """
+    Load points (and colours if present) from a PLY file.
+
+    Gaussian splat files are detected and pruned with `load_gaussian_splat`
+    (pyramid levels are served as stored; they are built from pruned splats).
+
+    Args:
+        path (str): Path to the PLY file.
+        dtype: Dtype of the returned points.
+        voxel_size (float, optional): For voxel pyramid files, load the level
+            best suited to this resolution (see `read_pyramid_level`).
+        min_opacity (float): Splat files only: minimum sigmoid(opacity).
+        max_scale (float, optional): Splat files only: maximum splat scale.
+    Returns:
+        tuple: (Nx3 points, Nx3 colours in [0, 1] or None)
+    """
+    level_size = None
+    if voxel_size is None:
+        vertices = read_ply(path)
+    else:
+        vertices, level_size = read_pyramid_level(path, voxel_size)
+    if level_size is None and is_gaussian_splat(vertices):
+        return load_gaussian_splat(path, min_opacity, max_scale, dtype=dtype)
+    return ply_points(vertices, dtype=dtype), ply_colors(vertices)
+
+
+def vertex_array(points, colors=None, extra=None, point_dtype='f4'):
+    """
+    Build a structured vertex array ready for `write_ply`.
+
+    Args:
+        points (np.array): Nx3 positions.
+        colors (np.array, optional): Nx3 colours, floats in [0, 1] or uint8.
+        extra (dict, optional): Additional per-vertex properties {name: N array}.
+        point_dtype (str): NumPy type of x/y/z ('f4' or 'f8').
+    Returns:
+        np.ndarray: Structured array with x, y, z[, red, green, blue][, extra...].
+    """
+    points = np.asarray(points)
+    fields = [('x', point_dtype), ('y', point_dtype), ('z', point_dtype)]
+    if colors is not None:
+        fields += [('red', 'u1'), ('green', 'u1'), ('blue', 'u1')]
+    extra = extra or {}
+    for name, values in extra.items():
+        fields.append((name, np.asarray(values).dtype.str.lstrip('<>=|')))
+
+    vertices = np.empty(len(points), dtype=fields)
+    vertices['x'], vertices['y'], vertices['z'] = points[:, 0], points[:, 1], points[:, 2]
+    if colors is not None:
+        colors = np.asarray(colors)
+        if np.issubdtype(colors.dtype, np.floating):
+            colors = np.clip(np.round(colors * 255), 0, 255)
+        vertices['red'], vertices['green'], vertices['blue'] = colors[:, 0], colors[:, 1], colors[:, 2]
+    for name, values in extra.items():
+        vertices[name] = values
+    return vertices
+
+
+def write_ply(path, vertices, ascii=False, comments=None):
+    """
+    Write a structured vertex array as a PLY file.
+
+    Binary output is a header followed by one `tofile` call (the array is
+    converted to little-endian first if needed).
+
+    Args:
+        path (str): Output path.
+        vertices (np.ndarray): Structured array, e.g. from `vertex_array` or `read_ply`.
+        ascii (bool): Write ASCII instead of binary little-endian.
+        comments (list, optional): Comment lines for the header.
+    """
+    write_ply_elements(path, {'vertex': vertices}, ascii=ascii, comments=comments)
+
+
+def write_ply_elements(path, elements, ascii=False, comments=None):
+    """
+    Write several structured arrays as the elements of one PLY file.
+
+    Args:
+        path (str): Output path.
+        elements (dict): {element name: structured array}, written in order.
+        ascii (bool): Write ASCII instead of binary little-endian.
+        comments (list, optional): Comment lines for the header.
+    """
+    lines = ["ply", f"format {'ascii' if ascii else 'binary_little_endian'} 1.0"]
+    lines += [f"comment {c}" for c in (comments or [])]
+    for element, data in elements.items():
+        dtype = data.dtype
+        lines.append(f"element {element} {len(data)}")
+        for name in dtype.names:
+            code = dtype[name].str.lstrip('<>=|')
+            if code not in _NUMPY_TO_PLY:
+                raise ValueError(f"Unsupported dtype {dtype[name]} for PLY property '{name}'")
+            lines.append(f"property {_NUMPY_TO_PLY[code]} {name}")
+    lines.append("end_header")
+    header = ("\n".join(lines) + "\n").encode('ascii')
+
+    with open(path, 'wb') as f:
+        f.write(header)
+        for data in elements.values():
+            dtype = data.dtype
+            if ascii:
+                fmt = ['%d' if np.issubdtype(dtype[name], np.integer) else '%.9g' for name in dtype.names]
+                np.savetxt(f, data, fmt=fmt)
+            else:
+                little = dtype.newbyteorder('<')
+                np.ascontiguousarray(data, dtype=little).tofile(f)
+
+
+def read_pyramid_levels(path):
+    """
+    List the levels of a voxel pyramid container written by downsampler.save_voxel_pyramid.
+
+    Levels are stored as PLY elements and announced by header comments of the
+    form `pyramid_level <element> <voxel_size>`.
+
+    Returns:
+        list: [(voxel_size, element name)] sorted from finest to coarsest.
+    """
+    levels = []
+    for comment in read_ply_header(path)["comments"]:
+        tokens = comment.split()
+        if len(tokens) == 3 and tokens[0] == PYRAMID_COMMENT:
+            levels.append((float(tokens[2]), tokens[1]))
+    return sorted(levels)
+
+
+def _select_pyramid_level(levels, voxel_size):
+    """Coarsest (voxel_size, element) not coarser than `voxel_size`, else the finest level."""
+    suitable = [level for level in levels if level[0] <= voxel_size + 1e-12]
+    return suitable[-1] if suitable else levels[0]
+
+
+def pyramid_level_size(path, voxel_size):
+    """
+    Voxel size of the level `read_pyramid_level` opens for `voxel_size`.
+
+    Returns:
+        float or None: The level's voxel size, or None for plain PLY files.
+    """
+    levels = read_pyramid_levels(path)
+    return _select_pyramid_level(levels, voxel_size)[0] if levels else None
+
+
+def read_pyramid_level(path, voxel_size):
+    """
+    Open the pyramid level best suited to `voxel_size` as a structured memmap.
+
+    Picks the coarsest level whose voxel size does not exceed `voxel_size`
+    (the finest level if all are coarser). Plain PLY files without pyramid
+    comments return their vertex element.
+
+    Returns:
+        tuple: (structured array, voxel size of the level or None)
+    """
+    levels = read_pyramid_levels(path)
+    if not levels:
+        return read_ply(path), None
+    level_size, element = _select_pyramid_level(levels, voxel_size)
+    return read_ply(path, element=element), level_size
+
+
+def main():
+    if len(sys.argv) != 2:
+        print("Usage: python ply_io.py input.ply")
+        return 1
+    header = read_ply_header(sys.argv[1])
+    print(f"Format: {header['format']} (header {header['header_size']} bytes)")
+    for el in header["elements"]:
+        props = ", ".join(name for name, _ in el["properties"])
+        print(f"  {el['name']}: {el['count']} [{props}]")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+Decoded point cloud cache shared by the point cloud tools.
+
+boundary_generator, extract_floorplan, extract_wallplan and SafetyGauss are
+usually run one after another on the same PLY. Instead of each one parsing
+the file again, the first tool stores the decoded (and optionally
+voxel-downsampled) float32 arrays as `.npy` files in a cache directory, and
+later runs memory-map them.
+
+Entries are keyed by the absolute path, size and modification time of the PLY
+(or by a SHA-1 of its contents with `key="hash"`) and by the voxel size, so a
+modified file is never served stale. The cache is limited in size; the least
+recently used entries are evicted first.
+
+Environment:
+  POINT_CACHE_DIR      cache directory (default: ~/.cache/pointcloud_tools)
+  POINT_CACHE_MAX_MB   size limit in megabytes (default: 8192)
+  POINT_CACHE_DISABLE  set to 1 to always decode the PLY directly
+
+Usage:
+  python point_cache.py list
+  python point_cache.py clear
+  python point_cache.py warm input.ply [--voxel-size 0.02]
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import argparse
+import numpy as np
+from pathlib import Path
+
+from ply_io import load_points, pyramid_level_size, add_splat_arguments, splat_options, DEFAULT_MIN_OPACITY
+from downsampler import voxel_down_sample
+
+CACHE_VERSION = 1
+DEFAULT_CACHE_DIR = os.path.join(Path.home(), ".cache", "pointcloud_tools")
+DEFAULT_MAX_MB = 8192
+
+
+def cache_dir():
+    """Cache directory from POINT_CACHE_DIR (or the default)."""
+    return os.environ.get("POINT_CACHE_DIR") or DEFAULT_CACHE_DIR
+
+
+def cache_enabled():
+    """False if POINT_CACHE_DISABLE is set to a true value."""
+    return os.environ.get("POINT_CACHE_DISABLE", "").lower() not in ("1", "true", "yes")
+
+
+def _max_bytes():
+    return int(float(os.environ.get("POINT_CACHE_MAX_MB", DEFAULT_MAX_MB)) * 1024 * 1024)
+
+
+def _content_hash(path, block_size=16 * 1024 * 1024):
+    """SHA-1 of a file's contents."""
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def cache_key(ply_path, voxel_size=None, key="stat", min_opacity=DEFAULT_MIN_OPACITY, max_scale=None):
+    """
+    Cache key of a PLY file at a given voxel size (and splat pruning thresholds).
+
+    Args:
+        ply_path (str): Path to the PLY file.
+        voxel_size (float, optional): Voxel size of the cached arrays (None for full resolution).
+        key (str): "stat" to key by path + size + mtime, "hash" to key by content.
+        min_opacity, max_scale: Gaussian splat pruning thresholds (see ply_io.load_points).
+    Returns:
+        str: Hex key.
+    """
+    if key == "hash":
+        source = _content_hash(ply_path)
+    elif key == "stat":
+        stat = os.stat(ply_path)
+        source = f"{os.path.abspath(ply_path)}|{stat.st_size}|{stat.st_mtime_ns}"
+    else:
+        raise ValueError(f"Unknown cache key mode '{key}', expected 'stat' or 'hash'")
+    voxel = "full" if not voxel_size else f"{float(voxel_size):.6g}"
+    splat = f"{float(min_opacity):.6g}|{max_scale}"
+    return hashlib.sha1(f"v{CACHE_VERSION}|{source}|{voxel}|{splat}".encode()).hexdigest()
+
+
+def _entry_size(entry):
+    return sum(f.stat().st_size for f in entry.iterdir() if f.is_file())
+
+
+def list_entries(directory=None):
+    """
+    List cache entries, least recently used first.
+
+    Returns:
+        list: [{"path": Path, "meta": dict, "size": int, "last_used": float}]
+    """
+    root = Path(directory or cache_dir())
+    if not root.is_dir():
+        return []
+    entries = []
+    for entry in root.iterdir():
+        meta_path = entry / "meta.json"
+        if not entry.is_dir() or not meta_path.is_file():
+            continue
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            continue
+        entries.append({"path": entry, "meta": meta, "size": _entry_size(entry),
+                        "last_used": meta_path.stat().st_mtime})
+    return sorted(entries, key=lambda e: e["last_used"])
+
+
+def evict(max_bytes=None, directory=None, keep=None):
+    """
+    Remove least recently used entries until the cache fits in `max_bytes`.
+
+    Args:
+        max_bytes (int, optional): Size limit (default: POINT_CACHE_MAX_MB).
+        keep (str, optional): Entry key that must not be evicted.
+    Returns:
+        int: Number of entries removed.
+    """
+    max_bytes = _max_bytes() if max_bytes is None else max_bytes
+    entries = list_entries(directory)
+    total = sum(e["size"] for e in entries)
+    removed = 0
+    for e in entries:
+        if total <= max_bytes:
+            break
+        if e["path"].name == keep:
+            continue
+        shutil.rmtree(e["path"], ignore_errors=True)
+        total -= e["size"]
+        removed += 1
+    return removed
+
+
+def _store(entry, points, colors, meta):
+    """
+    Write an entry atomically (temporary directory + rename).
+
+    Returns:
+        bool: True if a complete entry exists afterwards (stored here or by another process).
+    """
+    tmp = entry.with_name(f"{entry.name}.tmp{os.getpid()}")
+    try:
+        tmp.mkdir(parents=True, exist_ok=True)
+        np.save(tmp / "points.npy", points)
+        if colors is not None:
+            np.save(tmp / "colors.npy", colors)
+        with open(tmp / "meta.json", 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp, entry)
+    except OSError:
+        # Another process may have stored the same entry first
+        shutil.rmtree(tmp, ignore_errors=True)
+    return (entry / "meta.json").is_file()
+
+
+def load_points_cached(ply_path, voxel_size=None, key="stat", directory=None, max_bytes=None,
+                       with_colors=True, min_opacity=DEFAULT_MIN_OPACITY, max_scale=None):
+    """
+    Load float32 points (and colours) of a PLY file through the cache.
+
+    On a miss the PLY is decoded (and voxel-downsampled if `voxel_size` is set,
+    starting from the best level of a voxel pyramid container),
+    stored and then served from the cache; on a hit the arrays are memory-mapped
+    copy-on-write, so callers may modify them without touching the cache.
+
+    Args:
+        ply_path (str): Path to the PLY file.
+        voxel_size (float, optional): Voxel size for pre-downsampled arrays.
+        key (str): "stat" (path + size + mtime) or "hash" (content) keys.
+        directory (str, optional): Cache directory (default: POINT_CACHE_DIR).
+        max_bytes (int, optional): Cache size limit (default: POINT_CACHE_MAX_MB).
+        with_colors (bool): Also return colours.
+        min_opacity (float): Gaussian splat files: minimum sigmoid(opacity).
+        max_scale (float, optional): Gaussian splat files: maximum splat scale.
+    Returns:
+        tuple: (Nx3 float32 points, Nx3 float32 colours in [0, 1] or None)
+    """
+    def decode():
+        points, colors = load_points(ply_path, voxel_size=voxel_size or None, min_opacity=min_opacity,
+                                     max_scale=max_scale)
+        # Voxel pyramid containers may already hold a level at (or coarser than) this size
+        level_size = pyramid_level_size(ply_path, voxel_size) if voxel_size else None
+        if voxel_size and (level_size is None or level_size < voxel_size - 1e-12):
+            points, colors = voxel_down_sample(points, colors, voxel_size)
+        return (points.astype(np.float32),
+                colors.astype(np.float32) if colors is not None else None)
+
+    if not cache_enabled():
+        points, colors = decode()
+        return points, (colors if with_colors else None)
+
+    root = Path(directory or cache_dir())
+    entry = root / cache_key(ply_path, voxel_size, key=key, min_opacity=min_opacity, max_scale=max_scale)
+    meta_path = entry / "meta.json"
+    if not meta_path.is_file():
+        start = time.time()
+        points, colors = decode()
+        meta = {"version": CACHE_VERSION, "source": os.path.abspath(ply_path),
+                "voxel_size": voxel_size, "min_opacity": min_opacity, "max_scale": max_scale,
+                "num_points": int(len(points)),
+                "has_colors": colors is not None, "created": time.time()}
+        try:
+            root.mkdir(parents=True, exist_ok=True)
+            stored = _store(entry, points, colors, meta)
+            evict(max_bytes, directory=root, keep=entry.name)
+        except OSError as e:
+            print(f"Warning: could not write point cache entry: {e}")
+            stored = False
+        if not stored:
+            print(f"Warning: could not store point cache entry {entry}; using the decoded arrays")
+            return points, (colors if with_colors else None)
+        print(f"Cached {len(points)} decoded points in {time.time() - start:.2f}s: {entry}")
+
+    # Touch the entry for LRU eviction
+    os.utime(meta_path)
+    points = np.load(entry / "points.npy", mmap_mode='c')
+    colors = None
+    if with_colors and (entry / "colors.npy").is_file():
+        colors = np.load(entry / "colors.npy", mmap_mode='c')
+    return points, colors
+
+
+def cache_entry(ply_path, voxel_size=None, key="stat", directory=None, min_opacity=DEFAULT_MIN_OPACITY,
+                max_scale=None):
+    """
+    Directory of the cache entry for these load_points_cached arguments.
+
+    Derived arrays (e.g. z_index) are stored in it, so they are evicted together
+    with the points they were built from.
+
+    Returns:
+        Path or None: The entry, or None if caching is disabled or it does not exist.
+    """
+    if not cache_enabled():
+        return None
+    entry = Path(directory or cache_dir()) / cache_key(ply_path, voxel_size, key=key, min_opacity=min_opacity,
+                                                       max_scale=max_scale)
+    return entry if (entry / "meta.json").is_file() else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the decoded point cloud cache.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("list", help="List cache entries (least recently used first).")
+    subparsers.add_parser("clear", help="Remove all cache entries.")
+    warm = subparsers.add_parser("warm", help="Decode a PLY into the cache.")
+    warm.add_argument("input", help="Input PLY file")
+    warm.add_argument("--voxel-size", type=float, default=None, help="Cache a voxel-downsampled copy.")
+    warm.add_argument("--hash", action="store_true", help="Key the entry by file content instead of mtime.")
+    add_splat_arguments(warm)
+    args = parser.parse_args()
+
+    if args.command == "list":
+        entries = list_entries()
+        for e in entries:
+            meta = e["meta"]
+            print(f"{e['path'].name[:12]}  {e['size'] / 1e6:9.1f} MB  {meta['num_points']:>10} pts  "
+                  f"voxel={meta['voxel_size']}  {meta['source']}")
+        print(f"{len(entries)} entries, {sum(e['size'] for e in entries) / 1e6:.1f} MB in {cache_dir()}")
+    elif args.command == "clear":
+        for e in list_entries():
+            shutil.rmtree(e["path"], ignore_errors=True)
+    else:
+        points, _ = load_points_cached(args.input, voxel_size=args.voxel_size,
+                                       key="hash" if args.hash else "stat", **splat_options(args))
+        print(f"{len(points)} points cached for {args.input}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Multi-channel 2.5D rasterizer shared by the floorplan extractors.
+
+Projects points onto an XY grid and computes, in one vectorized bincount pass
+per chunk, these channels for every cell:
+  count       number of points
+  min_z       lowest point (NaN for empty cells)
+  max_z       highest point (NaN for empty cells)
+  mean_z      mean height (NaN for empty cells)
+  band_count  points per height band, for bands given as (z_low, z_high)
+
+Grids are row-major (row = y, column = x) with the origin at the minimum
+corner, matching `plt.imshow(..., origin='lower', extent=raster["extent"])`.
+
+Usage:
+  raster = rasterize(points, cell_size=0.05, padding=0.5)
+  occupancy = density_mask(raster, min_count=3)
+"""
+
+import numpy as np
+
+
+def raster_bounds(points, padding=0.0):
+    """(min_x, max_x, min_y, max_y) of the points, grown by `padding` on every side."""
+    min_x, min_y = np.min(points[:, 0]), np.min(points[:, 1])
+    max_x, max_y = np.max(points[:, 0]), np.max(points[:, 1])
+    return (float(min_x - padding), float(max_x + padding), float(min_y - padding), float(max_y + padding))
+
+
+def rasterize(points, cell_size, bounds=None, padding=0.0, bands=None, chunk_size=5_000_000):
+    """
+    Rasterize points into count / min / max / mean height / band count channels.
+
+    Args:
+        points (np.array): Nx3 points (Nx2 gives only the count channel).
+        cell_size (float): Cell size (meters).
+        bounds (tuple, optional): (min_x, max_x, min_y, max_y); defaults to the
+            point bounds grown by `padding`. Points outside are ignored.
+        padding (float): Margin added around the point bounds (meters).
+        bands (list, optional): Height bands [(z_low, z_high), ...] to count points in.
+        chunk_size (int): Points processed per chunk.
+    Returns:
+        dict: {"count": (H, W) int64, "min_z", "max_z", "mean_z": (H, W) float or None,
+               "band_count": (B, H, W) int64 or None, "bands": list,
+               "origin": (min_x, min_y), "cell_size": float, "shape": (H, W),
+               "extent": [min_x, max_x, min_y, max_y]}
+    """
+    if bounds is None:
+        bounds = raster_bounds(points, padding)
+    min_x, max_x, min_y, max_y = bounds
+    width = int((max_x - min_x) // cell_size) + 1
+    height = int((max_y - min_y) // cell_size) + 1
+    num_cells = width * height
+    has_z = points.shape[1] > 2
+    bands = list(bands or [])
+
+    count = np.zeros(num_cells, dtype=np.int64)
+    if has_z:
+        sum_z = np.zeros(num_cells)
+        min_z = np.full(num_cells, np.inf)
+        max_z = np.full(num_cells, -np.inf)
+    band_count = np.zeros(len(bands) * num_cells, dtype=np.int64) if bands else None
+
+    for start in range(0, len(points), chunk_size):
+        chunk = points[start:start + chunk_size]
+        xs = np.floor((chunk[:, 0] - min_x) / cell_size).astype(np.int64)
+        ys = np.floor((chunk[:, 1] - min_y) / cell_size).astype(np.int64)
+        valid = (xs >= 0) & (xs < width) & (ys >= 0) & (ys < height)
+        cells = ys[valid] * width + xs[valid]
+        count += np.bincount(cells, minlength=num_cells)
+        if not has_z:
+            continue
+        z = np.asarray(chunk[valid, 2], dtype=np.float64)
+        sum_z += np.bincount(cells, weights=z, minlength=num_cells)
+        np.minimum.at(min_z, cells, z)
+        np.maximum.at(max_z, cells, z)
+        for b, (z_low, z_high) in enumerate(bands):
+            in_band = (z >= z_low) & (z < z_high)
+            band_count[b * num_cells:(b + 1) * num_cells] += np.bincount(cells[in_band], minlength=num_cells)
+
+    shape = (height, width)
+    raster = {
+        "count": count.reshape(shape),
+        "min_z": None, "max_z": None, "mean_z": None,
+        "band_count": band_count.reshape((len(bands),) + shape) if bands else None,
+        "bands": bands,
+        "origin": (min_x, min_y),
+        "cell_size": float(cell_size),
+        "shape": shape,
+        "extent": [min_x, min_x + width * cell_size, min_y, min_y + height * cell_size],
+    }
+    if has_z:
+        empty = count == 0
+        min_z[empty] = np.nan
+        max_z[empty] = np.nan
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean_z = sum_z / count
+        raster["min_z"] = min_z.reshape(shape)
+        raster["max_z"] = max_z.reshape(shape)
+        raster["mean_z"] = mean_z.reshape(shape)
+    return raster
+
+
+def density_mask(raster, min_count=1, band=None):
+    """
+    Occupancy grid of cells with at least `min_count` points.
+
+    Args:
+        raster (dict): Output of `rasterize`.
+        min_count (int): Minimum points per cell; 1 reproduces plain presence.
+        band (int, optional): Threshold this height band's count instead of the total.
+    Returns:
+        np.array: (H, W) uint8 grid.
+    """
+    counts = raster["count"] if band is None else raster["band_count"][band]
+    return (counts >= min_count).astype(np.uint8)
+
+
+def save_raster(path, raster):
+    """Save a raster as a compressed .npz file."""
+    arrays = {name: value for name, value in raster.items()
+              if isinstance(value, np.ndarray)}
+    np.savez_compressed(path, origin=np.asarray(raster["origin"]), cell_size=raster["cell_size"],
+                        bands=np.asarray(raster["bands"], dtype=np.float64).reshape(-1, 2), **arrays)
+
+
+def load_raster(path):
+    """Load a raster saved with `save_raster`."""
+    with np.load(path) as data:
+        raster = {name: data[name] for name in data.files}
+    raster["origin"] = tuple(raster["origin"].tolist())
+    raster["cell_size"] = float(raster["cell_size"])
+    raster["bands"] = [tuple(b) for b in raster["bands"].tolist()]
+    raster["shape"] = raster["count"].shape
+    for name in ("min_z", "max_z", "mean_z", "band_count"):
+        raster.setdefault(name, None)
+    height, width = raster["shape"]
+    min_x, min_y = raster["origin"]
+    raster["extent"] = [min_x, min_x + width * raster["cell_size"], min_y, min_y + height * raster["cell_size"]]
+    return raster
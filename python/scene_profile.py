@@ -0,0 +1,378 @@
+#!/usr/bin/env python3
+"""
+Shared scene geometry profile for point cloud tools.
+
+Computes, in a single streaming pass over the points, everything the
+individual tools used to estimate on their own:
+  - XYZ bounds
+  - a fixed-width z-histogram and its peaks
+  - a RANSAC floor plane (fitted to a random sample near the floor peak)
+  - a ceiling estimate
+
+The profile is always computed from the raw vertices of the PLY (streamed
+from the memory-mapped file), never from a pruned, denoised or downsampled
+subset a tool happens to hold, and is cached as a JSON sidecar next to the
+PLY (`scan.ply` -> `scan.ply.profile.json`). The sidecar is invalidated when
+the PLY's size or modification time changes, so boundary_generator,
+extract_floorplan, extract_wallplan, downsampler and SafetyGauss all agree on
+the same floor whatever order they run in.
+
+Usage:
+  python scene_profile.py input.ply [--recompute]
+"""
+
+import os
+import sys
+import json
+import argparse
+import numpy as np
+from pathlib import Path
+
+from ply_io import read_ply, ply_points
+
+PROFILE_VERSION = 2
+PROFILE_SUFFIX = ".profile.json"
+
+
+def profile_path_for(ply_path):
+    """Return the sidecar path used to cache the profile of `ply_path`."""
+    return Path(str(ply_path) + PROFILE_SUFFIX)
+
+
+def _source_signature(ply_path):
+    st = os.stat(ply_path)
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def _fit_floor_plane(sample, floor_guess, band, iterations, threshold, max_tilt_deg, rng):
+    """
+    RANSAC plane fit restricted to near-horizontal planes.
+
+    Args:
+        sample (np.array): Nx3 sample of scene points.
+        floor_guess (float): Approximate floor height (histogram peak).
+        band (float): Half-width of the z band around floor_guess to fit in.
+        iterations (int): Number of RANSAC hypotheses.
+        threshold (float): Inlier distance (meters).
+        max_tilt_deg (float): Reject planes tilted more than this from horizontal.
+    Returns:
+        tuple: (plane [a, b, c, d] with unit normal and c > 0, inlier count),
+               or (None, 0) if no plane could be fitted.
+    """
+    candidates = sample[np.abs(sample[:, 2] - floor_guess) <= band]
+    if len(candidates) < 3:
+        return None, 0
+    if len(candidates) > 20000:
+        # Bound the (hypotheses x candidates) scoring matrix
+        candidates = candidates[rng.choice(len(candidates), size=20000, replace=False)]
+
+    min_nz = np.cos(np.radians(max_tilt_deg))
+    triples = rng.integers(0, len(candidates), size=(iterations, 3))
+    p0, p1, p2 = candidates[triples[:, 0]], candidates[triples[:, 1]], candidates[triples[:, 2]]
+    normals = np.cross(p1 - p0, p2 - p0)
+    norms = np.linalg.norm(normals, axis=1)
+    valid = norms > 1e-12
+    normals[valid] /= norms[valid, None]
+    normals[normals[:, 2] < 0] *= -1
+    valid &= normals[:, 2] >= min_nz
+    if not np.any(valid):
+        return None, 0
+    normals = normals[valid]
+    ds = -np.einsum('ij,ij->i', normals, p0[valid])
+
+    # Score all hypotheses at once: (hypotheses x candidates) distances
+    dist = np.abs(candidates @ normals.T + ds)
+    inliers = (dist <= threshold).sum(axis=0)
+    best = int(np.argmax(inliers))
+    plane = np.append(normals[best], ds[best])
+
+    # Refine with a least-squares fit on the inliers of the best hypothesis
+    inlier_pts = candidates[dist[:, best] <= threshold]
+    if len(inlier_pts) >= 3:
+        centroid = inlier_pts.mean(axis=0)
+        _, _, vh = np.linalg.svd(inlier_pts - centroid, full_matrices=False)
+        normal = vh[-1]
+        if normal[2] < 0:
+            normal = -normal
+        if normal[2] >= min_nz:
+            plane = np.append(normal, -normal @ centroid)
+    return plane, int(inliers[best])
+
+
+def _histogram_peaks(counts, min_fraction):
+    """Indices of local maxima in `counts` holding at least min_fraction of the largest bin."""
+    if len(counts) == 0:
+        return np.array([], dtype=int)
+    smoothed = np.convolve(counts, np.ones(3) / 3.0, mode='same')
+    padded = np.concatenate(([-1.0], smoothed, [-1.0]))
+    is_peak = (padded[1:-1] >= padded[:-2]) & (padded[1:-1] > padded[2:])
+    is_peak &= smoothed >= min_fraction * smoothed.max()
+    return np.nonzero(is_peak)[0]
+
+
+def compute_scene_profile(points, bin_size=0.02, chunk_size=2_000_000, sample_size=100_000,
+                          floor_band=0.15, ransac_iterations=256, ransac_threshold=0.03,
+                          max_floor_tilt_deg=10.0, min_peak_fraction=0.05, seed=0):
+    """
+    Compute the scene geometry profile in a single streaming pass.
+
+    Args:
+        points (np.array): Nx3 (or wider) array of points, or a structured vertex
+                           array from ply_io.read_ply (streamed without loading it).
+        bin_size (float): Width of the z-histogram bins (meters).
+        chunk_size (int): Number of points processed per chunk.
+        sample_size (int): Size of the random sample kept for the floor fit.
+        floor_band (float): Half-width of the band around the floor peak used for RANSAC.
+        ransac_iterations (int): Number of RANSAC plane hypotheses.
+        ransac_threshold (float): RANSAC inlier distance (meters).
+        max_floor_tilt_deg (float): Maximum accepted floor tilt.
+        min_peak_fraction (float): Minimum size of a histogram peak relative to the largest bin.
+        seed (int): Random seed for sampling and RANSAC.
+    Returns:
+        dict: Scene profile (see module docstring), or None if there are no points.
+    """
+    n = len(points)
+    if n == 0:
+        return None
+
+    rng = np.random.default_rng(seed)
+    bounds_min = np.full(3, np.inf)
+    bounds_max = np.full(3, -np.inf)
+    counts = np.zeros(0, dtype=np.int64)
+    origin = None
+    samples = []
+
+    for start in range(0, n, chunk_size):
+        if points.dtype.names:
+            chunk = ply_points(points[start:start + chunk_size])
+        else:
+            chunk = np.asarray(points[start:start + chunk_size, :3], dtype=np.float64)
+        bounds_min = np.minimum(bounds_min, chunk.min(axis=0))
+        bounds_max = np.maximum(bounds_max, chunk.max(axis=0))
+
+        bins = np.floor(chunk[:, 2] / bin_size).astype(np.int64)
+        lo, hi = bins.min(), bins.max()
+        if origin is None:
+            origin = lo
+        # Grow the histogram in either direction as new heights appear
+        if lo < origin:
+            counts = np.concatenate((np.zeros(origin - lo, dtype=np.int64), counts))
+            origin = lo
+        if hi - origin + 1 > len(counts):
+            counts = np.concatenate((counts, np.zeros(hi - origin + 1 - len(counts), dtype=np.int64)))
+        counts += np.bincount(bins - origin, minlength=len(counts))
+
+        take = int(round(len(chunk) * sample_size / n))
+        if take > 0:
+            samples.append(chunk[rng.choice(len(chunk), size=min(take, len(chunk)), replace=False)])
+
+    sample = np.vstack(samples) if samples else np.empty((0, 3))
+    edges = (origin + np.arange(len(counts) + 1)) * bin_size
+    centers = (edges[:-1] + edges[1:]) / 2
+    peaks = _histogram_peaks(counts.astype(float), min_peak_fraction)
+
+    profile = {
+        "version": PROFILE_VERSION,
+        "num_points": int(n),
+        "bounds": {"min": bounds_min.tolist(), "max": bounds_max.tolist()},
+        "histogram": {"origin": float(edges[0]), "bin_size": bin_size, "counts": counts.tolist()},
+        "peaks": [{"height": float(centers[i]), "count": int(counts[i])} for i in peaks],
+    }
+
+    # Floor: densest peak in the lower half of the height range, refined by RANSAC
+    median = profile_percentile(profile, 50)
+    lower = [i for i in peaks if centers[i] <= median]
+    floor_guess = centers[max(lower, key=lambda i: counts[i])] if lower else profile_percentile(profile, 5)
+    plane, inliers = _fit_floor_plane(sample, floor_guess, floor_band, ransac_iterations,
+                                      ransac_threshold, max_floor_tilt_deg, rng)
+    if plane is not None:
+        cx, cy = (bounds_min[:2] + bounds_max[:2]) / 2
+        floor_height = -(plane[0] * cx + plane[1] * cy + plane[3]) / plane[2]
+        profile["floor_plane"] = plane.tolist()
+    else:
+        floor_height = floor_guess
+        profile["floor_plane"] = None
+    profile["floor_height"] = float(floor_height)
+    profile["floor_inliers"] = inliers
+
+    # Ceiling: densest peak above the midpoint between floor and top, else a high percentile
+    mid = (floor_height + bounds_max[2]) / 2
+    upper = [i for i in peaks if centers[i] > mid]
+    if upper:
+        profile["ceiling_height"] = float(centers[max(upper, key=lambda i: counts[i])])
+        profile["ceiling_detected"] = True
+    else:
+        profile["ceiling_height"] = float(profile_percentile(profile, 95))
+        profile["ceiling_detected"] = False
+    return profile
+
+
+def profile_percentile(profile, q):
+    """
+    Approximate percentile of the z-coordinates from the profile histogram.
+
+    Args:
+        profile (dict): Scene profile.
+        q (float): Percentile in [0, 100].
+    Returns:
+        float: Height (meters), interpolated within the containing bin.
+    """
+    hist = profile["histogram"]
+    counts = np.asarray(hist["counts"], dtype=np.float64)
+    cumulative = np.cumsum(counts)
+    target = q / 100.0 * cumulative[-1]
+    i = int(np.searchsorted(cumulative, target))
+    i = min(i, len(counts) - 1)
+    before = cumulative[i - 1] if i > 0 else 0.0
+    frac = (target - before) / counts[i] if counts[i] > 0 else 0.0
+    return hist["origin"] + (i + frac) * hist["bin_size"]
+
+
+def floor_height_at(profile, xy):
+    """
+    Floor height under each XY position, following the fitted floor plane.
+
+    Args:
+        profile (dict): Scene profile.
+        xy (np.array): Nx2 array of positions.
+    Returns:
+        np.array: N floor heights (constant if no plane was fitted).
+    """
+    xy = np.asarray(xy, dtype=np.float64)
+    plane = profile.get("floor_plane")
+    if plane is None:
+        return np.full(len(xy), profile["floor_height"])
+    a, b, c, d = plane
+    return -(a * xy[:, 0] + b * xy[:, 1] + d) / c
+
+
+def detect_floor_levels(profile, min_level_height=2.0, slab_gap=0.6, min_peak_fraction=0.3):
+    """
+    Storeys of a multi-level scan from the z-histogram peaks.
+
+    Strong horizontal peaks (floors and ceilings) are grouped when closer than
+    `slab_gap`: a ceiling and the floor slab above it form one group, whose top
+    is the upper level's floor and whose bottom is the lower level's ceiling.
+    Consecutive groups at least `min_level_height` apart bound a level; a level
+    is also added above the top group when the scan extends that far above it.
+
+    Args:
+        profile (dict): Scene profile.
+        min_level_height (float): Minimum floor-to-ceiling height of a level (meters).
+        slab_gap (float): Peaks closer than this belong to the same slab (meters).
+        min_peak_fraction (float): Minimum peak size relative to the largest peak.
+    Returns:
+        list: [{"level", "floor_height", "ceiling_height"}] from the bottom up
+              (a single level spanning the scan if no peaks qualify).
+    """
+    top = profile["bounds"]["max"][2]
+    peaks = profile["peaks"]
+    largest = max((p["count"] for p in peaks), default=0)
+    heights = sorted(p["height"] for p in peaks if p["count"] >= min_peak_fraction * largest)
+
+    slabs = []
+    for height in heights:
+        if slabs and height - slabs[-1][1] < slab_gap:
+            slabs[-1][1] = height
+        else:
+            slabs.append([height, height])
+    if not slabs:
+        return [{"level": 0, "floor_height": profile["floor_height"], "ceiling_height": top}]
+    # The RANSAC floor is more precise than the lowest histogram peak
+    if abs(slabs[0][1] - profile["floor_height"]) < slab_gap:
+        slabs[0] = [min(slabs[0][0], profile["floor_height"]), profile["floor_height"]]
+
+    levels = []
+    for (_, floor), (ceiling, _) in zip(slabs[:-1], slabs[1:]):
+        if ceiling - floor >= min_level_height:
+            levels.append((floor, ceiling))
+    if top - slabs[-1][1] >= min_level_height:
+        levels.append((slabs[-1][1], top))
+    if not levels:
+        levels.append((slabs[0][1], top))
+    return [{"level": i, "floor_height": float(floor), "ceiling_height": float(ceiling)}
+            for i, (floor, ceiling) in enumerate(levels)]
+
+
+def load_scene_profile(ply_path):
+    """
+    Load a cached profile for `ply_path` if it exists and is still valid.
+
+    Returns:
+        dict: The profile, or None if missing or stale.
+    """
+    sidecar = profile_path_for(ply_path)
+    if not sidecar.exists():
+        return None
+    try:
+        with open(sidecar, 'r') as f:
+            profile = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Warning: Could not read scene profile {sidecar}: {e}")
+        return None
+    if profile.get("version") != PROFILE_VERSION or profile.get("source") != _source_signature(ply_path):
+        return None
+    return profile
+
+
+def save_scene_profile(profile, ply_path):
+    """Write `profile` as the sidecar of `ply_path`. Returns the sidecar path or None."""
+    sidecar = profile_path_for(ply_path)
+    profile = dict(profile, source=_source_signature(ply_path))
+    try:
+        with open(sidecar, 'w') as f:
+            json.dump(profile, f)
+    except OSError as e:
+        print(f"Warning: Could not write scene profile {sidecar}: {e}")
+        return None
+    return sidecar
+
+
+def get_scene_profile(ply_path, recompute=False, **kwargs):
+    """
+    Return the cached profile of `ply_path`, computing and caching it if needed.
+
+    The raw PLY vertices are memory-mapped and streamed on a cache miss, so the
+    profile does not depend on which tool (and point filtering) computed it first.
+
+    Args:
+        ply_path (str): Path of the PLY file.
+        recompute (bool): Ignore any cached profile.
+        **kwargs: Passed to compute_scene_profile.
+    Returns:
+        dict: Scene profile, or None if there are no points.
+    """
+    if not recompute:
+        profile = load_scene_profile(ply_path)
+        if profile is not None:
+            print(f"Using cached scene profile {profile_path_for(ply_path)}")
+            return profile
+    profile = compute_scene_profile(read_ply(ply_path), **kwargs)
+    if profile is not None:
+        save_scene_profile(profile, ply_path)
+    return profile
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compute and cache the scene geometry profile of a PLY file.")
+    parser.add_argument("input", help="Input PLY file")
+    parser.add_argument("--recompute", action="store_true", help="Ignore any cached profile.")
+    args = parser.parse_args()
+
+    profile = get_scene_profile(args.input, recompute=args.recompute)
+    if profile is None:
+        print("Error: Point cloud is empty.")
+        return 1
+    print(f"Floor height:   {profile['floor_height']:.3f}m ({profile['floor_inliers']} RANSAC inliers)")
+    print(f"Ceiling height: {profile['ceiling_height']:.3f}m" +
+          ("" if profile["ceiling_detected"] else " (no ceiling peak, 95th percentile)"))
+    print(f"Bounds: {profile['bounds']['min']} - {profile['bounds']['max']}")
+    for peak in profile["peaks"]:
+        print(f"  peak at {peak['height']:.3f}m ({peak['count']} points)")
+    for level in detect_floor_levels(profile):
+        print(f"Level {level['level']}: floor {level['floor_height']:.3f}m, ceiling {level['ceiling_height']:.3f}m")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Persistent KD-tree sidecars for point cloud analysis.
+
+Building a scipy KDTree over tens of millions of points takes a large share
+of an analysis run. The built tree is saved next to the point cloud
+(`scan.ply` -> `scan.ply.kdtree/<hash>/`) as flat `.npy` arrays: the tree node
+buffer, the point data and the index permutation. When it is loaded again,
+the data and index arrays are memory-mapped and the tree is restored without
+a rebuild. Workers can therefore query immediately, and several processes
+share the same on-disk pages.
+
+Sidecars are keyed by a SHA-1 of the point array they were built from, so
+trees over different point sets of the same file (raw, pruned, denoised)
+live side by side instead of evicting each other. At most
+DEFAULT_MAX_SIDECARS point sets are kept per file; the least recently used
+ones are removed. A sidecar is rebuilt whenever the leaf size or the scipy
+version differ.
+
+Usage:
+  python spatial_index.py input.ply [--rebuild]
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import argparse
+import numpy as np
+import scipy
+from pathlib import Path
+from scipy.spatial import KDTree
+
+from ply_io import add_splat_arguments, splat_options
+from point_cache import load_points_cached
+
+INDEX_VERSION = 1
+
+# Point sets (raw, pruned, denoised, downsampled...) with a saved tree per PLY
+DEFAULT_MAX_SIDECARS = 4
+
+
+def index_dir_for(ply_path, content_hash=None):
+    """Sidecar directory of a PLY file, or of one point set of it when `content_hash` is given."""
+    index_dir = str(ply_path) + ".kdtree"
+    return os.path.join(index_dir, content_hash) if content_hash is not None else index_dir
+
+
+def points_hash(points, block_rows=1_000_000):
+    """SHA-1 of a point array's shape, dtype and contents (hashed in blocks)."""
+    points = np.asarray(points)
+    digest = hashlib.sha1(f"{points.shape}|{points.dtype.str}".encode())
+    for start in range(0, len(points), block_rows):
+        digest.update(np.ascontiguousarray(points[start:start + block_rows]).data)
+    return digest.hexdigest()
+
+
+def save_kdtree(kdtree, index_dir, content_hash):
+    """
+    Save a built KDTree as memory-mappable arrays.
+
+    Args:
+        kdtree (KDTree): Built tree.
+        index_dir (str): Sidecar directory (replaced if it exists).
+        content_hash (str): points_hash of the points the tree was built from.
+    """
+    tree_buffer, data, n, m, leafsize, maxes, mins, indices, _, _ = kdtree.__getstate__()
+    index_dir = Path(index_dir)
+    tmp = index_dir.with_name(f"{index_dir.name}.tmp{os.getpid()}")
+    tmp.mkdir(parents=True, exist_ok=True)
+    np.save(tmp / "tree.npy", np.frombuffer(tree_buffer, dtype=np.uint8))
+    np.save(tmp / "data.npy", data)
+    np.save(tmp / "indices.npy", indices)
+    meta = {"version": INDEX_VERSION, "scipy_version": scipy.__version__, "content_hash": content_hash,
+            "n": int(n), "m": int(m), "leafsize": int(leafsize),
+            "maxes": np.asarray(maxes).tolist(), "mins": np.asarray(mins).tolist()}
+    with open(tmp / "meta.json", 'w') as f:
+        json.dump(meta, f)
+    shutil.rmtree(index_dir, ignore_errors=True)
+    os.replace(tmp, index_dir)
+
+
+def load_kdtree(index_dir, content_hash=None, leafsize=None):
+    """
+    Restore a saved KDTree, memory-mapping its data and index arrays.
+
+    Args:
+        index_dir (str): Sidecar directory.
+        content_hash (str, optional): Expected points_hash; a mismatch returns None.
+        leafsize (int, optional): Expected leaf size; a mismatch returns None.
+    Returns:
+        KDTree or None: The tree, or None if the sidecar is missing or stale.
+    """
+    index_dir = Path(index_dir)
+    try:
+        with open(index_dir / "meta.json") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if (meta.get("version") != INDEX_VERSION or meta.get("scipy_version") != scipy.__version__
+            or (content_hash is not None and meta.get("content_hash") != content_hash)
+            or (leafsize is not None and meta.get("leafsize") != leafsize)):
+        return None
+
+    tree_buffer = np.load(index_dir / "tree.npy")
+    data = np.load(index_dir / "data.npy", mmap_mode='r')
+    indices = np.load(index_dir / "indices.npy", mmap_mode='r')
+    kdtree = KDTree.__new__(KDTree)
+    kdtree.__setstate__((tree_buffer.view('S1'), data, meta["n"], meta["m"], meta["leafsize"],
+                         np.array(meta["maxes"]), np.array(meta["mins"]), indices, None, None))
+    return kdtree
+
+
+def evict_sidecars(base_dir, max_sidecars=DEFAULT_MAX_SIDECARS, keep=None):
+    """
+    Remove the least recently used per-hash sidecars of a PLY beyond `max_sidecars`.
+
+    Args:
+        base_dir (str): index_dir_for(ply_path) without a hash.
+        max_sidecars (int): Sidecars to keep.
+        keep (str, optional): Content hash that must not be removed.
+    Returns:
+        int: Number of sidecars removed.
+    """
+    base_dir = Path(base_dir)
+    if not base_dir.is_dir():
+        return 0
+    sidecars = []
+    for entry in base_dir.iterdir():
+        meta_path = entry / "meta.json"
+        if entry.is_dir() and meta_path.is_file():
+            sidecars.append((meta_path.stat().st_mtime, entry))
+    sidecars.sort()
+    removed = 0
+    for _, entry in sidecars[:max(len(sidecars) - max_sidecars, 0)]:
+        if entry.name == keep:
+            continue
+        shutil.rmtree(entry, ignore_errors=True)
+        removed += 1
+    return removed
+
+
+def load_or_build_kdtree(points, ply_path=None, index_dir=None, leafsize=16, rebuild=False, content_hash=None,
+                         max_sidecars=DEFAULT_MAX_SIDECARS):
+    """
+    Return a KDTree over `points`, reusing the on-disk sidecar when it matches.
+
+    Args:
+        points (np.array): Nx3 points.
+        ply_path (str, optional): Point cloud the points came from; the sidecar goes next to it,
+            keyed by the points' content hash.
+        index_dir (str, optional): Explicit sidecar directory (overrides ply_path).
+        leafsize (int): KDTree leaf size.
+        rebuild (bool): Ignore any existing sidecar.
+        content_hash (str, optional): points_hash of `points`, if already computed.
+        max_sidecars (int): Per-hash sidecars kept next to `ply_path` (least recently used are removed).
+    Returns:
+        KDTree: Restored or freshly built tree.
+    """
+    if index_dir is None and ply_path is None:
+        return KDTree(points, leafsize=leafsize)
+
+    if content_hash is None:
+        content_hash = points_hash(points)
+    if index_dir is None:
+        index_dir = index_dir_for(ply_path, content_hash)
+    if not rebuild:
+        try:
+            kdtree = load_kdtree(index_dir, content_hash=content_hash, leafsize=leafsize)
+        except Exception as e:
+            print(f"Warning: could not restore spatial index {index_dir}: {e}")
+            kdtree = None
+        if kdtree is not None:
+            # Touch the sidecar for LRU eviction
+            try:
+                os.utime(Path(index_dir) / "meta.json")
+            except OSError:
+                pass
+            return kdtree
+
+    start = time.time()
+    kdtree = KDTree(points, leafsize=leafsize)
+    print(f"Built KD-tree over {len(points)} points in {time.time() - start:.2f}s")
+    try:
+        save_kdtree(kdtree, index_dir, content_hash)
+        if ply_path is not None and index_dir == index_dir_for(ply_path, content_hash):
+            evict_sidecars(index_dir_for(ply_path), max_sidecars, keep=content_hash)
+    except OSError as e:
+        print(f"Warning: could not save spatial index {index_dir}: {e}")
+    return kdtree
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build (or verify) the KD-tree sidecar of a PLY file.")
+    parser.add_argument("input", help="Input PLY file")
+    parser.add_argument("--rebuild", action="store_true", help="Ignore any existing sidecar.")
+    add_splat_arguments(parser)
+    args = parser.parse_args()
+
+    points, _ = load_points_cached(args.input, with_colors=False, **splat_options(args))
+    start = time.time()
+    content_hash = points_hash(points)
+    kdtree = load_or_build_kdtree(points, args.input, rebuild=args.rebuild, content_hash=content_hash)
+    print(f"KD-tree over {kdtree.n} points ready in {time.time() - start:.2f}s: "
+          f"{index_dir_for(args.input, content_hash)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
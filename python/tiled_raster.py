@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+"""
+Tiled, bit-packed occupancy grids for large sites at fine grid sizes.
+
+A dense occupancy grid over the padded bounding box, plus the float64 copies
+made by morphology and Gaussian smoothing, does not fit in memory for e.g. a
+300 m site at 1 cm cells. A tiled grid splits the raster into fixed-size
+square tiles. Only tiles holding occupied cells are stored, as
+np.packbits arrays (one bit per cell):
+  tiles      {(tile_row, tile_col): (T, T/8) uint8 packed bits}
+  tile_size  T cells (a multiple of 8)
+  shape, origin, cell_size, extent   as in raster.rasterize
+
+Processing runs one tile at a time on a dense window holding the tile plus a
+halo:
+  tiled_filter    any local filter (e.g. extract_floorplan.process_wall_grid).
+                  The halo covers the filter's reach, so the result is
+                  identical to filtering the dense grid.
+  tiled_contours  marching squares per tile, on windows that overlap their
+                  neighbours by one cell. Contour pieces ending on a tile
+                  border are stitched into the same closed contours that
+                  find_contours gives on the dense grid.
+
+Usage:
+  grid = tiled_occupancy(points, cell_size=0.01, padding=1.0, min_count=2)
+  clean = tiled_filter(grid, process, halo=wall_grid_halo(**params))
+  contours = tiled_contours(clean, min_contour_length=10)
+"""
+
+import numpy as np
+
+from raster import raster_bounds
+
+try:
+    from skimage import measure
+except ImportError:
+    measure = None
+
+DEFAULT_TILE_SIZE = 1024
+# Above this many cells the extractors switch to tiled grids
+DENSE_CELL_LIMIT = 16_000_000
+
+
+def grid_shape(bounds, cell_size):
+    """(height, width) of the raster over `bounds`, as in raster.rasterize."""
+    min_x, max_x, min_y, max_y = bounds
+    return int((max_y - min_y) // cell_size) + 1, int((max_x - min_x) // cell_size) + 1
+
+
+def use_tiles(bounds, cell_size, tile_size=None):
+    """
+    Whether a raster should be tiled: `tile_size` 0 forces dense, a positive size forces
+    tiles, and None tiles grids larger than DENSE_CELL_LIMIT.
+    """
+    if tile_size is not None:
+        return tile_size > 0
+    height, width = grid_shape(bounds, cell_size)
+    return height * width > DENSE_CELL_LIMIT
+
+
+def _new_grid(shape, origin, cell_size, tile_size):
+    if tile_size % 8:
+        raise ValueError(f"tile_size must be a multiple of 8, got {tile_size}")
+    height, width = shape
+    min_x, min_y = origin
+    return {"tiles": {}, "tile_size": int(tile_size), "shape": (int(height), int(width)),
+            "origin": (float(min_x), float(min_y)), "cell_size": float(cell_size),
+            "extent": [min_x, min_x + width * cell_size, min_y, min_y + height * cell_size]}
+
+
+def _store_cells(grid, rows, cols):
+    """Set the given cells (sorted by tile or not) and pack the touched tiles."""
+    size = grid["tile_size"]
+    num_tile_cols = -(-grid["shape"][1] // size)
+    keys = (rows // size) * num_tile_cols + cols // size
+    order = np.argsort(keys, kind='stable')
+    keys, rows, cols = keys[order], rows[order], cols[order]
+    unique_keys, starts = np.unique(keys, return_index=True)
+    for key, r, c in zip(unique_keys, np.split(rows % size, starts[1:]), np.split(cols % size, starts[1:])):
+        tile_row, tile_col = divmod(int(key), num_tile_cols)
+        tile = np.zeros((size, size), dtype=bool)
+        existing = grid["tiles"].get((tile_row, tile_col))
+        if existing is not None:
+            tile |= np.unpackbits(existing, axis=1, count=size).view(bool)
+        tile[r, c] = True
+        grid["tiles"][(tile_row, tile_col)] = np.packbits(tile, axis=1)
+
+
+def tiled_occupancy(points, cell_size, bounds=None, padding=0.0, min_count=1, tile_size=DEFAULT_TILE_SIZE,
+                    chunk_size=5_000_000):
+    """
+    Occupancy grid of cells holding at least `min_count` points, as bit-packed tiles.
+
+    Point counts are kept sparsely (one entry per occupied cell), so memory follows
+    the number of occupied cells rather than the bounding box.
+
+    Args:
+        points (np.array): Nx2 or Nx3 points.
+        cell_size (float): Cell size (meters).
+        bounds (tuple, optional): (min_x, max_x, min_y, max_y); defaults to the
+            point bounds grown by `padding`. Points outside are ignored.
+        padding (float): Margin added around the point bounds (meters).
+        min_count (int): Minimum points per occupied cell (see raster.density_mask).
+        tile_size (int): Tile edge in cells (multiple of 8).
+        chunk_size (int): Points processed per chunk.
+    Returns:
+        dict: Tiled grid (see module docstring).
+    """
+    if bounds is None:
+        bounds = raster_bounds(points, padding)
+    min_x, max_x, min_y, max_y = bounds
+    height, width = grid_shape(bounds, cell_size)
+    grid = _new_grid((height, width), (min_x, min_y), cell_size, tile_size)
+
+    cells = np.empty(0, dtype=np.int64)
+    counts = np.empty(0, dtype=np.int64)
+    for start in range(0, len(points), chunk_size):
+        chunk = points[start:start + chunk_size]
+        xs = np.floor((chunk[:, 0] - min_x) / cell_size).astype(np.int64)
+        ys = np.floor((chunk[:, 1] - min_y) / cell_size).astype(np.int64)
+        valid = (xs >= 0) & (xs < width) & (ys >= 0) & (ys < height)
+        chunk_cells, chunk_counts = np.unique(ys[valid] * width + xs[valid], return_counts=True)
+        # Merge into the running sparse counts
+        cells, inverse = np.unique(np.concatenate((cells, chunk_cells)), return_inverse=True)
+        counts = np.bincount(inverse, weights=np.concatenate((counts, chunk_counts)),
+                             minlength=len(cells)).astype(np.int64)
+
+    occupied = cells[counts >= min_count]
+    _store_cells(grid, occupied // width, occupied % width)
+    return grid
+
+
+def tiled_from_dense(mask, origin=(0.0, 0.0), cell_size=1.0, tile_size=DEFAULT_TILE_SIZE):
+    """Tiled grid of a dense (H, W) mask."""
+    grid = _new_grid(mask.shape, origin, cell_size, tile_size)
+    rows, cols = np.nonzero(mask)
+    if len(rows):
+        _store_cells(grid, rows.astype(np.int64), cols.astype(np.int64))
+    return grid
+
+
+def window(grid, row_start, row_stop, col_start, col_stop):
+    """
+    Dense boolean window [row_start, row_stop) x [col_start, col_stop) of a tiled grid.
+    Cells outside the grid (including negative indices) are empty.
+    """
+    size = grid["tile_size"]
+    height, width = grid["shape"]
+    out = np.zeros((row_stop - row_start, col_stop - col_start), dtype=bool)
+    r0, r1 = max(row_start, 0), min(row_stop, height)
+    c0, c1 = max(col_start, 0), min(col_stop, width)
+    if r0 >= r1 or c0 >= c1:
+        return out
+    for tile_row in range(r0 // size, (r1 - 1) // size + 1):
+        for tile_col in range(c0 // size, (c1 - 1) // size + 1):
+            packed = grid["tiles"].get((tile_row, tile_col))
+            if packed is None:
+                continue
+            tile = np.unpackbits(packed, axis=1, count=size).view(bool)
+            tr0, tc0 = tile_row * size, tile_col * size
+            a0, a1 = max(r0, tr0), min(r1, tr0 + size)
+            b0, b1 = max(c0, tc0), min(c1, tc0 + size)
+            out[a0 - row_start:a1 - row_start, b0 - col_start:b1 - col_start] = tile[a0 - tr0:a1 - tr0, b0 - tc0:b1 - tc0]
+    return out
+
+
+def to_dense(grid):
+    """Dense (H, W) uint8 grid (only for grids that fit in memory)."""
+    return window(grid, 0, grid["shape"][0], 0, grid["shape"][1]).astype(np.uint8)
+
+
+def occupied_cells(grid):
+    """Number of occupied cells."""
+    return int(sum(np.unpackbits(packed).sum() for packed in grid["tiles"].values()))
+
+
+def tiled_nbytes(grid):
+    """Memory held by the packed tiles (bytes)."""
+    return int(sum(packed.nbytes for packed in grid["tiles"].values()))
+
+
+def wall_grid_halo(dilate_iterations=0, erode_iterations=0, close_iterations=0, gaussian_sigma=0.0, threshold=None):
+    """
+    Reach in cells of extract_floorplan.process_wall_grid with these parameters:
+    one cell per dilation / erosion iteration, two per closing iteration, and the
+    Gaussian kernel radius (scipy's default truncate of 4 sigma).
+    """
+    gaussian_radius = int(4.0 * gaussian_sigma + 0.5) if gaussian_sigma > 0 else 0
+    return int(dilate_iterations + erode_iterations + 2 * close_iterations + gaussian_radius)
+
+
+def tiled_filter(grid, func, halo):
+    """
+    Apply a local filter to a tiled grid one tile at a time.
+
+    Each tile is filtered on a dense window grown by `halo` cells (clipped at the
+    grid border, where the filter sees the same border as on the dense grid),
+    and the tile's part of the result is kept. Tiles farther than `halo` from any
+    occupied cell are skipped, so `func` must map an empty window to an empty one.
+
+    Args:
+        grid (dict): Tiled grid.
+        func (callable): Filter taking and returning a 2D (H, W) array (nonzero = occupied).
+        halo (int): Reach of the filter in cells.
+    Returns:
+        dict: New tiled grid.
+    """
+    size = grid["tile_size"]
+    height, width = grid["shape"]
+    result = _new_grid(grid["shape"], grid["origin"], grid["cell_size"], size)
+    num_tile_rows, num_tile_cols = -(-height // size), -(-width // size)
+    reach = -(-halo // size)
+    candidates = {(tile_row + dr, tile_col + dc)
+                  for tile_row, tile_col in grid["tiles"]
+                  for dr in range(-reach, reach + 1) for dc in range(-reach, reach + 1)}
+    for tile_row, tile_col in sorted(candidates):
+        if not (0 <= tile_row < num_tile_rows and 0 <= tile_col < num_tile_cols):
+            continue
+        tr0, tc0 = tile_row * size, tile_col * size
+        tr1, tc1 = min(tr0 + size, height), min(tc0 + size, width)
+        r0, r1 = max(tr0 - halo, 0), min(tr1 + halo, height)
+        c0, c1 = max(tc0 - halo, 0), min(tc1 + halo, width)
+        filtered = np.asarray(func(window(grid, r0, r1, c0, c1)))
+        tile = np.zeros((size, size), dtype=bool)
+        tile[:tr1 - tr0, :tc1 - tc0] = filtered[tr0 - r0:tr1 - r0, tc0 - c0:tc1 - c0] != 0
+        if tile.any():
+            result["tiles"][(tile_row, tile_col)] = np.packbits(tile, axis=1)
+    return result
+
+
+def _stitch(pieces):
+    """Join contour pieces whose end is another piece's start (pieces share their joint point)."""
+    # Crossings of a binary grid at level 0.5 lie on multiples of 0.5 cells
+    def key(point):
+        return tuple(np.round(point * 2).astype(np.int64))
+
+    starts = {key(piece[0]): i for i, piece in enumerate(pieces)}
+    used = np.zeros(len(pieces), dtype=bool)
+    contours = []
+    for i, piece in enumerate(pieces):
+        if used[i]:
+            continue
+        used[i] = True
+        chain, first, current = [piece], key(piece[0]), piece
+        while key(current[-1]) != first:
+            j = starts.get(key(current[-1]))
+            if j is None or used[j]:
+                break
+            used[j] = True
+            current = pieces[j]
+            chain.append(current[1:])
+        contours.append(np.vstack(chain))
+    return contours
+
+
+def tiled_contours(grid, min_contour_length=10):
+    """
+    Contours of a tiled grid in world coordinates, as extract_floorplan.grid_contours
+    gives on the dense grid: the grid is zero-padded by one cell, so every contour is
+    closed, and contours with fewer than `min_contour_length` vertices are dropped.
+    """
+    if measure is None:
+        raise ImportError("scikit-image is required for contour extraction")
+    size = grid["tile_size"]
+    height, width = grid["shape"]
+    # Blocks of marching squares over the padded grid (padded row = row + 1)
+    num_block_rows, num_block_cols = -(-(height + 1) // size), -(-(width + 1) // size)
+    candidates = {(tile_row + dr, tile_col + dc) for tile_row, tile_col in grid["tiles"]
+                  for dr in (0, 1) for dc in (0, 1)}
+    closed, pieces = [], []
+    for block_row, block_col in sorted(candidates):
+        if not (block_row < num_block_rows and block_col < num_block_cols):
+            continue
+        p0, q0 = block_row * size, block_col * size
+        p1, q1 = min(p0 + size, height + 1) + 1, min(q0 + size, width + 1) + 1
+        block = window(grid, p0 - 1, p1 - 1, q0 - 1, q1 - 1)
+        if not block.any():
+            continue
+        for contour in measure.find_contours(block.astype(np.float64), 0.5):
+            contour += (p0, q0)
+            if np.array_equal(contour[0], contour[-1]):
+                closed.append(contour)
+            else:
+                pieces.append(contour)
+
+    min_x, min_y = grid["origin"]
+    cell_size = grid["cell_size"]
+    contours_world = []
+    for contour in closed + _stitch(pieces):
+        if len(contour) < min_contour_length:
+            continue
+        contours_world.append(np.column_stack(((contour[:, 1] - 1) * cell_size + min_x,
+                                               (contour[:, 0] - 1) * cell_size + min_y)))
+    return contours_world
+
+
+def tiled_preview(grid, max_size=2048):
+    """
+    Downsampled occupancy image for plots (a block is set if any of its cells is).
+
+    Returns:
+        tuple: ((h, w) uint8 image, [min_x, max_x, min_y, max_y] extent for imshow)
+    """
+    height, width = grid["shape"]
+    factor = max(1, -(-max(height, width) // max_size))
+    image = np.zeros((-(-height // factor), -(-width // factor)), dtype=np.uint8)
+    size = grid["tile_size"]
+    for (tile_row, tile_col), packed in grid["tiles"].items():
+        rows, cols = np.nonzero(np.unpackbits(packed, axis=1, count=size))
+        image[(rows + tile_row * size) // factor, (cols + tile_col * size) // factor] = 1
+    min_x, min_y = grid["origin"]
+    step = factor * grid["cell_size"]
+    return image, [min_x, min_x + image.shape[1] * step, min_y, min_y + image.shape[0] * step]
@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+"""
+Vector wall extraction from a wall slice: line segments, wall pairs and a wall graph.
+
+Traced raster contours turn a single wall into hundreds of tiny segments.
+This module fits the walls directly to the slice points instead:
+  1. sequential RANSAC line fitting (vectorized hypothesis scoring); the
+     inliers of each line are split into segments at gaps
+  2. merging of collinear, overlapping or nearby segments
+  3. pairing of parallel segments (the two faces of a wall) into a wall
+     centerline with a thickness
+  4. a wall graph: wall ends closer than `snap_distance` share one node
+
+The result is a few entities per wall to write, dimension and render.
+
+Usage:
+  segments = fit_line_segments(wall_points[:, :2])
+  walls = pair_walls(merge_collinear(segments))
+  graph = wall_graph(walls)
+  python wall_segments.py wall_points.ply output_dir
+"""
+
+import sys
+import json
+import time
+import argparse
+import numpy as np
+from pathlib import Path
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+from scipy.spatial import cKDTree
+
+
+def _segment_frame(segments):
+    """Unit directions, normals, lengths and line offsets of Kx4 segments (x1, y1, x2, y2)."""
+    delta = segments[:, 2:4] - segments[:, 0:2]
+    lengths = np.hypot(delta[:, 0], delta[:, 1])
+    directions = delta / np.maximum(lengths, 1e-12)[:, None]
+    normals = np.column_stack((-directions[:, 1], directions[:, 0]))
+    offsets = np.einsum('ij,ij->i', normals, segments[:, 0:2])
+    return directions, normals, lengths, offsets
+
+
+def _split_at_gaps(t, max_gap, min_inliers, min_length):
+    """(start, end) positions along a line of runs of sorted `t` without gaps above max_gap."""
+    breaks = np.nonzero(np.diff(t) > max_gap)[0]
+    starts = np.concatenate(([0], breaks + 1))
+    ends = np.concatenate((breaks, [len(t) - 1]))
+    keep = (ends - starts + 1 >= min_inliers) & (t[ends] - t[starts] >= min_length)
+    return [(t[s], t[e], e - s + 1) for s, e in zip(starts[keep], ends[keep])]
+
+
+def fit_line_segments(points, inlier_distance=0.03, min_inliers=30, min_length=0.3, max_gap=0.3,
+                      iterations=256, sample_size=10000, max_lines=500, seed=0):
+    """
+    Fit wall line segments to 2D slice points with sequential RANSAC.
+
+    Each round scores `iterations` two-point line hypotheses at once against a
+    random sample of the remaining points, refines the best line by a total
+    least squares fit to its inliers and splits those inliers into segments at
+    gaps longer than `max_gap`. The line's inliers are then removed.
+
+    Args:
+        points (np.array): Nx2 (or Nx3, z ignored) slice points.
+        inlier_distance (float): Maximum point-to-line distance (meters).
+        min_inliers (int): Minimum points supporting a segment; fitting stops below it.
+        min_length (float): Minimum segment length (meters).
+        max_gap (float): Maximum gap between consecutive inliers along a segment (meters).
+        iterations (int): Hypotheses per round.
+        sample_size (int): Remaining points used to score the hypotheses.
+        max_lines (int): Maximum number of RANSAC rounds.
+        seed (int): Random seed.
+    Returns:
+        tuple: (Kx4 segments (x1, y1, x2, y2), K inlier counts)
+    """
+    rng = np.random.default_rng(seed)
+    remaining = np.asarray(points, dtype=np.float64)[:, :2]
+    segments, support = [], []
+    misses = 0
+    for _ in range(max_lines):
+        if len(remaining) < max(min_inliers, 2) or misses >= 3:
+            break
+        sample = remaining
+        if len(sample) > sample_size:
+            sample = sample[rng.choice(len(sample), size=sample_size, replace=False)]
+        pairs = rng.integers(0, len(remaining), size=(iterations, 2))
+        delta = remaining[pairs[:, 1]] - remaining[pairs[:, 0]]
+        norms = np.hypot(delta[:, 0], delta[:, 1])
+        valid = norms > inlier_distance
+        if not np.any(valid):
+            break
+        normals = np.column_stack((-delta[valid, 1], delta[valid, 0])) / norms[valid, None]
+        offsets = np.einsum('ij,ij->i', normals, remaining[pairs[valid, 0]])
+        # (sample x hypotheses) distances, scored in one pass
+        scores = (np.abs(sample @ normals.T - offsets) <= inlier_distance).sum(axis=0)
+        best = int(np.argmax(scores))
+
+        inliers = np.abs(remaining @ normals[best] - offsets[best]) <= inlier_distance
+        if inliers.sum() < min_inliers:
+            break
+        fit = remaining[inliers]
+        centroid = fit.mean(axis=0)
+        _, _, vt = np.linalg.svd(fit - centroid, full_matrices=False)
+        direction = vt[0]
+        normal = np.array([-direction[1], direction[0]])
+        inliers = np.abs((remaining - centroid) @ normal) <= inlier_distance
+
+        t = np.sort((remaining[inliers] - centroid) @ direction)
+        pieces = _split_at_gaps(t, max_gap, min_inliers, min_length)
+        for t_start, t_end, count in pieces:
+            segments.append(np.concatenate((centroid + t_start * direction, centroid + t_end * direction)))
+            support.append(count)
+        # Lines without a long enough piece are clutter; stop after a few in a row
+        misses = 0 if pieces else misses + 1
+        remaining = remaining[~inliers]
+    if not segments:
+        return np.empty((0, 4)), np.empty(0, dtype=np.int64)
+    return np.array(segments), np.array(support, dtype=np.int64)
+
+
+def merge_collinear(segments, angle_tolerance_deg=3.0, distance_tolerance=0.05, max_gap=0.3):
+    """
+    Merge segments that lie on one line and overlap or nearly touch.
+
+    Pairs are compared all at once; connected groups are replaced by the
+    segment spanning their extreme projections on the longest member's line.
+
+    Args:
+        segments (np.array): Kx4 segments.
+        angle_tolerance_deg (float): Maximum angle between merged segments.
+        distance_tolerance (float): Maximum offset between their lines (meters).
+        max_gap (float): Maximum gap between their extents along the line (meters).
+    Returns:
+        np.array: Mx4 merged segments (M <= K).
+    """
+    if len(segments) < 2:
+        return segments
+    directions, normals, lengths, _ = _segment_frame(segments)
+    parallel = np.abs(directions @ directions.T) >= np.cos(np.radians(angle_tolerance_deg))
+    # Offsets of each segment's midpoint from every other segment's line
+    midpoints = (segments[:, 0:2] + segments[:, 2:4]) / 2
+    offset = np.abs(np.einsum('jk,ik->ij', normals, midpoints) - np.einsum('jk,jk->j', normals, segments[:, 0:2]))
+    near_line = np.minimum(offset, offset.T) <= distance_tolerance
+    # Extents along each segment's direction, relative to its own start
+    t_a = np.einsum('jk,ijk->ij', directions, segments[:, None, 0:2] - segments[None, :, 0:2])
+    t_b = np.einsum('jk,ijk->ij', directions, segments[:, None, 2:4] - segments[None, :, 0:2])
+    gap = np.maximum(np.minimum(t_a, t_b) - lengths[None, :], -np.maximum(t_a, t_b))
+    touching = gap <= max_gap
+    adjacency = parallel & near_line & touching & touching.T
+    num_groups, labels = connected_components(coo_matrix(adjacency), directed=False)
+
+    merged = []
+    for group in range(num_groups):
+        members = np.nonzero(labels == group)[0]
+        if len(members) == 1:
+            merged.append(segments[members[0]])
+            continue
+        anchor = members[np.argmax(lengths[members])]
+        ends = segments[members].reshape(-1, 2)
+        # Length-weighted line through the members, along the anchor's direction
+        direction = directions[anchor]
+        normal = normals[anchor]
+        weights = np.repeat(lengths[members], 2)
+        offset = np.average(ends @ normal, weights=weights)
+        t = ends @ direction
+        origin = offset * normal
+        merged.append(np.concatenate((origin + t.min() * direction, origin + t.max() * direction)))
+    return np.array(merged)
+
+
+def pair_walls(segments, min_thickness=0.05, max_thickness=0.5, angle_tolerance_deg=5.0, min_overlap=0.5,
+               default_thickness=None):
+    """
+    Pair parallel segments (the two faces of a wall) into walls with a thickness.
+
+    Two segments pair when they are parallel, between min_thickness and
+    max_thickness apart and overlap along the wall by at least `min_overlap`
+    of the shorter one. Pairs are taken greedily, closest first. A paired wall
+    is the centerline over the union of both faces; unpaired segments become
+    walls of `default_thickness`.
+
+    Args:
+        segments (np.array): Kx4 segments (ideally merged).
+    Returns:
+        list: [{"start": [x, y], "end": [x, y], "thickness": float or None, "faces": [i] or [i, j]}]
+    """
+    walls = []
+    used = np.zeros(len(segments), dtype=bool)
+    if len(segments) >= 2:
+        directions, normals, lengths, offsets = _segment_frame(segments)
+        cosine = directions @ directions.T
+        parallel = np.abs(cosine) >= np.cos(np.radians(angle_tolerance_deg))
+        midpoints = (segments[:, 0:2] + segments[:, 2:4]) / 2
+        distance = np.abs(np.einsum('jk,ik->ij', normals, midpoints) - offsets[None, :])
+        distance = (distance + distance.T) / 2
+        t_a = np.einsum('jk,ijk->ij', directions, segments[:, None, 0:2] - segments[None, :, 0:2])
+        t_b = np.einsum('jk,ijk->ij', directions, segments[:, None, 2:4] - segments[None, :, 0:2])
+        overlap = np.minimum(np.maximum(t_a, t_b), lengths[None, :]) - np.maximum(np.minimum(t_a, t_b), 0.0)
+        shorter = np.minimum(lengths[:, None], lengths[None, :])
+        candidate = (parallel & (distance >= min_thickness) & (distance <= max_thickness)
+                     & (overlap >= min_overlap * shorter))
+        candidate = np.triu(candidate, k=1)
+        for i, j in sorted(zip(*np.nonzero(candidate)), key=lambda ij: distance[ij]):
+            if used[i] or used[j]:
+                continue
+            used[i] = used[j] = True
+            # Centerline along the longer face's direction, halfway between both lines
+            anchor = i if lengths[i] >= lengths[j] else j
+            direction = directions[anchor]
+            normal = normals[anchor]
+            ends = np.vstack((segments[i].reshape(2, 2), segments[j].reshape(2, 2)))
+            center = (ends @ normal).mean()
+            t = ends @ direction
+            walls.append({"start": (center * normal + t.min() * direction).tolist(),
+                          "end": (center * normal + t.max() * direction).tolist(),
+                          "thickness": float(distance[i, j]), "faces": [int(i), int(j)]})
+    for i in np.nonzero(~used)[0]:
+        walls.append({"start": segments[i, 0:2].tolist(), "end": segments[i, 2:4].tolist(),
+                      "thickness": default_thickness, "faces": [int(i)]})
+    return walls
+
+
+def wall_graph(walls, snap_distance=0.3):
+    """
+    Build a wall graph: wall ends within `snap_distance` of each other share a node.
+
+    Returns:
+        dict: {"nodes": [[x, y], ...],
+               "edges": [{"nodes": [a, b], "length": float, "thickness": float or None}, ...]}
+    """
+    if not walls:
+        return {"nodes": [], "edges": []}
+    ends = np.array([[w["start"], w["end"]] for w in walls], dtype=np.float64).reshape(-1, 2)
+    pairs = cKDTree(ends).query_pairs(snap_distance, output_type='ndarray')
+    adjacency = coo_matrix((np.ones(len(pairs)), (pairs[:, 0], pairs[:, 1])), shape=(len(ends), len(ends)))
+    num_nodes, labels = connected_components(adjacency, directed=False)
+    counts = np.bincount(labels, minlength=num_nodes)
+    nodes = np.column_stack([np.bincount(labels, weights=ends[:, k], minlength=num_nodes) / counts
+                             for k in range(2)])
+    edges = []
+    for w, (a, b) in zip(walls, labels.reshape(-1, 2)):
+        if a == b:
+            continue
+        edges.append({"nodes": [int(a), int(b)], "length": float(np.linalg.norm(nodes[a] - nodes[b])),
+                      "thickness": w["thickness"]})
+    return {"nodes": nodes.tolist(), "edges": edges}
+
+
+def extract_wall_graph(points, inlier_distance=0.03, min_inliers=30, min_length=0.3, max_gap=0.3,
+                       max_thickness=0.5, snap_distance=0.3, seed=0):
+    """
+    Full vector pipeline on wall slice points: segments -> merged -> walls -> graph.
+
+    Returns:
+        dict: {"segments": Kx4 array, "walls": list, "graph": dict}
+    """
+    start = time.time()
+    segments, _ = fit_line_segments(points, inlier_distance, min_inliers, min_length, max_gap, seed=seed)
+    fitted = len(segments)
+    segments = merge_collinear(segments, distance_tolerance=inlier_distance * 2, max_gap=max_gap)
+    walls = pair_walls(segments, min_thickness=inlier_distance * 2, max_thickness=max_thickness)
+    graph = wall_graph(walls, snap_distance)
+    print(f"Fitted {fitted} segments, merged to {len(segments)}, {len(walls)} walls, "
+          f"{len(graph['nodes'])} nodes in {time.time() - start:.2f}s")
+    return {"segments": segments, "walls": walls, "graph": graph}
+
+
+def save_wall_graph(path, result):
+    """Write the walls and wall graph of extract_wall_graph as JSON."""
+    with open(path, 'w') as f:
+        json.dump({"walls": result["walls"], "nodes": result["graph"]["nodes"],
+                   "edges": result["graph"]["edges"]}, f, indent=2)
+
+
+def main():
+    from ply_io import read_ply, ply_points
+
+    parser = argparse.ArgumentParser(description="Fit a vector wall graph to wall slice points.")
+    parser.add_argument("input", help="Wall slice PLY (e.g. wall_points.ply from extract_floorplan)")
+    parser.add_argument("output", help="Output directory")
+    parser.add_argument("--inlier-distance", type=float, default=0.03, help="RANSAC inlier distance (meters).")
+    parser.add_argument("--min-inliers", type=int, default=30, help="Minimum points per segment.")
+    parser.add_argument("--min-length", type=float, default=0.3, help="Minimum segment length (meters).")
+    parser.add_argument("--max-gap", type=float, default=0.3, help="Maximum gap along a segment (meters).")
+    parser.add_argument("--max-thickness", type=float, default=0.5, help="Maximum wall thickness (meters).")
+    args = parser.parse_args()
+
+    output_path = Path(args.output)
+    output_path.mkdir(parents=True, exist_ok=True)
+    result = extract_wall_graph(ply_points(read_ply(args.input)), args.inlier_distance, args.min_inliers,
+                                args.min_length, args.max_gap, args.max_thickness)
+    save_wall_graph(output_path / "wall_graph.json", result)
+    print(f"Saved wall graph to {output_path / 'wall_graph.json'}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
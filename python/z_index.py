@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Z-sorted slab index for fast height slicing.
+
+The wall slice, multi-level and interactive slicing code used to select a
+height band with `(z >= lo) & (z < hi)` over the full point array, which is a
+full scan (and a copy) per slice. This index sorts the points by z once and
+stores:
+  points   Nx3 points in z order
+  z        their heights as one contiguous array (for searchsorted)
+  order    permutation from z order to the original point order
+  offsets  start of every fixed-height slab in z order
+A height band is then two binary searches within the slabs holding its
+bounds, and its points are the contiguous view `points[start:stop]`.
+
+For points loaded through point_cache, the index is stored as `.npy` files in
+the same cache entry and memory-mapped on later runs; it is evicted together
+with the points it was built from.
+
+Usage:
+  index = load_or_build_z_index(points, ply_path="scan.ply")
+  wall_points = z_slice(index, 1.15, 1.25)
+  python z_index.py input.ply [--slab-size 0.05] [--rebuild]
+"""
+
+import sys
+import json
+import time
+import argparse
+import numpy as np
+
+from ply_io import add_splat_arguments, splat_options
+from point_cache import load_points_cached, cache_entry
+
+Z_INDEX_VERSION = 1
+DEFAULT_SLAB_SIZE = 0.05
+
+
+def build_z_index(points, slab_size=DEFAULT_SLAB_SIZE):
+    """
+    Sort points by height and compute the slab offsets.
+
+    Args:
+        points (np.array): Nx3 points.
+        slab_size (float): Slab height (meters).
+    Returns:
+        dict: {"points", "z", "order", "offsets", "z0", "slab_size"}
+    """
+    order = np.argsort(points[:, 2], kind='stable')
+    sorted_points = points[order]
+    z = np.ascontiguousarray(sorted_points[:, 2])
+    if len(z):
+        z0 = float(np.floor(z[0] / slab_size) * slab_size)
+        num_slabs = int((z[-1] - z0) // slab_size) + 1
+    else:
+        z0, num_slabs = 0.0, 0
+    offsets = np.searchsorted(z, z0 + slab_size * np.arange(num_slabs + 1), side='left')
+    offsets[-1] = len(z)
+    return {"points": sorted_points, "z": z, "order": order, "offsets": offsets,
+            "z0": z0, "slab_size": float(slab_size)}
+
+
+def z_range(index, z_low, z_high):
+    """
+    (start, stop) in z order of the points with z_low <= z < z_high.
+
+    The slab offsets narrow each bound to its slab (and the neighbouring ones,
+    against rounding at slab edges) before the binary search.
+    """
+    z, offsets = index["z"], index["offsets"]
+    num_slabs = len(offsets) - 1
+
+    def position(value):
+        if num_slabs <= 0:
+            return 0
+        slab = int(np.clip(np.floor((value - index["z0"]) / index["slab_size"]), 0, num_slabs - 1))
+        lo, hi = int(offsets[max(slab - 1, 0)]), int(offsets[min(slab + 2, num_slabs)])
+        # Compare in the points' dtype, as `z >= value` on the array would
+        return lo + int(np.searchsorted(z[lo:hi], z.dtype.type(value), side='left'))
+
+    start, stop = position(z_low), position(z_high)
+    return start, max(start, stop)
+
+
+def z_slice(index, z_low, z_high, keep=None):
+    """
+    Points with z_low <= z < z_high.
+
+    Args:
+        index (dict): Output of build_z_index / load_or_build_z_index.
+        keep (np.array, optional): Boolean mask in the original point order (e.g. denoise's
+                                   kept mask); only the band is filtered.
+    Returns:
+        np.array: Mx3 view into the index (a copy if `keep` is given).
+    """
+    start, stop = z_range(index, z_low, z_high)
+    band = index["points"][start:stop]
+    if keep is not None:
+        band = band[keep[index["order"][start:stop]]]
+    return band
+
+
+def z_slice_indices(index, z_low, z_high):
+    """Original indices of the points with z_low <= z < z_high (a view of the permutation)."""
+    start, stop = z_range(index, z_low, z_high)
+    return index["order"][start:stop]
+
+
+def slab_counts(index):
+    """Number of points per slab (a z-histogram with bin size slab_size, starting at z0)."""
+    return np.diff(index["offsets"])
+
+
+def save_z_index(index, directory):
+    """Save an index as memory-mappable arrays in `directory` (e.g. a point cache entry)."""
+    for name in ("points", "z", "order", "offsets"):
+        np.save(directory / f"z_{name}.npy", index[name])
+    with open(directory / "z_index.json", 'w') as f:
+        json.dump({"version": Z_INDEX_VERSION, "z0": index["z0"], "slab_size": index["slab_size"],
+                   "num_points": int(len(index["z"]))}, f)
+
+
+def load_z_index(directory, slab_size=None, num_points=None):
+    """
+    Load a saved index with its arrays memory-mapped read-only.
+
+    Returns:
+        dict or None: The index, or None if missing or built with another slab size / point count.
+    """
+    try:
+        with open(directory / "z_index.json") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if (meta.get("version") != Z_INDEX_VERSION
+            or (slab_size is not None and not np.isclose(meta["slab_size"], slab_size))
+            or (num_points is not None and meta["num_points"] != num_points)):
+        return None
+    index = {name: np.load(directory / f"z_{name}.npy", mmap_mode='r')
+             for name in ("points", "z", "order", "offsets")}
+    index.update(z0=meta["z0"], slab_size=meta["slab_size"])
+    return index
+
+
+def load_or_build_z_index(points, ply_path=None, slab_size=DEFAULT_SLAB_SIZE, rebuild=False, **cache_kwargs):
+    """
+    Return the z index of `points`, reusing the one stored in their point cache entry.
+
+    Args:
+        points (np.array): Nx3 points as returned by point_cache.load_points_cached.
+        ply_path (str, optional): PLY the points were loaded from (None builds in memory).
+        slab_size (float): Slab height (meters).
+        rebuild (bool): Ignore a stored index.
+        **cache_kwargs: The load_points_cached arguments used (voxel_size, key, directory,
+                        min_opacity, max_scale) to locate the cache entry.
+    Returns:
+        dict: Index (see build_z_index).
+    """
+    entry = cache_entry(ply_path, **cache_kwargs) if ply_path is not None else None
+    if entry is not None and not rebuild:
+        index = load_z_index(entry, slab_size, num_points=len(points))
+        if index is not None:
+            return index
+
+    start = time.time()
+    index = build_z_index(points, slab_size)
+    print(f"Built z index over {len(points)} points in {time.time() - start:.2f}s")
+    if entry is not None:
+        try:
+            save_z_index(index, entry)
+        except OSError as e:
+            print(f"Warning: could not save z index in {entry}: {e}")
+    return index
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the z-sorted slab index of a PLY in the point cache.")
+    parser.add_argument("input", help="Input PLY file")
+    parser.add_argument("--slab-size", type=float, default=DEFAULT_SLAB_SIZE, help="Slab height (meters).")
+    parser.add_argument("--voxel-size", type=float, default=None, help="Index a voxel-downsampled copy.")
+    parser.add_argument("--rebuild", action="store_true", help="Ignore a stored index.")
+    add_splat_arguments(parser)
+    args = parser.parse_args()
+
+    points, _ = load_points_cached(args.input, voxel_size=args.voxel_size, with_colors=False,
+                                   **splat_options(args))
+    index = load_or_build_z_index(points, args.input, args.slab_size, rebuild=args.rebuild,
+                                  voxel_size=args.voxel_size, **splat_options(args))
+    counts = slab_counts(index)
+    print(f"z index over {len(index['z'])} points: {len(counts)} slabs of {index['slab_size']}m "
+          f"from {index['z0']:.3f}m (largest slab {counts.max() if len(counts) else 0} points)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())